@@ -0,0 +1,49 @@
+"""Compare two benchmark result files.
+
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+import argparse
+import json
+
+
+def rows(results):
+    for name, seconds in results.get("startup", {}).items():
+        yield f"startup {name}", {"p50_ms": seconds * 1000}, None
+    for name, summary in results.get("stages", {}).items():
+        yield f"stage {name}", summary, None
+    for name, result in results.get("load", {}).items():
+        yield name, result["latency"], result["throughput_rps"]
+
+
+def change(old, new):
+    if not old:
+        return "     n/a"
+    return f"{(new - old) / old * 100:+7.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = dict((name, (summary, rps)) for name, summary, rps in rows(json.load(f)))
+
+    print(f"{'':<40} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9}")
+    for name, old, old_rps in rows(baseline):
+        if name not in candidate:
+            continue
+        new, new_rps = candidate[name]
+        line = f"{name:<40}"
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            line += f" {change(old.get(key), new.get(key, 0))}"
+        if old_rps is not None:
+            line += f" {change(old_rps, new_rps or 0)}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
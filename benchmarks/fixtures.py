@@ -0,0 +1,69 @@
+"""Synthetic CV PDFs for benchmarks"""
+import random
+from typing import List
+
+from .stubs import CITIES, POSITIONS, SKILLS
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """A minimal PDF with one Helvetica text block per page"""
+    objects = []
+    page_ids = [3 + 2 * i for i in range(len(pages))]
+    font_id = 3 + 2 * len(pages)
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    for lines in pages:
+        stream = "BT /F1 10 Tf 50 760 Td 13 TL " + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = stream.encode("latin-1", "replace")
+        content_id = len(objects) + 2
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {content_id} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def make_cv_pdf(seed: int, pages: int = 2) -> bytes:
+    """A synthetic CV; the same seed always gives the same bytes"""
+    rng = random.Random(seed)
+    skills = rng.sample(SKILLS, rng.randint(5, 12))
+    content = [
+        [
+            f"Candidate {seed}",
+            f"{rng.choice(POSITIONS).title()} - {rng.choice(CITIES).title()}",
+            f"candidate{seed}@example.com  +977 98{rng.randint(10000000, 99999999)}",
+            "",
+            "Skills: " + ", ".join(skills),
+            "",
+            "Experience",
+        ]
+    ]
+    for page in range(pages):
+        lines = content[page] if page < len(content) else []
+        for job in range(6):
+            lines.append(f"{rng.choice(POSITIONS).title()} at Company {rng.randint(1, 500)} ({2010 + job} - {2011 + job})")
+            for skill in rng.sample(skills, min(3, len(skills))):
+                lines.append(f"  - Built and maintained {skill} services used by {rng.randint(2, 90)}k users")
+        lines.append(f"Page {page + 1} of {pages}")
+        if page >= len(content):
+            content.append(lines)
+    return make_pdf(content)
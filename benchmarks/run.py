@@ -0,0 +1,284 @@
+"""Offline ingestion and search benchmarks.
+
+Gemini is replaced by deterministic stubs with configurable latency, the
+vector backend is the local index and Mongo is either an in-memory
+stand-in (mongomock-motor) or a real server. Nothing touches the network.
+
+    python -m benchmarks.run --docs 40 --llm-latency 0.8 --out bench_results.json
+    python -m benchmarks.compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from bson.objectid import ObjectId
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = [
+    "senior python developer", "kubernetes", "c++", "react frontend", "machine learning engineer",
+    "aws terraform devops", "mobile flutter dart", "data analysis spark", "leadership agile scrum", "django rest api",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for ingestion and search")
+    parser.add_argument("--docs", type=int, default=40, help="Number of synthetic CVs to ingest")
+    parser.add_argument("--pages", type=int, default=2, help="Pages per synthetic CV")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per stub LLM call")
+    parser.add_argument("--llm-token-latency", type=float, default=0.0, help="Extra seconds per output token of a stub LLM call")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Seconds per stub embedding call")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent requests in load tests")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per load test")
+    parser.add_argument("--mongo", default="memory", help='"memory" for mongomock-motor, or a MongoDB URI')
+    parser.add_argument("--index-mode", default="auto", choices=["auto", "exact", "ivf"], help="Local vector index mode")
+    parser.add_argument("--out", default="bench_results.json", help="Where to write the JSON results")
+    return parser.parse_args(argv)
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Latency summary in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def timed(samples: List[float], call: Awaitable) -> Any:
+    start = time.perf_counter()
+    result = await call
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+async def load(fn: Callable[[int], Awaitable[Any]], total: int, concurrency: int) -> Dict[str, Any]:
+    """Run fn(i) for i in range(total) with at most concurrency in flight"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                await fn(i)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "latency": summarize(latencies),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "concurrency": concurrency,
+    }
+
+
+def setup(args, workdir: str):
+    """Point the app at stubs, the local vector index and the chosen Mongo"""
+    from config import config
+
+    config.VECTOR_BACKEND = "local"
+    config.LOCAL_INDEX_DIR = os.path.join(workdir, "vector_index")
+    config.LOCAL_INDEX_MODE = args.index_mode
+    config.JOB_WORKERS = 0
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    config.GOOGLE_API_KEY = config.GOOGLE_API_KEY or os.environ["GOOGLE_API_KEY"]
+
+    from database import database
+    from llm import llm_generator
+    from utils.rate_limit import limiter
+    from .stubs import StubChatModel, StubEmbeddings
+
+    if args.mongo == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        database.client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        database.client = AsyncIOMotorClient(args.mongo)
+    database.db = database.client[f"cv_parser_bench_{os.getpid()}"]
+    database.init_app()
+
+    chat = StubChatModel(latency=args.llm_latency, latency_per_token=args.llm_token_latency)
+    embeddings = StubEmbeddings(dimensions=config.EMBEDDING_DIMENSIONS, latency=args.embed_latency)
+    llm_generator.llm_cache["gemini"] = chat
+    database.controller.vector_controller.embedding.embedding = embeddings
+    limiter.enabled = False
+    return database, chat, embeddings
+
+
+async def bench_stages(args, database, pdf_paths: List[str]) -> Dict[str, Any]:
+    """Per-stage latencies, one document at a time"""
+    from llm import llm_generator
+
+    vector_controller = database.controller.vector_controller
+    stages = {name: [] for name in ("load_pdf", "generate_parsed_cv", "parse_pdf_cached", "save_vector", "search")}
+    for path in pdf_paths:
+        text = await timed(stages["load_pdf"], vector_controller.load_pdf(path))
+        parsed = await timed(stages["generate_parsed_cv"], llm_generator.generate_parsed_cv(
+            llm_type="cv_parser", cv="<CV>" + text + "</CV>", llm_name="gemini"))
+        await vector_controller.parse_pdf(path)
+        await timed(stages["parse_pdf_cached"], vector_controller.parse_pdf(path))
+        await timed(stages["save_vector"], vector_controller.save_vector(parsed, str(ObjectId())))
+    for i in range(args.requests):
+        await timed(stages["search"], vector_controller.search(QUERIES[i % len(QUERIES)], k=5))
+    return {name: summarize(samples) for name, samples in stages.items()}
+
+
+async def bench_http(args, database, pdf_blobs: List[bytes]) -> Dict[str, Any]:
+    """End-to-end route latencies and throughput under concurrent load"""
+    import httpx
+    from main import app
+
+    results = {}
+    document_ids: List[str] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def upload(i):
+            response = await client.post(
+                "/document/upload", params={"wait": "true"},
+                files={"files": (f"cv_{i}.pdf", pdf_blobs[i], "application/pdf")},
+            )
+            response.raise_for_status()
+            document_ids.extend(r["document_id"] for r in response.json()["results"])
+
+        async def search(i):
+            response = await client.post("/document/search", json={"query": QUERIES[i % len(QUERIES)], "limit": 5})
+            response.raise_for_status()
+
+        async def get_document(i):
+            response = await client.get(f"/document/{document_ids[i % len(document_ids)]}")
+            response.raise_for_status()
+
+        results["POST /document/upload?wait=true"] = await load(upload, len(pdf_blobs), args.concurrency)
+        results["POST /document/search"] = await load(search, args.requests, args.concurrency)
+        if document_ids:
+            results["GET /document/{id}"] = await load(get_document, args.requests, args.concurrency)
+    return results
+
+
+STARTUP_PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import langchain_google_genai
+print(json.dumps({"import_main_s": imported - started, "import_gemini_s": time.perf_counter() - imported}))
+"""
+
+
+def bench_startup(runs: int = 3) -> Dict[str, Any]:
+    """Cold import time of the app, and of the Gemini client library it defers to warm-up"""
+    env = {**os.environ, "PYTHONPATH": REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", STARTUP_PROBE], env=env, capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(args) -> Dict[str, Any]:
+    from .fixtures import make_cv_pdf
+
+    workdir = tempfile.mkdtemp(prefix="cv_parser_bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    try:
+        database, chat, embeddings = setup(args, workdir)
+        await database.ensure_indexes()
+
+        # Stage documents use seeds disjoint from the HTTP ones so nothing is served from cache
+        os.makedirs("fixtures", exist_ok=True)
+        stage_paths = []
+        for i in range(args.docs):
+            path = os.path.join("fixtures", f"stage_{i}.pdf")
+            with open(path, "wb") as f:
+                f.write(make_cv_pdf(i, args.pages))
+            stage_paths.append(path)
+        http_blobs = [make_cv_pdf(100000 + i, args.pages) for i in range(args.docs)]
+
+        startup = bench_startup()
+        started = time.perf_counter()
+        stages = await bench_stages(args, database, stage_paths)
+        http = await bench_http(args, database, http_blobs)
+        total = time.perf_counter() - started
+
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": vars(args),
+                "total_s": total,
+                "stub_llm_calls": chat.calls,
+                "stub_embedding_calls": embeddings.calls,
+            },
+            "startup": startup,
+            "stages": stages,
+            "load": http,
+            "caches": {
+                "parse": database.controller.vector_controller.parse_cache.stats(),
+                "embedding": database.controller.vector_controller.embedding.stats(),
+            },
+        }
+    finally:
+        from utils.pdf_extract import extractor
+        extractor.shutdown()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+
+    for name, seconds in results["startup"].items():
+        print(f"{name:<22} {seconds * 1000:8.0f} ms")
+    for name, summary in results["stages"].items():
+        print(f"{name:<22} p50 {summary.get('p50_ms', 0):8.2f} ms  p95 {summary.get('p95_ms', 0):8.2f} ms  p99 {summary.get('p99_ms', 0):8.2f} ms")
+    for name, result in results["load"].items():
+        latency = result["latency"]
+        print(f"{name:<32} {result['throughput_rps']:8.1f} req/s  p50 {latency.get('p50_ms', 0):8.2f} ms  "
+              f"p95 {latency.get('p95_ms', 0):8.2f} ms  p99 {latency.get('p99_ms', 0):8.2f} ms  errors {result['errors']}")
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Deterministic, network-free stand-ins for the Gemini chat and embedding clients"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+SKILLS = [
+    "python", "java", "c++", "c#", "javascript", "typescript", "go", "rust", "kotlin", "swift",
+    "react", "vue", "angular", "django", "flask", "fastapi", "node", "spring", "kubernetes", "docker",
+    "aws", "gcp", "azure", "terraform", "postgresql", "mongodb", "redis", "kafka", "spark", "pytorch",
+    "tensorflow", "machine learning", "data analysis", "rest api", "graphql", "ci/cd", "linux", "git",
+    "leadership", "communication", "team_work", "agile", "scrum", "testing", "debugging", "flutter", "dart",
+]
+POSITIONS = [
+    "software engineer", "senior python developer", "frontend developer", "data scientist",
+    "devops engineer", "mobile developer", "backend engineer", "machine learning engineer",
+]
+CITIES = ["kathmandu, nepal", "berlin, germany", "london, uk", "new york, usa", "bangalore, india", "toronto, canada"]
+
+
+def _rng(text: str) -> random.Random:
+    return random.Random(int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16))
+
+
+def fake_cv(cv_text: str) -> dict:
+    """A CV matching llm.model.CV, derived deterministically from the input text"""
+    rng = _rng(cv_text)
+    skills = rng.sample(SKILLS, rng.randint(4, 12))
+    position = rng.choice(POSITIONS)
+    name = f"candidate {hashlib.sha256(cv_text.encode('utf-8')).hexdigest()[:8]}"
+    years = round(rng.uniform(0, 20), 1)
+    languages = [s for s in skills if s in SKILLS[:20]] or ["python"]
+    return {
+        "name": name,
+        "email": f"{name.replace(' ', '.')}@example.com",
+        "phone_number": f"+977 98{rng.randint(10000000, 99999999)}",
+        "address": rng.choice(CITIES),
+        "linkedin_url": None,
+        "git_url": None,
+        "website": None,
+        "position": position,
+        "scores": {
+            "experience": rng.randint(1, 250), "exp_reason": "stub",
+            "education": rng.randint(1, 150), "ed_reason": "stub",
+            "skill": rng.randint(1, 200), "sk_reason": "stub",
+            "project": rng.randint(1, 200), "pr_reason": "stub",
+            "presentation": rng.randint(1, 200), "pre_reason": "stub",
+        },
+        "all_skills": f"{name}, {position}: " + ", ".join(skills),
+        "work_experience": [
+            {
+                "job_title": rng.choice(POSITIONS),
+                "company_name": f"company {rng.randint(1, 500)}",
+                "start_date": f"{2024 - i * 2 - 2}",
+                "end_date": "present" if i == 0 else f"{2024 - i * 2}",
+                "responsibilities": [f"worked with {s}" for s in rng.sample(skills, min(3, len(skills)))],
+            }
+            for i in range(rng.randint(1, 4))
+        ],
+        "years_of_experience": years,
+        "education": [{"degree": "bsc computer science", "institution": "stub university",
+                       "start_date": "2010", "end_date": "2014", "grade": None}],
+        "certifications": [],
+        "skills": skills,
+        "programming_languages": languages,
+        "technical_projects": [],
+        "research_papers": [],
+        "languages": ["english"],
+        "hobbies": [],
+        "references": [],
+        "rating": rng.randint(1, 1000),
+    }
+
+
+_REQUESTED_KEYS = re.compile(r"^(\w+): ", re.M)
+
+
+def _requested_keys(prompt: str) -> Optional[List[str]]:
+    """Top-level keys listed by compact format instructions (see llm.prompt); None for a schema dump"""
+    _, marker, instructions = prompt.partition("Return one JSON object with exactly these keys")
+    if not marker:
+        return None
+    return _REQUESTED_KEYS.findall(instructions.split("\n", 1)[1])
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model returning fake_cv() JSON, restricted to the requested keys, after a latency.
+
+    The latency is a fixed part plus latency_per_token for every output
+    token, as generation time grows with the output length."""
+
+    latency: float = 0.0
+    latency_per_token: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        self.calls += 1
+        prompt = messages[-1].content
+        match = re.search(r"<CV>(.*)</CV>", prompt, re.S)
+        cv = fake_cv(match.group(1) if match else prompt)
+        keys = _requested_keys(prompt)
+        content = json.dumps({key: cv[key] for key in keys if key in cv} if keys else cv)
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _latency(self, result: ChatResult) -> float:
+        return self.latency + self.latency_per_token * result.generations[0].message.usage_metadata["output_tokens"]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        result = self._result(messages)
+        time.sleep(self._latency(result))
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        result = self._result(messages)
+        await asyncio.sleep(self._latency(result))
+        return result
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        """The same output in 32-character pieces, the latency spread over them"""
+        result = self._result(messages)
+        message = result.generations[0].message
+        pieces = [message.content[i:i + 32] for i in range(0, len(message.content), 32)] or [""]
+        delay = self._latency(result) / len(pieces)
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(delay)
+            last = i == len(pieces) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=piece, usage_metadata=message.usage_metadata if last else None,
+            ))
+
+
+class StubEmbeddings(Embeddings):
+    """Hashed bag-of-words embeddings: texts sharing words get similar vectors"""
+
+    def __init__(self, dimensions: int = 768, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+        self._token_vectors = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            seed = int(hashlib.sha256(token.encode("utf-8")).hexdigest()[:16], 16)
+            vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+            self._token_vectors[token] = vector
+        return vector
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9+#]+", text.lower()):
+            vector += self._token_vector(token)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return [self._embed(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._embed(text)
@@ -0,0 +1,123 @@
+"""Local vector index at scale: build time, QPS and recall of exact vs IVF search.
+
+Synthetic embeddings are drawn around random topic centers (CV chunks
+cluster by role and skill rather than spreading uniformly), and each
+query is a perturbed chunk. IVF recall@k is measured against the exact
+top k of the same index, at --nprobe and at the lists auto mode
+calibrated to reach --min-recall. No app, Mongo or stub is involved.
+
+    python -m benchmarks.vector_index --chunks 500000 --out index_results.json
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+import numpy as np
+
+from .run import git_commit, summarize
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local vector index benchmark")
+    parser.add_argument("--chunks", type=int, default=500000, help="Vectors in the index")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimensions")
+    parser.add_argument("--topics", type=int, default=2000, help="Cluster centers the vectors are drawn around")
+    parser.add_argument("--noise", type=float, default=1.0, help="Spread of a cluster relative to its center; higher is harder for IVF")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per mode")
+    parser.add_argument("--k", type=int, default=10, help="Hits per query")
+    parser.add_argument("--nlist", type=int, default=1024, help="IVF lists")
+    parser.add_argument("--nprobe", type=int, default=16, help="IVF lists scanned per query")
+    parser.add_argument("--min-recall", type=float, default=0.9, help="Recall auto mode calibrates its lists for")
+    parser.add_argument("--batch", type=int, default=10000, help="Vectors per insert")
+    parser.add_argument("--out", default="index_results.json", help="Where to write the JSON results")
+    return parser.parse_args(argv)
+
+
+def vectors(rng: np.random.Generator, centers: np.ndarray, n: int, noise: float) -> np.ndarray:
+    picked = centers[rng.integers(len(centers), size=n)]
+    return (picked + noise * rng.standard_normal(picked.shape, dtype=np.float32) / np.sqrt(centers.shape[1])).astype(np.float32)
+
+
+def search_all(store, queries: np.ndarray, k: int, mode: str):
+    store.mode = mode
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = store._search(query, k, None)
+        latencies.append(time.perf_counter() - start)
+        results.append({record["chunk_id"] for record, _ in hits})
+    elapsed = sum(latencies)
+    return results, {"latency": summarize(latencies), "qps": len(queries) / elapsed if elapsed else 0.0}
+
+
+def run(args) -> Dict[str, Any]:
+    from vectorstore.local import LocalVectorStore
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.topics, args.dim), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    workdir = tempfile.mkdtemp(prefix="cv_parser_index_bench_")
+    try:
+        store = LocalVectorStore(workdir, embedding=None, mode="ivf", nlist=args.nlist, nprobe=args.nprobe,
+                                 min_recall=args.min_recall)
+        start = time.perf_counter()
+        for offset in range(0, args.chunks, args.batch):
+            n = min(args.batch, args.chunks - offset)
+            records = [{"text": "", "doc_id": str(i // 4), "chunk_id": i} for i in range(offset, offset + n)]
+            store._add(vectors(rng, centers, n, args.noise), records)
+        build_s = time.perf_counter() - start
+
+        # Queries land near stored chunks, as a search for a given profile does
+        queries = vectors(rng, np.asarray(store._vectors[rng.integers(args.chunks, size=args.queries)]), args.queries, args.noise / 2)
+        exact, exact_stats = search_all(store, queries, args.k, "exact")
+        ivf, ivf_stats = search_all(store, queries, args.k, "ivf")
+        ivf_stats["recall_at_k"] = float(np.mean([len(a & b) / len(a) for a, b in zip(exact, ivf)]))
+        results = {
+            "build_s": build_s,
+            "lists": len(store._centroids) if store._centroids is not None else 0,
+            "calibration": {"nprobe": store._tuned_nprobe, "recall": store._tuned_recall},
+            "exact": exact_stats,
+            "ivf": ivf_stats,
+        }
+        if store._tuned_nprobe:
+            auto, auto_stats = search_all(store, queries, args.k, "auto")
+            auto_stats["recall_at_k"] = float(np.mean([len(a & b) / len(a) for a, b in zip(exact, auto)]))
+            results["auto"] = auto_stats
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "args": vars(args),
+        "cpu_count": os.cpu_count(),
+        "results": run(args),
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    index = results["results"]
+    print(f"{args.chunks} chunks x {args.dim} dims, built in {index['build_s']:.1f}s, {index['lists']} lists")
+    calibration = index["calibration"]
+    if calibration["nprobe"]:
+        print(f"auto mode probes {calibration['nprobe']} lists, recall {calibration['recall']:.3f} on stored chunks")
+    else:
+        print(f"auto mode stays exact: recall {calibration['recall']:.3f} at a quarter of the lists")
+    for mode in ("exact", "ivf", "auto"):
+        if mode not in index:
+            continue
+        stats = index[mode]
+        recall = f", recall@{args.k} {stats['recall_at_k']:.3f}" if "recall_at_k" in stats else ""
+        print(f"{mode:5} {stats['qps']:8.1f} QPS, p50 {stats['latency']['p50_ms']:.1f} ms, p95 {stats['latency']['p95_ms']:.1f} ms{recall}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""Bulk import of a directory of CV PDFs, bypassing the rate-limited upload API.
+
+    python -m bulk_import /path/to/cvs --folder-id <folder id> --concurrency 32
+
+Walks the directory for PDFs and skips files whose content hash is already
+stored (or was seen earlier in the run). Files of the document store
+itself that already have a document record are left alone. The rest are parsed with the same
+code as uploads: text extraction in worker processes (one per core
+by default), LLM and embedding calls through the rate scheduler. Parsed
+CVs are written in batches with insert_many, then scored when
+SCORE_ON_INGEST is set.
+
+Progress is appended to a checkpoint file, so running the same command
+again skips the files already imported and retries the failed ones. With
+VECTOR_BACKEND=local, stop the API first: the index files belong to one
+process.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from bson.objectid import ObjectId
+
+from config import config
+from database import database
+from llm import scheduler
+from llm.scheduler import TokenBucket
+from models.document import Document
+from utils.parse_cache import file_sha256
+from utils.pdf_extract import extractor
+from utils.pipeline import pipeline
+
+DOCUMENTS_DIR = "documents"
+
+
+class Checkpoint:
+    """Append-only JSON-lines log of an import.
+
+    A line per file ({"path", "status": done, duplicate, existing or
+    failed, ...}), and a {"writing": [document ids]} line before each batch
+    write, listing only ids that were checked to be unused. Ids of a batch
+    that never got its file lines were partly written by a run that
+    crashed, and are discarded on resume ({"discarded": [...]})."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # document id -> copied file, of batches being written
+        self.unfinished: Dict[str, Optional[str]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    self._apply(json.loads(line))
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        if "writing" in entry:
+            self.unfinished.update(zip(entry["writing"], entry["copied"]))
+        elif "discarded" in entry:
+            for document_id in entry["discarded"]:
+                self.unfinished.pop(document_id, None)
+        else:
+            self.files[entry["path"]] = entry
+            self.unfinished.pop(entry.get("document_id"), None)
+
+    def append(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        with open(self.path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        for entry in entries:
+            self._apply(entry)
+
+    def completed(self, path: str) -> bool:
+        return self.files.get(path, {}).get("status") in ("done", "duplicate", "existing")
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}h{rest // 60:02d}m{rest % 60:02d}s" if hours else f"{rest // 60}m{rest % 60:02d}s"
+
+
+class BulkImporter:
+    def __init__(self, database, directory: str, checkpoint: Checkpoint, folder_id: Optional[str] = None,
+                 concurrency: int = 32, batch_size: int = 50, report_interval: float = 5.0):
+        self.database = database
+        self.directory = os.path.abspath(directory)
+        self.checkpoint = checkpoint
+        self.folder_id = folder_id
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.report_interval = report_interval
+        self.logger = logging.getLogger(__name__)
+        self.total = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.chunks = 0
+        self.started = time.monotonic()
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._scoring: List[asyncio.Task] = []
+        self._score_semaphore = asyncio.Semaphore(concurrency)
+
+    def walk(self) -> List[str]:
+        paths = []
+        for root, _, files in os.walk(self.directory):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        return sorted(paths)
+
+    @staticmethod
+    def _in_store(path: str) -> bool:
+        return os.path.dirname(path) == os.path.abspath(DOCUMENTS_DIR)
+
+    async def discard_unfinished(self) -> None:
+        """Remove what a crashed run wrote of its last batch.
+
+        These ids were unused when the batch started (see flush), so the
+        records are the crashed run's own."""
+        unfinished = self.checkpoint.unfinished
+        if not unfinished:
+            return
+        ids = list(unfinished)
+        await self.database.controller.document_controller._discard_many(ids, self.database)
+        for copied in unfinished.values():
+            if copied and os.path.exists(copied):
+                os.remove(copied)
+        self.checkpoint.append([{"discarded": ids}])
+        print(f"Discarded {len(ids)} partly written documents of the previous run")
+
+    async def _hash_all(self, paths: List[str]) -> Dict[str, str]:
+        semaphore = asyncio.Semaphore(8)
+
+        async def digest(path):
+            async with semaphore:
+                return path, await asyncio.to_thread(file_sha256, path)
+
+        return dict(await asyncio.gather(*(digest(path) for path in paths)))
+
+    async def run(self) -> Dict[str, Any]:
+        document_controller = self.database.controller.document_controller
+        await self.discard_unfinished()
+
+        paths = self.walk()
+        todo = [path for path in paths if not self.checkpoint.completed(path)]
+        print(f"{len(paths)} PDFs found, {len(paths) - len(todo)} already imported by a previous run")
+
+        hashes = await self._hash_all(todo)
+        # Files of the store that were uploaded (named by their document id) are already imported;
+        # records from before content_hash was stored get it now, so copies elsewhere are found below
+        stems = {os.path.splitext(os.path.basename(path))[0]: path for path in todo if self._in_store(path)}
+        stored = await document_controller.existing_ids(list(stems))
+        await document_controller.backfill_hashes({stem: hashes[stems[stem]] for stem in stored})
+        existing = await document_controller.existing_hashes(list(set(hashes.values())))
+        seen = set()
+        to_parse, duplicates = [], []
+        for path in todo:
+            content_hash = hashes[path]
+            stem = os.path.splitext(os.path.basename(path))[0]
+            if stems.get(stem) == path and stem in stored:
+                duplicates.append({"path": path, "status": "existing", "document_id": stem, "content_hash": content_hash})
+                seen.add(content_hash)
+            elif content_hash in existing or content_hash in seen:
+                duplicates.append({"path": path, "status": "duplicate", "content_hash": content_hash})
+            else:
+                seen.add(content_hash)
+                to_parse.append(path)
+        self.checkpoint.append(duplicates)
+        self.duplicates = len(duplicates)
+        self.total = len(to_parse)
+
+        self.versions = self.database.controller.vector_controller.versions()
+        self.started = time.monotonic()
+        reporter = asyncio.create_task(self._report_loop())
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process(path):
+            async with semaphore:
+                await self.parse_file(path, hashes[path])
+
+        try:
+            await asyncio.gather(*(process(path) for path in to_parse))
+            await self.flush()
+            await asyncio.gather(*self._scoring)
+        finally:
+            reporter.cancel()
+        self.report()
+        return {
+            "found": len(paths),
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "elapsed_s": round(time.monotonic() - self.started, 1),
+        }
+
+    async def parse_file(self, path: str, content_hash: str) -> None:
+        vector_controller = self.database.controller.vector_controller
+        stem = os.path.splitext(os.path.basename(path))[0]
+        in_store = self._in_store(path)
+        # Files already in the document store keep their name (their id, if uploaded) and stay where they are
+        document_id = stem if in_store and ObjectId.is_valid(stem) else str(ObjectId())
+        try:
+            parsed_cv = await vector_controller.parse_pdf(path, document_id, content_hash)
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            self.logger.error(f"Error parsing {path}: {detail}")
+            self.failed += 1
+            self.checkpoint.append([{"path": path, "status": "failed", "content_hash": content_hash, "error": detail}])
+            return
+
+        self._buffer.append({
+            "path": path,
+            "copy": not in_store,
+            "parsed_cv": parsed_cv,
+            "document": Document(
+                id=document_id,
+                document_name=os.path.basename(path),
+                document_url=os.path.join(DOCUMENTS_DIR, os.path.basename(path)) if in_store
+                else os.path.join(DOCUMENTS_DIR, f"{document_id}.pdf"),
+                folder_id=self.folder_id,
+                content_hash=content_hash,
+            ),
+        })
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    def _failed(self, item: Dict[str, Any], error: str) -> Dict[str, Any]:
+        self.logger.error(f"Error importing {item['path']}: {error}")
+        self.failed += 1
+        return {
+            "path": item["path"],
+            "status": "failed",
+            "document_id": item["document"].id,
+            "content_hash": item["document"].content_hash,
+            "error": error,
+        }
+
+    async def flush(self) -> None:
+        document_controller = self.database.controller.document_controller
+        async with self._flush_lock:
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return
+            # Only ids nobody uses go in the writing line, so discarding them after a crash cannot touch other records
+            used = await document_controller.existing_ids([item["document"].id for item in batch])
+            self.checkpoint.append([
+                self._failed(item, "A document with this id already exists")
+                for item in batch if item["document"].id in used
+            ])
+            batch = [item for item in batch if item["document"].id not in used]
+            if not batch:
+                return
+            copied = [item["document"].document_url if item["copy"] else None for item in batch]
+            self.checkpoint.append([{"writing": [item["document"].id for item in batch], "copied": copied}])
+            try:
+                for item in batch:
+                    if item["copy"]:
+                        await asyncio.to_thread(shutil.copyfile, item["path"], item["document"].document_url)
+                result = await document_controller.save_batch(self.database, batch, self.versions)
+            except Exception as e:
+                # Left for the next run, which discards the partial batch and retries its files
+                detail = getattr(e, "detail", None) or str(e)
+                self.logger.error(f"Error writing a batch of {len(batch)} documents: {detail}")
+                self.failed += len(batch)
+                return
+            self.chunks += result["chunks"]
+            entries = []
+            for item in batch:
+                error = result["failed"].get(item["document"].id)
+                if error is None:
+                    self.imported += 1
+                    if config.SCORE_ON_INGEST and item["parsed_cv"].get("rating") is None:
+                        self._scoring.append(asyncio.create_task(self.score(item["document"].id)))
+                    entries.append({
+                        "path": item["path"],
+                        "status": "done",
+                        "document_id": item["document"].id,
+                        "content_hash": item["document"].content_hash,
+                    })
+                    continue
+                # Nothing of it was kept by save_batch; a rerun retries the file under a new id
+                if item["copy"] and os.path.exists(item["document"].document_url):
+                    os.remove(item["document"].document_url)
+                entries.append(self._failed(item, error))
+            self.checkpoint.append(entries)
+
+    async def score(self, document_id: str) -> None:
+        """Scores and rating of an imported CV, as after an upload; one that fails is scored on first request"""
+        async with self._score_semaphore:
+            try:
+                await self.database.controller.document_controller.get_scores(document_id, self.database)
+            except Exception as e:
+                self.logger.error(f"Error scoring document {document_id}: {getattr(e, 'detail', None) or str(e)}")
+
+    def report(self) -> None:
+        elapsed = time.monotonic() - self.started
+        processed = self.imported + self.failed + len(self._buffer)
+        rate = processed / elapsed if elapsed else 0.0
+        remaining = self.total - processed
+        eta = _duration(remaining / rate) if rate and remaining else "-"
+        chat = scheduler.stats()["chat"]
+        print(
+            f"[{_duration(elapsed)}] {processed}/{self.total} parsed, {self.imported} imported, "
+            f"{self.duplicates} duplicates, {self.failed} failed | {rate:.2f} CVs/s, ETA {eta} | "
+            f"LLM concurrency {chat['concurrency_limit']}, throttled {chat['throttled']}",
+            flush=True,
+        )
+
+    async def _report_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+
+
+async def run_import(args) -> Dict[str, Any]:
+    folder_id = args.folder_id
+    if folder_id:
+        folders = await database.controller.folder_controller.list_folders([folder_id])
+        if not folders:
+            raise SystemExit(f"Folder {folder_id} not found")
+    await database.controller.document_controller.ensure_indexes()
+    await database.controller.vector_controller.warm_up()
+
+    importer = BulkImporter(
+        database,
+        args.directory,
+        Checkpoint(args.checkpoint),
+        folder_id=folder_id,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        report_interval=args.report_interval,
+    )
+    return await importer.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a directory of CV PDFs")
+    parser.add_argument("directory", help="Directory to walk for PDFs")
+    parser.add_argument("--folder-id", default=None, help="Folder to import the CVs into")
+    parser.add_argument("--checkpoint", default="bulk_import.checkpoint.jsonl", help="Progress file; rerun with the same one to resume")
+    parser.add_argument("--concurrency", type=int, default=config.INGEST_PARSE_CONCURRENCY, help="Files parsed at once")
+    parser.add_argument("--batch-size", type=int, default=50, help="Parsed CVs per insert_many")
+    parser.add_argument("--extract-workers", type=int, default=config.EXTRACT_WORKERS, help="Text extraction processes")
+    parser.add_argument("--llm-rpm", type=float, default=None, help="LLM requests per minute (default LLM_REQUESTS_PER_MINUTE)")
+    parser.add_argument("--embedding-rpm", type=float, default=None, help="Embedding requests per minute (default EMBEDDING_REQUESTS_PER_MINUTE)")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between progress reports")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+
+    # Keep every extraction process busy, and share the quotas with the API if it is running
+    extractor.workers = args.extract_workers
+    pipeline.set_limit("extract", args.extract_workers)
+    if args.llm_rpm is not None:
+        scheduler.chat.requests = TokenBucket(args.llm_rpm)
+    if args.embedding_rpm is not None:
+        scheduler.embedding.requests = TokenBucket(args.embedding_rpm)
+
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(DOCUMENTS_DIR, exist_ok=True)
+    database.init_app()
+    try:
+        summary = asyncio.run(run_import(args))
+    finally:
+        extractor.shutdown()
+        database.close()
+    print(json.dumps(summary))
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
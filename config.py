@@ -6,6 +6,106 @@ load_dotenv()
 class Config:
     MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
     DATABASE = os.getenv("DATABASE", "cv_parser")
+    # One Motor client (and connection pool) per process
+    MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-config = Config() 
\ No newline at end of file
+    # Parse cache (in-process LRU tier in front of the Mongo "parse_cache" collection)
+    PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "1024"))
+
+    # LLM input: normalized CV text is cut to this many (estimated) tokens; 0 disables the cut
+    PARSE_MAX_INPUT_TOKENS = int(os.getenv("PARSE_MAX_INPUT_TOKENS", "6000"))
+    PARSE_COMPACT_INSTRUCTIONS = os.getenv("PARSE_COMPACT_INSTRUCTIONS", "true").lower() == "true"
+    # "full": one LLM call for the whole CV. "split": contacts by regex, the rest by the LLM,
+    # scores and rating by a second prompt, right after ingest (SCORE_ON_INGEST) or on GET /document/{id}/scores.
+    # Until then a CV has no rating: it sorts last, fails min_rating and is counted as unrated in the facets
+    PARSE_MODE = os.getenv("PARSE_MODE", "split")
+    SCORE_ON_INGEST = os.getenv("SCORE_ON_INGEST", "true").lower() == "true"
+
+    # LLM / embedding call scheduling (see llm.scheduler); 0 disables a quota
+    LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "1000"))
+    LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "4000000"))
+    EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "1500"))
+    LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+    LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+    LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "60"))
+    # Expected output size of a CV parse, reserved against the tokens/min quota up front
+    PARSE_EXPECTED_OUTPUT_TOKENS = int(os.getenv("PARSE_EXPECTED_OUTPUT_TOKENS", "1500"))
+
+    # Ingestion pipeline: max files in flight per stage
+    INGEST_WRITE_CONCURRENCY = int(os.getenv("INGEST_WRITE_CONCURRENCY", "8"))
+    INGEST_EXTRACT_CONCURRENCY = int(os.getenv("INGEST_EXTRACT_CONCURRENCY", "4"))
+    # Upper bound only; the LLM scheduler adapts the actual concurrency to the quota
+    INGEST_PARSE_CONCURRENCY = int(os.getenv("INGEST_PARSE_CONCURRENCY", "32"))
+    INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+    INGEST_DB_CONCURRENCY = int(os.getenv("INGEST_DB_CONCURRENCY", "16"))
+
+    # Upload request bodies are rejected while they are received above MAX_UPLOAD_REQUEST_BYTES;
+    # each file is then copied to disk in chunks and rejected above MAX_UPLOAD_BYTES
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+    MAX_UPLOAD_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_BYTES", str(100 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+    # PDF text extraction worker processes; EXTRACT_TIMEOUT counts from when a worker picks the PDF up
+    EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+    EXTRACT_MAX_PAGES = int(os.getenv("EXTRACT_MAX_PAGES", "20"))
+    EXTRACT_CPU_SECONDS = float(os.getenv("EXTRACT_CPU_SECONDS", "15"))
+    EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "30"))
+
+    # Embeddings; vectors are cached per model in memory and in the "embedding_cache" collection
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+    # Cached vectors of every model expire this many days after they were written; 0 keeps them
+    EMBEDDING_CACHE_TTL_DAYS = float(os.getenv("EMBEDDING_CACHE_TTL_DAYS", "30"))
+
+    # Chunking of parsed CVs for embedding; changing either makes the reindexer re-chunk every CV
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+
+    # Reindexer: CVs stamped with other parser/chunker/embedding versions are reprocessed in batches
+    REINDEX_BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", "100"))
+    REINDEX_CONCURRENCY = int(os.getenv("REINDEX_CONCURRENCY", "4"))
+    REINDEX_LEASE_SECONDS = int(os.getenv("REINDEX_LEASE_SECONDS", "120"))
+
+    # Vector search
+    EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "768"))
+    SEARCH_CHUNKS_PER_DOCUMENT = int(os.getenv("SEARCH_CHUNKS_PER_DOCUMENT", "3"))
+    # "atlas" (Atlas Vector Search) or "local" (embedded index on disk, see vectorstore.local)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "atlas")
+    LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "vector_index")
+    # auto: exact search until LOCAL_INDEX_IVF_THRESHOLD chunks, IVF above; or always exact or ivf
+    LOCAL_INDEX_MODE = os.getenv("LOCAL_INDEX_MODE", "auto")
+    LOCAL_INDEX_IVF_THRESHOLD = int(os.getenv("LOCAL_INDEX_IVF_THRESHOLD", "50000"))
+    LOCAL_INDEX_NLIST = int(os.getenv("LOCAL_INDEX_NLIST", "1024"))
+    LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "16"))
+    # auto mode probes the fewest lists, from LOCAL_INDEX_NPROBE up, reaching this recall@10, or stays exact
+    LOCAL_INDEX_MIN_RECALL = float(os.getenv("LOCAL_INDEX_MIN_RECALL", "0.9"))
+    # Hybrid search: BM25 over the parsed CVs fused with vector hits by reciprocal rank
+    SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")  # hybrid, vector or lexical
+    SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+    LEXICAL_REFRESH_SECONDS = float(os.getenv("LEXICAL_REFRESH_SECONDS", "5"))
+
+    # Structured filtering: how many filtered candidates a prompt re-ranks
+    FILTER_RERANK_CANDIDATES = int(os.getenv("FILTER_RERANK_CANDIDATES", "1000"))
+    # Facet counts: in-memory bitmap index, reloaded in the background to pick up other processes
+    FACET_REFRESH_SECONDS = float(os.getenv("FACET_REFRESH_SECONDS", "300"))
+
+    # Bulk operations: max document ids per request
+    BULK_MAX_DOCUMENTS = int(os.getenv("BULK_MAX_DOCUMENTS", "10000"))
+    # Most documents streamed by one GET /document/all?format=ndjson request
+    EXPORT_MAX_DOCUMENTS = int(os.getenv("EXPORT_MAX_DOCUMENTS", "10000"))
+
+    # Metrics: Server-Timing header with the time per operation of each request
+    SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() == "true"
+
+    # Ingestion jobs; set JOB_WORKERS=0 when running `python -m worker` separately
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "10"))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+
+config = Config()
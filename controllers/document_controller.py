@@ -1,11 +1,19 @@
+import asyncio
+import json
 import logging
 import os
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from fastapi import HTTPException, File, UploadFile
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
+from config import config
 from models.document import Document, DocumentResponse
+from utils.metrics import metrics
+from utils.pipeline import pipeline
+from utils.uploads import stream_upload
 
 class DocumentController:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -13,6 +21,13 @@ class DocumentController:
         self.collection = self.db.get_collection("document")
         self.cv_collection = self.db.get_collection("cv")
         self.logger = logging.getLogger(__name__)
+        # Scoring after ingest (SCORE_ON_INGEST) and streamed uploads whose client went away,
+        # kept referenced until done
+        self._background_tasks = set()
+
+    async def ensure_indexes(self) -> None:
+        # Duplicate detection in bulk imports
+        await self.collection.create_index("content_hash")
 
     def validate_document_name(self, document_name: str) -> bool:
         """Validate if the document is a PDF"""
@@ -28,99 +43,123 @@ class DocumentController:
             self.logger.error(f"Error getting document {document_id}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error retrieving document: {str(e)}")
         
-    async def get_all_documents(self) -> List[Dict[str, Any]]:
-        """Get all documents"""
+    async def get_scores(self, document_id: str, database) -> Optional[Dict[str, Any]]:
+        """Scores and rating of a CV, computed on first request in split parse mode"""
+        if not ObjectId.is_valid(document_id):
+            raise HTTPException(status_code=400, detail=f"Invalid document id: {document_id}")
+        vector_controller = database.controller.vector_controller
+        scores = await vector_controller.score_cv(document_id)
+        if scores is not None:
+            record = await self.cv_collection.find_one({"_id": ObjectId(document_id)}, {"parsed_cv": 1, "folder_id": 1})
+            if record:
+                database.controller.filter_controller.index_document(document_id, record["parsed_cv"], record.get("folder_id"))
+        return scores
+
+    def _score_in_background(self, document_id: str, database) -> None:
+        async def score():
+            try:
+                await self.get_scores(document_id, database)
+            except Exception as e:
+                self.logger.error(f"Error scoring document {document_id}: {str(e)}")
+
+        self._spawn(score())
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _list_cursor(self, after: Optional[str], fields: Optional[List[str]], limit: Optional[int]):
+        """Cursor over cv records in _id order, starting after the given id"""
+        query = {}
+        if after:
+            if not ObjectId.is_valid(after):
+                raise HTTPException(status_code=400, detail=f"Invalid cursor: {after}")
+            query["_id"] = {"$gt": ObjectId(after)}
+        projection = {"parsed_cv": 1} if not fields else {f"parsed_cv.{field}": 1 for field in fields}
+        cursor = self.cv_collection.find(query, projection).sort("_id", 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    async def get_all_documents(self, limit: int = 50, after: Optional[str] = None,
+                                fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Get one page of documents, keyset-paginated on _id.
+
+        Pass the returned next_cursor as after to get the following page;
+        it is None on the last page."""
         try:
-            documents = await self.cv_collection.find({}, {"_id": 1, "parsed_cv": 1}).to_list(length=None)
-            
-            return [{"id": str(doc["_id"]), "parsed_cv": doc["parsed_cv"]} for doc in documents]
+            documents = []
+            # One extra record tells whether there is a next page
+            async for doc in self._list_cursor(after, fields, limit + 1):
+                documents.append({"id": str(doc["_id"]), "parsed_cv": doc.get("parsed_cv", {})})
+
+            has_more = len(documents) > limit
+            documents = documents[:limit]
+            return {
+                "documents": documents,
+                "next_cursor": documents[-1]["id"] if has_more else None,
+            }
+        except HTTPException:
+            raise
         except Exception as e:
             self.logger.error(f"Error getting all documents: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error retrieving documents: {str(e)}")
 
-        
-    async def search_documents(self, query: str) -> List[Dict[str, Any]]:
-        """Search through all documents using vector search"""
+    def stream_documents(self, after: Optional[str] = None, fields: Optional[List[str]] = None,
+                         limit: Optional[int] = None) -> AsyncIterator[str]:
+        """NDJSON lines written straight from the Motor cursor, one document per line.
+
+        The cursor is built (and the cursor argument validated) before
+        anything is streamed, so a bad request still gets a proper status."""
+        cursor = self._list_cursor(after, fields, limit).batch_size(500)
+
+        async def lines():
+            async for doc in cursor:
+                yield json.dumps({"id": str(doc["_id"]), "parsed_cv": doc.get("parsed_cv", {})}, default=str) + "\n"
+
+        return lines()
+
+    async def search_documents(self, query: str, limit: int = 5, fields: Optional[List[str]] = None, rank: str = "best",
+                               folder_ids: Optional[List[str]] = None, document_ids: Optional[List[str]] = None,
+                               mode: Optional[str] = None, vector_weight: float = 1.0, lexical_weight: float = 1.0) -> Dict[str, Any]:
+        """Search documents using hybrid (vector + BM25) search, optionally scoped to folders or document ids"""
         try:
-            # Get all document IDs
-            documents = await self.collection.find({}, {"_id": 1}).to_list(length=None)
-            doc_ids = [str(doc["_id"]) for doc in documents]
-            
-            if not doc_ids:
-                return []
-            
             # Get the vector controller instance
             from database import database
             vector_controller = database.controller.vector_controller
             
             # Perform vector search
             results = await vector_controller.search(
-                pdf_list=doc_ids,
-                query=query
+                query=query,
+                k=limit,
+                fields=fields,
+                rank=rank,
+                folder_ids=folder_ids,
+                document_ids=document_ids,
+                mode=mode,
+                vector_weight=vector_weight,
+                lexical_weight=lexical_weight
             )
             return results
         except Exception as e:
             self.logger.error(f"Error searching documents: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error searching documents: {str(e)}")
 
+    @metrics.instrument("upload_document")
     async def upload_document(self, database, folder_id: str, files: List[UploadFile]) -> Dict[str, Any]:
-        """Upload and process documents"""
+        """Upload and process documents.
+
+        Files are processed concurrently through the staged ingestion
+        pipeline (see utils.pipeline); each stage has its own limit."""
         try:
-            results = []
-            error_pdfs = []
-
-            for file in files:
-                try:
-                    # Validate file
-                    if not self.validate_document_name(file.filename):
-                        error_pdfs.append(file.filename)
-                        continue
-
-                    document_id = ObjectId()
-                    document_url = f"documents/{document_id}.pdf"
-                    
-                    # Ensure directory exists
-                    os.makedirs("documents", exist_ok=True)
-                    
-                    # Save file permanently
-                    with open(document_url, "wb") as f:
-                        f.write(await file.read())
-
-                    try:
-                        # Create document record
-                        document = Document(
-                            id=str(document_id),
-                            document_name=file.filename,
-                            document_url=document_url,
-                            folder_id=folder_id,
-                        )
-
-                        # Save document metadata
-                        await self.collection.insert_one(document.model_dump(by_alias=True))
-
-                        # Parse CV and save to database
-                        parsed_cv = await database.controller.vector_controller.parse_pdf(document_url, str(document_id))
-                        
-                        # Save parsed CV and create vector embeddings
-                        await database.controller.vector_controller.save_parsed_json(document_url, str(document_id))
-
-                        # Add to results
-                        results.append({
-                            "filename": file.filename,
-                            "document_id": str(document_id),
-                            "parsed_cv": parsed_cv
-                        })
-
-                    except Exception as e:
-                        # If anything fails after file creation, clean up
-                        if os.path.exists(document_url):
-                            os.remove(document_url)
-                        await self.delete_document(str(document_id), database)
-                        raise e
-
-                except Exception as e:
-                    self.logger.error(f"Error processing {file.filename}: {str(e)}")
-                    error_pdfs.append(file.filename)
+            outcomes = await asyncio.gather(
+                *(self._ingest_file(database, folder_id, file) for file in files)
+            )
+
+            results = [outcome for outcome in outcomes if outcome is not None]
+            error_pdfs = [file.filename for file, outcome in zip(files, outcomes) if outcome is None]
 
             if not results:
                 raise HTTPException(
@@ -137,23 +176,340 @@ class DocumentController:
             self.logger.error(f"Error in upload_document: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
+    async def _ingest_file(self, database, folder_id: str, file: UploadFile) -> Optional[Dict[str, Any]]:
+        """Run a single uploaded file through the pipeline; returns None on failure"""
+        try:
+            stored = await self.store_upload(file)
+            if stored is None:
+                return None
+            return await self.process_document(database, stored, folder_id)
+        except Exception as e:
+            self.logger.error(f"Error processing {file.filename}: {str(e)}")
+            return None
+
+    async def _store_or_none(self, file: UploadFile) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.store_upload(file)
+        except Exception as e:
+            self.logger.error(f"Error storing {file.filename}: {str(e)}")
+            return None
+
+    async def store_upload(self, file: UploadFile) -> Optional[Dict[str, Any]]:
+        """Validate an uploaded file and stream it to documents/; returns None if it is not a PDF"""
+        # Validate file
+        if not self.validate_document_name(file.filename):
+            return None
+
+        document_id = ObjectId()
+        document_url = f"documents/{document_id}.pdf"
+
+        # Save file permanently
+        async with pipeline.stage("write"):
+            size, content_hash = await stream_upload(file, document_url)
+
+        return {
+            "filename": file.filename,
+            "document_id": str(document_id),
+            "document_url": document_url,
+            "content_hash": content_hash,
+            "size": size,
+        }
+
+    async def process_document(self, database, stored: Dict[str, Any], folder_id: Optional[str], keep_file: bool = False,
+                               on_partial=None) -> Dict[str, Any]:
+        """Extract, parse, save and embed a stored PDF.
+
+        On failure every record created for the document is removed. Job
+        workers pass keep_file=True so the PDF stays on disk for a retry;
+        records left behind by an earlier, crashed attempt are then
+        discarded before starting. on_partial receives partial parses (see
+        VectorController.parse_pdf)."""
+        vector_controller = database.controller.vector_controller
+        document_id = stored["document_id"]
+        document_url = stored["document_url"]
+
+        try:
+            if keep_file:
+                await self._discard_records(document_id, database)
+
+            # Create document record
+            document = Document(
+                id=document_id,
+                document_name=stored["filename"],
+                document_url=document_url,
+                folder_id=folder_id,
+                content_hash=stored.get("content_hash"),
+            )
+
+            # Save document metadata
+            async with pipeline.stage("db"):
+                await self.collection.insert_one(document.model_dump(by_alias=True))
+
+            # Parse CV (extract and parse stages run inside parse_pdf)
+            parsed_cv = await vector_controller.parse_pdf(document_url, document_id, stored.get("content_hash"), on_partial=on_partial)
+
+            # Save parsed CV
+            versions = vector_controller.versions()
+            async with pipeline.stage("db"):
+                await vector_controller.save_parsed_json(document_url, document_id, parsed_cv, folder_id, versions)
+            database.controller.filter_controller.index_document(document_id, parsed_cv, folder_id)
+
+            # Create vector embeddings
+            async with pipeline.stage("embed"):
+                await vector_controller.save_vector(parsed_cv, document_id, folder_id, versions)
+
+            if config.SCORE_ON_INGEST and parsed_cv.get("rating") is None:
+                self._score_in_background(document_id, database)
+
+            return {
+                "filename": stored["filename"],
+                "document_id": document_id,
+                "parsed_cv": parsed_cv
+            }
+
+        except Exception as e:
+            # If anything fails after file creation, clean up
+            if not keep_file and os.path.exists(document_url):
+                os.remove(document_url)
+            await self._discard_records(document_id, database)
+            raise e
+
+    @staticmethod
+    def _event(name: str, data: Any) -> str:
+        return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    async def stream_upload_document(self, database, folder_id: Optional[str], file: UploadFile) -> AsyncIterator[str]:
+        """Store one uploaded CV and parse it, as server-sent events.
+
+        The file is stored before anything is streamed, so a rejected file
+        still gets a proper status. Events:
+        - stored: filename and document_id
+        - partial: parsed_cv so far, each one replacing the previous
+        - result: the same object as an upload?wait=true result, sent once
+          the CV is saved and embedded
+        - error: detail
+        Processing runs in its own task and completes even if the client
+        disconnects."""
+        stored = await self.store_upload(file)
+        if stored is None:
+            raise HTTPException(status_code=400, detail=f"Failed to process any documents. Errors in: {file.filename}")
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def on_partial(partial: Dict[str, Any]) -> None:
+            queue.put_nowait(("partial", {"parsed_cv": partial}))
+
+        async def process():
+            try:
+                result = await self.process_document(database, stored, folder_id, on_partial=on_partial)
+                queue.put_nowait(("result", result))
+            except Exception as e:
+                self.logger.error(f"Error processing {file.filename}: {str(e)}")
+                queue.put_nowait(("error", {"detail": getattr(e, "detail", str(e))}))
+
+        self._spawn(process())
+
+        async def events():
+            yield self._event("stored", {"filename": stored["filename"], "document_id": stored["document_id"]})
+            while True:
+                name, data = await queue.get()
+                yield self._event(name, data)
+                if name != "partial":
+                    return
+
+        return events()
+
+    async def existing_hashes(self, content_hashes: List[str]) -> set:
+        """The content hashes among content_hashes that a stored document already has"""
+        found = set()
+        for i in range(0, len(content_hashes), 1000):
+            cursor = self.collection.find({"content_hash": {"$in": content_hashes[i:i + 1000]}}, {"content_hash": 1})
+            async for document in cursor:
+                found.add(document["content_hash"])
+        return found
+
+    async def existing_ids(self, document_ids: List[str]) -> set:
+        """The ids among document_ids that a document or cv record already has"""
+        ids = [document_id for document_id in document_ids if ObjectId.is_valid(document_id)]
+        found = set()
+        async for document in self.collection.find({"_id": {"$in": ids}}, {"_id": 1}):
+            found.add(document["_id"])
+        async for cv in self.cv_collection.find({"_id": {"$in": [ObjectId(i) for i in ids]}}, {"_id": 1}):
+            found.add(str(cv["_id"]))
+        return found
+
+    async def backfill_hashes(self, content_hashes: Dict[str, str]) -> None:
+        """Set content_hash on documents stored before it was recorded; document id -> hash"""
+        if content_hashes:
+            await self.collection.bulk_write([
+                UpdateOne({"_id": document_id, "content_hash": None}, {"$set": {"content_hash": content_hash}})
+                for document_id, content_hash in content_hashes.items()
+            ], ordered=False)
+
+    @staticmethod
+    async def _insert_many(collection, records: List[Dict[str, Any]]) -> Dict[str, str]:
+        """insert_many that keeps going past failed records; returns id -> error of the failed ones"""
+        if not records:
+            return {}
+        try:
+            await collection.insert_many(records, ordered=False)
+            return {}
+        except BulkWriteError as e:
+            return {
+                str(records[error["index"]]["_id"]): error.get("errmsg", "Write failed")
+                for error in e.details.get("writeErrors", [])
+            }
+
+    async def save_batch(self, database, items: List[Dict[str, Any]], versions: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Store many parsed CVs with one insert_many per collection.
+
+        items hold a Document and its parsed_cv. Items whose id is already
+        used are not written. The cv records go first, then the chunks of
+        the CVs whose record was inserted, then the document records, so a
+        document with metadata is complete and its content_hash can be
+        trusted for deduplication. A failed item does not fail the batch:
+        what was written for it is removed, and it is reported in failed
+        (document id -> error). Returns the chunk count too."""
+        vector_controller = database.controller.vector_controller
+        versions = versions or vector_controller.versions()
+        used = await self.existing_ids([item["document"].id for item in items])
+        failed = {document_id: "A document with this id already exists" for document_id in used}
+        items = [item for item in items if item["document"].id not in used]
+
+        async with pipeline.stage("db"):
+            failed.update(await self._insert_many(vector_controller.acollection, [
+                vector_controller.cv_record(item["document"].id, item["parsed_cv"], item["document"].folder_id, versions)
+                for item in items
+            ]))
+        items = [item for item in items if item["document"].id not in failed]
+        if not items:
+            return {"chunks": 0, "failed": failed}
+
+        async with pipeline.stage("embed"):
+            chunks = await vector_controller.save_vectors(
+                [(item["parsed_cv"], item["document"].id, item["document"].folder_id) for item in items], versions)
+        async with pipeline.stage("db"):
+            document_failed = await self._insert_many(
+                self.collection, [item["document"].model_dump(by_alias=True) for item in items])
+        if document_failed:
+            # Only the cv records and chunks are ours; a document record with that id was written by someone else
+            ids = list(document_failed)
+            await self.cv_collection.delete_many({"_id": {"$in": [ObjectId(i) for i in ids]}})
+            chunks -= await vector_controller.delete_vectors(ids)
+            failed.update(document_failed)
+
+        for item in items:
+            if item["document"].id not in failed:
+                database.controller.filter_controller.index_document(
+                    item["document"].id, item["parsed_cv"], item["document"].folder_id)
+        return {"chunks": chunks, "failed": failed}
+
+    async def enqueue_upload(self, database, folder_id: str, files: List[UploadFile]) -> Dict[str, Any]:
+        """Persist uploaded files and queue them for background ingestion"""
+        try:
+            stored = await asyncio.gather(*(self._store_or_none(file) for file in files))
+            accepted = [s for s in stored if s is not None]
+            error_pdfs = [file.filename for file, s in zip(files, stored) if s is None]
+
+            if not accepted:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Failed to process any documents. Errors in: {', '.join(error_pdfs)}"
+                )
+
+            job_id = await database.controller.job_controller.enqueue(folder_id, accepted)
+
+            return {
+                "job_id": job_id,
+                "status": "queued",
+                "documents": [
+                    {"filename": s["filename"], "document_id": s["document_id"]}
+                    for s in accepted
+                ],
+                "errors": error_pdfs if error_pdfs else None
+            }
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error in enqueue_upload: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
     async def delete_document(self, document_id: str, database) -> None:
         """Delete a document and its associated data"""
         try:
-            # Delete file
-            document = await self.collection.find_one({"_id": ObjectId(document_id)})
-            if document and os.path.exists(document["document_url"]):
-                os.remove(document["document_url"])
-
-            # Delete from collections
-            await self.collection.delete_one({"_id": ObjectId(document_id)})
-            await self.cv_collection.delete_one({"_id": ObjectId(document_id)})
-            
-            # Delete vector embeddings
-            await database.controller.vector_controller.delete_vector(document_id)
-
+            await self.delete_documents([document_id], database)
         except Exception as e:
             self.logger.error(f"Error deleting document {document_id}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
 
+    async def delete_documents(self, document_ids: List[str], database, background_tasks=None) -> Dict[str, Any]:
+        """Delete many documents with one $in delete per collection.
+
+        Files are removed after the response when background_tasks (FastAPI
+        BackgroundTasks) is given. Every id gets an outcome: deleted,
+        not_found or invalid."""
+        if len(document_ids) > config.BULK_MAX_DOCUMENTS:
+            raise HTTPException(status_code=400, detail=f"At most {config.BULK_MAX_DOCUMENTS} documents per request")
+        try:
+            ids = list(dict.fromkeys(document_ids))
+            valid = [document_id for document_id in ids if ObjectId.is_valid(document_id)]
+
+            # Document metadata is stored with a string _id (see models.document.Document), parsed CVs with an ObjectId
+            urls = {}
+            async for document in self.collection.find({"_id": {"$in": valid}}, {"document_url": 1}):
+                urls[document["_id"]] = document.get("document_url")
+            parsed = set()
+            async for cv in self.cv_collection.find({"_id": {"$in": [ObjectId(i) for i in valid]}}, {"_id": 1}):
+                parsed.add(str(cv["_id"]))
+            found = [document_id for document_id in valid if document_id in urls or document_id in parsed]
+
+            chunks = await self._discard_many(found, database)
+
+            paths = [url for url in urls.values() if url]
+            if background_tasks is not None:
+                background_tasks.add_task(self._remove_files, paths)
+            else:
+                await asyncio.to_thread(self._remove_files, paths)
+
+            found_set = set(found)
+            valid_set = set(valid)
+            return {
+                "deleted": len(found),
+                "chunks_deleted": chunks,
+                "results": [
+                    {
+                        "document_id": document_id,
+                        "status": "deleted" if document_id in found_set else "not_found" if document_id in valid_set else "invalid",
+                    }
+                    for document_id in ids
+                ],
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error deleting documents: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error deleting documents: {str(e)}")
+
+    def _remove_files(self, paths: List[str]) -> None:
+        for path in paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                self.logger.error(f"Error removing {path}: {str(e)}")
+
+    async def _discard_many(self, document_ids: List[str], database) -> int:
+        """Remove the metadata, parsed CVs, vectors and index entries of documents, leaving files alone.
+
+        Returns the number of vector chunks removed."""
+        if not document_ids:
+            return 0
+        await self.collection.delete_many({"_id": {"$in": document_ids}})
+        await self.cv_collection.delete_many({"_id": {"$in": [ObjectId(i) for i in document_ids]}})
+        database.controller.filter_controller.remove_documents(document_ids)
+        return await database.controller.vector_controller.delete_vectors(document_ids)
 
+    async def _discard_records(self, document_id: str, database) -> None:
+        """Remove the metadata, parsed CV and vectors of a document, leaving its file alone"""
+        await self._discard_many([document_id], database)
@@ -0,0 +1,239 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from bson.objectid import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from config import config
+from models.document import Query
+from utils.facet_index import FacetIndex
+
+SORT_FIELDS = {
+    "rating": "filters.rating",
+    "years_of_experience": "filters.years_of_experience",
+}
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def _number(value) -> Optional[float]:
+    """LLM output is not validated, so numbers may come back as "5.2 years" etc."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        if match:
+            return float(match.group())
+    return None
+
+
+def _terms(values) -> List[str]:
+    if isinstance(values, str):
+        values = values.split(",")
+    if not isinstance(values, list):
+        return []
+    terms = {str(v).strip().lower() for v in values if v and str(v).strip()}
+    return sorted(terms)
+
+
+def cv_filter_fields(parsed_cv: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized, indexable copy of the filterable parsed_cv fields.
+
+    Stored next to parsed_cv on every cv record. Skills include the
+    programming languages so a skill filter matches either list; location
+    holds the lower-cased parts of "city, country" so either can be matched
+    exactly (and with an index)."""
+    programming_languages = _terms(parsed_cv.get("programming_languages"))
+    return {
+        "skills": sorted(set(_terms(parsed_cv.get("skills"))) | set(programming_languages)),
+        "programming_languages": programming_languages,
+        "location": _terms(parsed_cv.get("address")),
+        "years_of_experience": _number(parsed_cv.get("years_of_experience")),
+        "rating": _number(parsed_cv.get("rating")),
+    }
+
+
+class FilterController:
+    """Structured filtering and sorting of parsed CVs.
+
+    Filters run against the normalized "filters" sub-document of the cv
+    collection (see cv_filter_fields) and are served by the compound and
+    multikey indexes created in ensure_indexes. With a prompt, the filtered
+    candidates are re-ranked by semantic similarity. Facet counts come from
+    an in-memory bitmap index of the same fields (see utils.facet_index).
+    """
+
+    INDEXES = [
+        [("folder_id", 1), ("filters.rating", -1)],
+        [("folder_id", 1), ("filters.years_of_experience", -1)],
+        [("filters.skills", 1), ("filters.rating", -1)],
+        [("filters.skills", 1), ("filters.years_of_experience", -1)],
+        [("filters.programming_languages", 1), ("filters.rating", -1)],
+        [("filters.location", 1), ("filters.rating", -1)],
+        [("filters.rating", -1)],
+        [("filters.years_of_experience", -1)],
+    ]
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.cv_collection = self.db.get_collection("cv")
+        self.document_collection = self.db.get_collection("document")
+        self.facets = FacetIndex(db, refresh_seconds=config.FACET_REFRESH_SECONDS)
+        self.logger = logging.getLogger(__name__)
+
+    async def ensure_indexes(self) -> None:
+        for keys in self.INDEXES:
+            await self.cv_collection.create_index(keys)
+        await self.backfill()
+        await self.facets.load()
+
+    def index_document(self, document_id: str, parsed_cv: Dict[str, Any], folder_id: Optional[str] = None) -> None:
+        """Count a newly stored CV in the facets"""
+        self.facets.add(document_id, cv_filter_fields(parsed_cv), folder_id)
+
+    def remove_documents(self, document_ids: List[str]) -> None:
+        self.facets.remove(document_ids)
+
+    def move_documents(self, document_ids: List[str], folder_id: Optional[str]) -> None:
+        self.facets.set_folder(document_ids, folder_id)
+
+    async def backfill(self, batch_size: int = 500) -> int:
+        """Add filters (and folder_id) to cv records stored before they existed"""
+        updated = 0
+        batch = []
+        cursor = self.cv_collection.find({"filters": {"$exists": False}}, {"parsed_cv": 1})
+        async for cv in cursor:
+            batch.append(cv)
+            if len(batch) >= batch_size:
+                updated += await self._backfill_batch(batch)
+                batch = []
+        if batch:
+            updated += await self._backfill_batch(batch)
+        if updated:
+            self.logger.info(f"Added filter fields to {updated} cv records")
+        return updated
+
+    async def _backfill_batch(self, batch: List[Dict[str, Any]]) -> int:
+        # Document metadata is stored with a string _id (see models.document.Document)
+        folders = {
+            doc["_id"]: doc.get("folder_id")
+            async for doc in self.document_collection.find(
+                {"_id": {"$in": [str(cv["_id"]) for cv in batch]}}, {"folder_id": 1}
+            )
+        }
+        result = await self.cv_collection.bulk_write([
+            UpdateOne(
+                {"_id": cv["_id"]},
+                {"$set": {
+                    "filters": cv_filter_fields(cv.get("parsed_cv") or {}),
+                    "folder_id": folders.get(str(cv["_id"])),
+                }},
+            )
+            for cv in batch
+        ], ordered=False)
+        return result.modified_count
+
+    @staticmethod
+    def build_query(query: Query) -> Dict[str, Any]:
+        clauses = []
+        skills = _terms((query.skills or []) + [a for a in (query.attribute or []) if a])
+        if skills:
+            clauses.append({"filters.skills": {"$all": skills}})
+        programming_languages = _terms(query.programming_languages or [])
+        if programming_languages:
+            clauses.append({"filters.programming_languages": {"$all": programming_languages}})
+        location = _terms(query.address or "")
+        if location:
+            clauses.append({"filters.location": {"$all": location}})
+        folders = [f for f in (query.foldersToSearch or []) if f]
+        if folders:
+            clauses.append({"folder_id": {"$in": folders}})
+
+        for field, low, high in (
+            ("filters.years_of_experience", query.min_experience, query.max_experience),
+            ("filters.rating", query.min_rating, query.max_rating),
+        ):
+            bounds = {}
+            if low is not None:
+                bounds["$gte"] = low
+            if high is not None:
+                bounds["$lte"] = high
+            if bounds:
+                clauses.append({field: bounds})
+
+        if not clauses:
+            return {}
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    async def _find_sorted(self, mongo_query: Dict[str, Any], projection: Dict[str, Any], field: str,
+                           direction: int, limit: int) -> List[Dict[str, Any]]:
+        """cv records sorted on field, the ones without it (e.g. not scored yet) last in either direction"""
+        # Mongo sorts missing values first, so descending already puts them last
+        if direction == -1:
+            cursor = self.cv_collection.find(mongo_query, projection).sort(field, -1).limit(limit)
+            return [cv async for cv in cursor]
+        records = []
+        for present in ({"$ne": None}, None):
+            query = {"$and": [mongo_query, {field: present}]} if mongo_query else {field: present}
+            cursor = self.cv_collection.find(query, projection).sort(field, 1).limit(limit - len(records))
+            records.extend([cv async for cv in cursor])
+            if len(records) >= limit:
+                break
+        return records
+
+    async def filter_documents(self, query: Query, database) -> Dict[str, Any]:
+        """Filter and sort CVs; re-rank the candidates by query.prompt if given"""
+        try:
+            mongo_query = self.build_query(query)
+            direction = 1 if (query.sort_order or "desc").lower() == "asc" else -1
+            sort_field = SORT_FIELDS[query.sort_by]
+
+            if query.prompt:
+                # Only ids are needed to scope the vector search
+                candidates = [
+                    str(cv["_id"]) for cv in
+                    await self._find_sorted(mongo_query, {"_id": 1}, sort_field, direction, config.FILTER_RERANK_CANDIDATES)
+                ]
+                if not candidates:
+                    return {"documents": []}
+                hits = await database.controller.vector_controller.search(
+                    query.prompt, k=query.limit, fields=query.fields, document_ids=candidates
+                )
+                return {
+                    "documents": [
+                        # score ranks the results (fused in hybrid mode), similarity_score is the vector part
+                        {"id": doc_id, "score": hit["score"], "similarity_score": hit["similarity_score"],
+                         "parsed_cv": hit["parsed_cv"]}
+                        for doc_id, hit in hits.items()
+                    ]
+                }
+
+            projection = {"parsed_cv": 1} if not query.fields else {f"parsed_cv.{field}": 1 for field in query.fields}
+            return {
+                "documents": [
+                    {"id": str(cv["_id"]), "parsed_cv": cv.get("parsed_cv", {})}
+                    for cv in await self._find_sorted(mongo_query, projection, sort_field, direction, query.limit)
+                ]
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error filtering documents: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error filtering documents: {str(e)}")
+
+    def facet_counts(self, query: Optional[Query] = None, top: int = 20) -> Dict[str, Any]:
+        """Facet counts over all CVs, or over the CVs matching query (prompt is ignored)"""
+        if query is None:
+            return self.facets.counts(top=top)
+        return self.facets.counts(
+            top=top,
+            skills=_terms((query.skills or []) + [a for a in (query.attribute or []) if a]),
+            programming_languages=_terms(query.programming_languages or []),
+            location=_terms(query.address or ""),
+            folder_ids=[f for f in (query.foldersToSearch or []) if f],
+            experience=(query.min_experience, query.max_experience),
+            rating=(query.min_rating, query.max_rating),
+        )
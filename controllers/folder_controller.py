@@ -0,0 +1,201 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from bson.objectid import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from config import config
+
+
+class FolderController:
+    """Folders of CVs.
+
+    A folder record only holds its name; membership is the folder_id of
+    each document (and of its cv record, vector chunks and index entries),
+    so listing a folder and counting its CVs are index scans on folder_id
+    rather than reads of an ever-growing array. Moving documents is one
+    $in update_many per collection, and safe to retry if one fails.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = self.db.get_collection("folder")
+        self.document_collection = self.db.get_collection("document")
+        self.cv_collection = self.db.get_collection("cv")
+        self.logger = logging.getLogger(__name__)
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("name")
+        # Serves membership pages (sorted on _id), counts and moves
+        await self.document_collection.create_index([("folder_id", 1), ("_id", 1)])
+
+    @staticmethod
+    def _object_id(folder_id: str) -> ObjectId:
+        if not ObjectId.is_valid(folder_id):
+            raise HTTPException(status_code=400, detail=f"Invalid folder id: {folder_id}")
+        return ObjectId(folder_id)
+
+    async def _require(self, folder_id: str) -> Dict[str, Any]:
+        folder = await self.collection.find_one({"_id": self._object_id(folder_id)})
+        if not folder:
+            raise HTTPException(status_code=404, detail=f"Folder {folder_id} not found")
+        return folder
+
+    async def count_documents(self, folder_ids: List[str]) -> Dict[str, int]:
+        """Number of documents per folder, from the folder_id index"""
+        counts = {folder_id: 0 for folder_id in folder_ids}
+        pipeline = [
+            {"$match": {"folder_id": {"$in": list(folder_ids)}}},
+            {"$group": {"_id": "$folder_id", "count": {"$sum": 1}}},
+        ]
+        async for row in self.document_collection.aggregate(pipeline):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    async def create_folder(self, name: str, document_ids: Optional[List[str]], database) -> Dict[str, Any]:
+        """Create a folder, optionally moving documents into it"""
+        try:
+            folder = {"_id": ObjectId(), "name": name, "created_at": datetime.now(timezone.utc)}
+            await self.collection.insert_one(folder)
+            folder_id = str(folder["_id"])
+            moved = 0
+            if document_ids:
+                moved = (await self.move_documents([d for d in document_ids if d], None, folder_id, database))["moved"]
+            return {"folder_id": folder_id, "name": name, "moved": moved}
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error creating folder {name}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error creating folder: {str(e)}")
+
+    async def list_folders(self, folder_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Folders by name with their document counts; all of them unless folder_ids is given"""
+        try:
+            query = {}
+            if folder_ids:
+                query["_id"] = {"$in": [self._object_id(folder_id) for folder_id in folder_ids]}
+            folders = [folder async for folder in self.collection.find(query).sort("name", 1)]
+            counts = await self.count_documents([str(folder["_id"]) for folder in folders])
+            return [
+                {
+                    "folder_id": str(folder["_id"]),
+                    "name": folder["name"],
+                    "document_count": counts[str(folder["_id"])],
+                }
+                for folder in folders
+            ]
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error listing folders: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error listing folders: {str(e)}")
+
+    async def get_folder(self, folder_id: str, limit: int = 50, after: Optional[str] = None) -> Dict[str, Any]:
+        """A folder with one page of its documents, keyset-paginated on _id"""
+        try:
+            folder = await self._require(folder_id)
+            query: Dict[str, Any] = {"folder_id": folder_id}
+            if after:
+                query["_id"] = {"$gt": after}
+            documents = []
+            # One extra record tells whether there is a next page
+            cursor = self.document_collection.find(query, {"document_name": 1, "document_url": 1}).sort("_id", 1).limit(limit + 1)
+            async for document in cursor:
+                documents.append({
+                    "document_id": document["_id"],
+                    "document_name": document.get("document_name"),
+                    "document_url": document.get("document_url"),
+                })
+            has_more = len(documents) > limit
+            documents = documents[:limit]
+            return {
+                "folder_id": folder_id,
+                "name": folder["name"],
+                "document_count": (await self.count_documents([folder_id]))[folder_id],
+                "documents": documents,
+                "next_cursor": documents[-1]["document_id"] if has_more else None,
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error getting folder {folder_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error retrieving folder: {str(e)}")
+
+    async def rename_folder(self, folder_id: str, new_name: str) -> Dict[str, Any]:
+        try:
+            result = await self.collection.update_one({"_id": self._object_id(folder_id)}, {"$set": {"name": new_name}})
+            if not result.matched_count:
+                raise HTTPException(status_code=404, detail=f"Folder {folder_id} not found")
+            return {"folder_id": folder_id, "name": new_name}
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error renaming folder {folder_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error renaming folder: {str(e)}")
+
+    async def move_documents(self, document_ids: List[str], from_folder: Optional[str], to_folder: Optional[str],
+                             database) -> Dict[str, Any]:
+        """Move documents to to_folder (None for no folder).
+
+        With from_folder, only documents currently in it are moved. The
+        document and cv records, the vector chunks and the lexical and facet
+        indexes are each updated with one $in update, so folder-scoped
+        search and filtering see the new folder right away."""
+        if len(document_ids) > config.BULK_MAX_DOCUMENTS:
+            raise HTTPException(status_code=400, detail=f"At most {config.BULK_MAX_DOCUMENTS} documents per request")
+        try:
+            if to_folder:
+                await self._require(to_folder)
+            ids = [document_id for document_id in dict.fromkeys(document_ids) if ObjectId.is_valid(document_id)]
+            if from_folder:
+                # Narrow to the documents actually in from_folder, so every collection moves the same set
+                ids = [document["_id"] async for document in self.document_collection.find(
+                    {"_id": {"$in": ids}, "folder_id": from_folder}, {"_id": 1})]
+            if not ids:
+                return {"moved": 0, "chunks_moved": 0, "to_folder": to_folder}
+
+            # Document metadata is stored with a string _id (see models.document.Document), parsed CVs with an ObjectId
+            result = await self.document_collection.update_many({"_id": {"$in": ids}}, {"$set": {"folder_id": to_folder}})
+            await self.cv_collection.update_many(
+                {"_id": {"$in": [ObjectId(i) for i in ids]}}, {"$set": {"folder_id": to_folder}})
+            chunks = await database.controller.vector_controller.move_vectors(ids, to_folder)
+            database.controller.filter_controller.move_documents(ids, to_folder)
+            return {"moved": result.matched_count, "chunks_moved": chunks, "to_folder": to_folder}
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error moving documents to {to_folder}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error moving documents: {str(e)}")
+
+    async def delete_folder(self, folder_id: str, database, delete_documents: bool = False,
+                            background_tasks=None) -> Dict[str, Any]:
+        """Delete a folder. Its documents are deleted too with delete_documents, otherwise they are left without a folder."""
+        try:
+            await self._require(folder_id)
+            affected = 0
+            while True:
+                batch = [document["_id"] async for document in self.document_collection.find(
+                    {"folder_id": folder_id}, {"_id": 1}).limit(config.BULK_MAX_DOCUMENTS)]
+                if not batch:
+                    break
+                if delete_documents:
+                    result = await database.controller.document_controller.delete_documents(batch, database, background_tasks)
+                    done = result["deleted"]
+                else:
+                    done = (await self.move_documents(batch, folder_id, None, database))["moved"]
+                affected += done
+                if not done:
+                    # Records with ids that are not ObjectIds; they cannot be moved or deleted by id
+                    break
+            await self.collection.delete_one({"_id": ObjectId(folder_id)})
+            return {
+                "folder_id": folder_id,
+                "documents_deleted" if delete_documents else "documents_unfiled": affected,
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error deleting folder {folder_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error deleting folder: {str(e)}")
@@ -0,0 +1,199 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from bson.objectid import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from config import config
+
+
+class JobController:
+    """Mongo-backed queue of ingestion jobs.
+
+    A job is claimed by a worker with a lease; a worker that crashes stops
+    renewing it and the job becomes claimable again once the lease expires.
+    Failed files are retried with backoff up to JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = self.db.get_collection("jobs")
+        self.logger = logging.getLogger(__name__)
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index([("status", 1), ("available_at", 1)])
+        await self.collection.create_index([("status", 1), ("lease_until", 1)])
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    async def enqueue(self, folder_id: Optional[str], files: List[Dict[str, Any]]) -> str:
+        """Create a job for files already persisted to disk"""
+        now = self._now()
+        job = {
+            "_id": ObjectId(),
+            "status": "queued",
+            "folder_id": folder_id,
+            "files": [
+                {
+                    "filename": f["filename"],
+                    "document_id": f["document_id"],
+                    "document_url": f["document_url"],
+                    "content_hash": f.get("content_hash"),
+                    "status": "pending",
+                    "error": None,
+                }
+                for f in files
+            ],
+            "attempts": 0,
+            "max_attempts": config.JOB_MAX_ATTEMPTS,
+            "available_at": now,
+            "lease_until": None,
+            "worker_id": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.collection.insert_one(job)
+        return str(job["_id"])
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Lease the oldest runnable job: queued and due, or running with an expired lease and attempts left"""
+        now = self._now()
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued", "available_at": {"$lte": now}},
+                    {
+                        "status": "running",
+                        "lease_until": {"$lt": now},
+                        "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+                    },
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": worker_id,
+                    "lease_until": now + timedelta(seconds=config.JOB_LEASE_SECONDS),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fail_abandoned(self) -> List[ObjectId]:
+        """Close out jobs whose worker died on the last attempt; their lease expired but they cannot be claimed again"""
+        now = self._now()
+        closed = []
+        async for job in self.collection.find({
+            "status": "running",
+            "lease_until": {"$lt": now},
+            "$expr": {"$gte": ["$attempts", "$max_attempts"]},
+        }):
+            failed = [i for i, f in enumerate(job["files"]) if f["status"] != "done"]
+            update = {
+                "status": "failed" if len(failed) == len(job["files"]) else "completed",
+                "finished_at": now,
+                "lease_until": None,
+                "worker_id": None,
+                "updated_at": now,
+                **{f"files.{i}.status": "failed" for i in failed},
+                **{f"files.{i}.error": "Worker stopped while processing the file" for i in failed},
+            }
+            # Only if no one renewed or closed it since it was read
+            result = await self.collection.update_one(
+                {"_id": job["_id"], "status": "running", "lease_until": job["lease_until"]},
+                {"$set": update},
+            )
+            if result.modified_count == 1:
+                self.logger.error(f"Job {job['_id']}: worker stopped on the last of {job['attempts']} attempts")
+                closed.append(job["_id"])
+        return closed
+
+    async def renew_lease(self, job_id: ObjectId, worker_id: str) -> bool:
+        now = self._now()
+        result = await self.collection.update_one(
+            {"_id": job_id, "worker_id": worker_id, "status": "running"},
+            {"$set": {
+                "lease_until": now + timedelta(seconds=config.JOB_LEASE_SECONDS),
+                "updated_at": now,
+            }},
+        )
+        return result.modified_count == 1
+
+    async def set_file_status(self, job_id: ObjectId, worker_id: str, index: int, status: str, error: Optional[str] = None) -> bool:
+        """Record a file's outcome; False if the worker no longer holds the job's lease"""
+        result = await self.collection.update_one(
+            {"_id": job_id, "worker_id": worker_id, "status": "running"},
+            {"$set": {
+                f"files.{index}.status": status,
+                f"files.{index}.error": error,
+                "updated_at": self._now(),
+            }},
+        )
+        return result.modified_count == 1
+
+    async def finish(self, job: Dict[str, Any], worker_id: str) -> Optional[str]:
+        """Complete the job, or requeue it with backoff while failed files have attempts left.
+
+        Returns None, without touching the job, if the worker no longer holds its lease.
+        """
+        job = await self.collection.find_one({"_id": job["_id"], "worker_id": worker_id, "status": "running"})
+        if job is None:
+            return None
+        failed = [i for i, f in enumerate(job["files"]) if f["status"] != "done"]
+        now = self._now()
+
+        if failed and job["attempts"] < job["max_attempts"]:
+            status = "queued"
+            update = {
+                "status": status,
+                "available_at": now + timedelta(seconds=config.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)),
+                **{f"files.{i}.status": "pending" for i in failed},
+            }
+        else:
+            status = "failed" if len(failed) == len(job["files"]) else "completed"
+            update = {"status": status, "finished_at": now}
+
+        update.update({"lease_until": None, "worker_id": None, "updated_at": now})
+        result = await self.collection.update_one(
+            {"_id": job["_id"], "worker_id": worker_id, "status": "running"}, {"$set": update}
+        )
+        if result.modified_count == 0:
+            # The lease expired and another worker took the job over
+            return None
+        return status
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            job = await self.collection.find_one({"_id": ObjectId(job_id)})
+            if not job:
+                return None
+
+            files = [
+                {k: f[k] for k in ("filename", "document_id", "status", "error")}
+                for f in job["files"]
+            ]
+            counts = {"total": len(files), "done": 0, "failed": 0, "pending": 0}
+            for f in files:
+                counts[f["status"] if f["status"] in counts else "pending"] += 1
+
+            return {
+                "job_id": str(job["_id"]),
+                "status": job["status"],
+                "attempts": job["attempts"],
+                "max_attempts": job["max_attempts"],
+                "progress": counts,
+                "files": files,
+                "created_at": job["created_at"],
+                "updated_at": job["updated_at"],
+            }
+        except Exception as e:
+            self.logger.error(f"Error getting job {job_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error retrieving job: {str(e)}")
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from bson.objectid import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config import config
+from controllers.filter_controller import cv_filter_fields
+from utils.metrics import metrics
+
+STATE_ID = "cv"
+MAX_ERRORS = 20
+
+
+class ReindexController:
+    """Background reprocessing of CVs made with other parser, chunker or embedding versions.
+
+    Every cv record carries the versions that produced it (see
+    VectorController.versions). A run scans the cv collection in _id order
+    for records with other versions, a batch at a time, and reprocesses up
+    to REINDEX_CONCURRENCY of them at once:
+
+    - a new parser version re-parses the stored PDF (served from the parse
+      cache when the same prompt already parsed it), then re-chunks;
+    - a new chunker or embedding version only re-chunks and re-embeds the
+      stored parsed_cv, without calling the LLM.
+
+    The run's state lives in the "reindex_state" collection: the last _id
+    done is the checkpoint, and a lease (as for ingestion jobs) keeps a
+    second process from running it at the same time. A run interrupted by
+    a shutdown or crash resumes from the checkpoint; records that failed
+    stay stale and are picked up by the next run.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = self.db.get_collection("reindex_state")
+        self.cv_collection = self.db.get_collection("cv")
+        self.document_collection = self.db.get_collection("document")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.logger = logging.getLogger(__name__)
+        self.task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    @staticmethod
+    def stale_query(targets: Dict[str, str], reparse: bool) -> Dict[str, Any]:
+        fields = ["chunker", "embedding"] + (["parser"] if reparse else [])
+        return {"$or": [{f"versions.{field}": {"$ne": targets[field]}} for field in fields]}
+
+    @staticmethod
+    def _serialize(state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if not state:
+            return {"status": "idle"}
+        state = dict(state)
+        state.pop("_id", None)
+        if state.get("last_id") is not None:
+            state["last_id"] = str(state["last_id"])
+        return state
+
+    async def get_status(self) -> Dict[str, Any]:
+        return self._serialize(await self.collection.find_one({"_id": STATE_ID}))
+
+    async def start(self, database, reparse: bool = True) -> Dict[str, Any]:
+        """Start a run, or resume the unfinished one if it targets the same versions"""
+        targets = database.controller.vector_controller.versions()
+        now = self._now()
+        try:
+            previous = await self.collection.find_one_and_update(
+                {"_id": STATE_ID, "$or": [{"status": {"$ne": "running"}}, {"lease_until": {"$lt": now}}]},
+                {"$set": {
+                    "status": "running",
+                    "owner": self.owner,
+                    "lease_until": now + timedelta(seconds=config.REINDEX_LEASE_SECONDS),
+                    "updated_at": now,
+                }},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+        except DuplicateKeyError:
+            raise HTTPException(status_code=409, detail="A reindex is already running")
+
+        resume = (
+            previous is not None
+            and previous.get("status") in ("running", "interrupted")
+            and previous.get("targets") == targets
+            and previous.get("reparse") == reparse
+        )
+        if not resume:
+            await self.collection.update_one({"_id": STATE_ID}, {"$set": {
+                "targets": targets,
+                "reparse": reparse,
+                "last_id": None,
+                "processed": 0,
+                "reindexed": 0,
+                "reparsed": 0,
+                "failed": 0,
+                "errors": [],
+                "error": None,
+                "started_at": now,
+                "finished_at": None,
+            }})
+        state = await self.collection.find_one({"_id": STATE_ID})
+        self.task = asyncio.create_task(self._run(database, targets, reparse, state.get("last_id")))
+        return self._serialize(state)
+
+    async def resume(self, database) -> bool:
+        """Continue a run left unfinished by a shutdown or a crash (once its lease expired)"""
+        state = await self.collection.find_one({"_id": STATE_ID})
+        if not state or state.get("status") not in ("running", "interrupted"):
+            return False
+        if state["status"] == "running" and state.get("lease_until") and \
+                state["lease_until"].replace(tzinfo=timezone.utc) >= self._now():
+            return False
+        try:
+            await self.start(database, reparse=state.get("reparse", True))
+            return True
+        except HTTPException:
+            return False
+
+    async def stop(self) -> None:
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def _update_state(self, update: Dict[str, Any]) -> bool:
+        """Update the state if this process still holds the lease"""
+        update.setdefault("$set", {})["updated_at"] = self._now()
+        result = await self.collection.update_one({"_id": STATE_ID, "owner": self.owner}, update)
+        return bool(result.matched_count)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(config.REINDEX_LEASE_SECONDS / 3)
+            lease_until = self._now() + timedelta(seconds=config.REINDEX_LEASE_SECONDS)
+            if not await self._update_state({"$set": {"lease_until": lease_until}}):
+                self.logger.error("Reindex lost its lease")
+                return
+
+    async def _run(self, database, targets: Dict[str, str], reparse: bool, last_id: Optional[ObjectId]) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat())
+        semaphore = asyncio.Semaphore(config.REINDEX_CONCURRENCY)
+
+        async def process(record):
+            async with semaphore:
+                try:
+                    return await self.reindex_document(database, record, targets, reparse), None
+                except Exception as e:
+                    self.logger.error(f"Error reindexing {record['_id']}: {str(e)}")
+                    return None, {"document_id": str(record["_id"]), "error": str(e)}
+
+        try:
+            while True:
+                query = self.stale_query(targets, reparse)
+                if last_id is not None:
+                    query["_id"] = {"$gt": last_id}
+                cursor = self.cv_collection.find(query, {"parsed_cv": 1, "folder_id": 1, "versions": 1})
+                batch = [record async for record in cursor.sort("_id", 1).limit(config.REINDEX_BATCH_SIZE)]
+                if not batch:
+                    break
+
+                outcomes = await asyncio.gather(*(process(record) for record in batch))
+                last_id = batch[-1]["_id"]
+                errors = [error for _, error in outcomes if error]
+                update: Dict[str, Any] = {
+                    "$set": {"last_id": last_id},
+                    "$inc": {
+                        "processed": len(batch),
+                        "reindexed": sum(1 for outcome, _ in outcomes if outcome),
+                        "reparsed": sum(1 for outcome, _ in outcomes if outcome == "reparsed"),
+                        "failed": len(errors),
+                    },
+                }
+                if errors:
+                    update["$push"] = {"errors": {"$each": errors, "$slice": -MAX_ERRORS}}
+                if not await self._update_state(update):
+                    self.logger.error("Reindex lost its lease, stopping")
+                    return
+
+            await self._update_state({"$set": {"status": "completed", "finished_at": self._now(), "lease_until": None}})
+            self.logger.info("Reindex completed")
+        except asyncio.CancelledError:
+            await asyncio.shield(self._update_state({"$set": {"status": "interrupted", "lease_until": None}}))
+            raise
+        except Exception as e:
+            self.logger.error(f"Reindex failed: {str(e)}")
+            await self._update_state({"$set": {"status": "failed", "error": str(e), "lease_until": None}})
+        finally:
+            heartbeat.cancel()
+
+    @metrics.instrument("reindex_document")
+    async def reindex_document(self, database, record: Dict[str, Any], targets: Dict[str, str],
+                               reparse: bool = True) -> Optional[str]:
+        """Bring one cv record (and its chunks) to the target versions.
+
+        Returns "reparsed", "rechunked", or None if the CV was deleted meanwhile."""
+        vector_controller = database.controller.vector_controller
+        document_id = str(record["_id"])
+        versions = record.get("versions") or {}
+        parsed_cv = record.get("parsed_cv") or {}
+        update: Dict[str, Any] = {}
+
+        if reparse and versions.get("parser") != targets["parser"]:
+            document = await self.document_collection.find_one({"_id": document_id}, {"document_url": 1, "content_hash": 1})
+            document_url = (document or {}).get("document_url")
+            if not document_url or not os.path.exists(document_url):
+                raise ValueError("The PDF is missing, cannot re-parse")
+            parsed_cv = await vector_controller.parse_pdf(document_url, document_id, document.get("content_hash"))
+            update.update({
+                "parsed_cv": parsed_cv,
+                "filters": cv_filter_fields(parsed_cv),
+                "versions.parser": targets["parser"],
+            })
+
+        # Read folder_id last, so a move made while parsing is not undone
+        current = await self.cv_collection.find_one({"_id": record["_id"]}, {"folder_id": 1})
+        if current is None:
+            return None
+        folder_id = current.get("folder_id")
+        chunk_versions = {**targets, "parser": update.get("versions.parser", versions.get("parser"))}
+        await vector_controller.vector_store.delete({"doc_id": document_id})
+        await vector_controller.save_vector(parsed_cv, document_id, folder_id, chunk_versions)
+        update.update({"versions.chunker": targets["chunker"], "versions.embedding": targets["embedding"]})
+
+        result = await self.cv_collection.update_one({"_id": record["_id"]}, {"$set": update})
+        if not result.matched_count:
+            # Deleted while reindexing
+            await vector_controller.delete_vectors([document_id])
+            return None
+        if "parsed_cv" not in update:
+            return "rechunked"
+
+        database.controller.filter_controller.index_document(document_id, parsed_cv, folder_id)
+        if config.SCORE_ON_INGEST and parsed_cv.get("rating") is None:
+            database.controller.document_controller._score_in_background(document_id, database)
+        return "reparsed"
@@ -1,168 +1,441 @@
+import asyncio
+import hashlib
+import importlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
 from fastapi import HTTPException
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_mongodb.vectorstores import MongoDBAtlasVectorSearch
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.schema import Document
 
 from config import config
-from pymongo import MongoClient
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson.objectid import ObjectId
 
-from llm import LLMGenerator
+from controllers.filter_controller import cv_filter_fields
+from llm import llm_generator, CachedEmbeddings, UsageLog, extract_contacts, gemini_embeddings
+from llm.model import CONTACT_FIELDS, SCORE_FIELDS, CVScores
+from llm.normalize import normalize_pages, truncate_to_tokens
+from utils.metrics import metrics
+from utils.parse_cache import ParseCache, file_sha256
+from utils.pipeline import pipeline
+from utils.pdf_extract import extractor
+from vectorstore import AtlasVectorStore, LexicalIndex, LocalVectorStore
 
 #TODO: parse the pdf; save the full json and add some insights as the vector_db
 
+# Bump when the text assembled for chunking in chunk_cv changes
+CHUNKER_VERSION = 1
+
 class VectorController:
     def __init__(self, db: AsyncIOMotorDatabase):
-        self.client = MongoClient(config.MONGODB_URI)
-        self.db = self.client[config.DATABASE]
         self.adb = db
         self.acollection = self.adb.get_collection("cv")
-        self.collection = self.db.get_collection("vectorstore")
+        # Shares the Motor connection pool of database.Database
+        self.collection = self.adb.get_collection("vectorstore")
+        self.parse_cache = ParseCache(db)
+        self.parse_usage = UsageLog(db)
 
-        self.embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+        # The Gemini client is built on first use (or by warm_up)
+        self.embedding = CachedEmbeddings(
+            None,
+            db,
+            model_name=config.EMBEDDING_MODEL,
+            factory=lambda: gemini_embeddings(config.EMBEDDING_MODEL),
+        )
         
         # Initialize vector store with proper configuration
-        self.vector_store = MongoDBAtlasVectorSearch(
-            collection=self.collection,
-            embedding=self.embedding,
-            index_name="default",  # Make sure this matches your Atlas search index
-            embedding_key="embedding",  # The field name for the embedding vector
-            text_key="text",  # The field name for the text content
-            metadata_key="metadata"  # The field name for metadata
-        )
+        self.vector_store = self._create_vector_store()
+        self.lexical = LexicalIndex(db, refresh_seconds=config.LEXICAL_REFRESH_SECONDS)
+
+    def _create_vector_store(self):
+        """Vector backend selected by config.VECTOR_BACKEND"""
+        if config.VECTOR_BACKEND == "atlas":
+            return AtlasVectorStore(
+                collection=self.collection,
+                embedding=self.embedding,
+                index_name="default",  # Make sure this matches your Atlas search index
+                embedding_key="embedding",  # The field name for the embedding vector
+                text_key="text",  # The field name for the text content
+            )
+        if config.VECTOR_BACKEND == "local":
+            return LocalVectorStore(
+                directory=config.LOCAL_INDEX_DIR,
+                embedding=self.embedding,
+                mode=config.LOCAL_INDEX_MODE,
+                nlist=config.LOCAL_INDEX_NLIST,
+                nprobe=config.LOCAL_INDEX_NPROBE,
+                ivf_threshold=config.LOCAL_INDEX_IVF_THRESHOLD,
+                min_recall=config.LOCAL_INDEX_MIN_RECALL,
+            )
+        raise ValueError(f"Unknown vector backend {config.VECTOR_BACKEND}, expected atlas or local")
+
+    async def warm_up(self):
+        """Import the Gemini client library in a thread, then build the LLM and embedding clients.
+
+        The clients are built on the event loop: the chat client only sets
+        up its async transport when created inside a running loop."""
+        await asyncio.to_thread(importlib.import_module, "langchain_google_genai")
+        llm_generator.warm_up()
+        self.embedding.embedding
+
+    async def ensure_indexes(self):
+        await self.parse_usage.ensure_indexes()
+        await self.embedding.ensure_indexes()
+        try:
+            await self.vector_store.ensure_indexes(config.EMBEDDING_DIMENSIONS, filter_fields=["doc_id", "folder_id"])
+        except Exception as e:
+            # Not running on Atlas, or the index is managed elsewhere
+            print(f"Could not create the vector search index: {str(e)}")
+        await self.lexical.ensure_indexes()
 
     #load the pdf
-    def load_pdf(self, document_url: str):
-        pdf_loader = PyPDFLoader(document_url)
-        splitter = RecursiveCharacterTextSplitter()
-        pdf_text = pdf_loader.load_and_split()
-        final_text = "\n".join([p.page_content for p in pdf_text])
-        
+    @metrics.instrument("extract_text")
+    async def extract_text(self, document_url: str):
+        """Extract the page text in the extraction worker processes and normalize it for the LLM.
+
+        Returns the text and its size before and after normalization."""
+        pages = await extractor.extract(document_url)
+        raw_chars = sum(len(page) for page in pages)
+        final_text = normalize_pages(pages)
+
         if len(final_text) < 100:
             raise HTTPException(status_code=500, detail=f"Document is too short to Read. Please upload a document that contains text material.")
-        
+
+        final_text = truncate_to_tokens(final_text, config.PARSE_MAX_INPUT_TOKENS)
+        return final_text, {"raw_chars": raw_chars, "input_chars": len(final_text)}
+
+    async def load_pdf(self, document_url: str):
+        """Extract the normalized text of a PDF"""
+        final_text, _ = await self.extract_text(document_url)
         return final_text
 
-    def save_vector(self, cv, document_id: str):
+    def versions(self) -> Dict[str, str]:
+        """Versions of the parser, chunker and embedding model in use.
+
+        Stamped on every cv record and vector chunk; records with other
+        versions are reprocessed by the reindexer (see ReindexController)."""
+        return {
+            "parser": llm_generator.get_version(self.parse_type(), "gemini"),
+            "chunker": f"{CHUNKER_VERSION}:{config.CHUNK_SIZE}:{config.CHUNK_OVERLAP}",
+            "embedding": config.EMBEDDING_MODEL,
+        }
+
+    @staticmethod
+    def chunk_cv(cv: Dict[str, Any]) -> List[str]:
+        """Split the skills and experience of a parsed CV into the chunks embedded for search"""
+        content = cv.get("all_skills", "") + "\n"
+        if "work_experience" in cv:
+            for exp in cv["work_experience"]:
+                content += f"Experience: {exp.get('job_title', '')} at {exp.get('company_name', '')}\n"
+                if "responsibilities" in exp:
+                    content += "Responsibilities:\n" + "\n".join(exp["responsibilities"]) + "\n"
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP)
+        return splitter.split_text(content)
+
+    @staticmethod
+    def chunk_metadata(document_id: str, folder_id: Optional[str], versions: Dict[str, str], count: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "doc_id": document_id,
+                "folder_id": folder_id,
+                "chunk_id": i,
+                "source": "cv",
+                "parser_version": versions["parser"],
+                "chunker_version": versions["chunker"],
+                "embedding_version": versions["embedding"],
+            }
+            for i in range(count)
+        ]
+
+    @metrics.instrument("save_vector")
+    async def save_vector(self, cv, document_id: str, folder_id: str = None, versions: Dict[str, str] = None):
         try:
-            # Extract skills and experience for vector search
-            content = cv.get("all_skills", "") + "\n"
-            if "work_experience" in cv:
-                for exp in cv["work_experience"]:
-                    content += f"Experience: {exp.get('job_title', '')} at {exp.get('company_name', '')}\n"
-                    if "responsibilities" in exp:
-                        content += "Responsibilities:\n" + "\n".join(exp["responsibilities"]) + "\n"
-
-            # Split content into chunks
-            splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-            chunks = splitter.split_text(content)
-
-            # Create documents with metadata
-            documents = []
-            for i, chunk in enumerate(chunks):
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        "doc_id": document_id,
-                        "chunk_id": i,
-                        "source": "cv"
-                    }
-                )
-                documents.append(doc)
-
-            # Add documents to vector store
-            self.vector_store.add_documents(documents)
+            chunks = self.chunk_cv(cv)
+            metadatas = self.chunk_metadata(document_id, folder_id, versions or self.versions(), len(chunks))
+
+            # Add chunks to vector store, and the CV to the lexical index
+            await self.vector_store.add_texts(chunks, metadatas)
+            await self.lexical.add(document_id, cv, folder_id)
             return True
         except Exception as e:
             print(f"Error saving vector: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error saving vector: {str(e)}")
 
+    @metrics.instrument("save_vectors")
+    async def save_vectors(self, items: List[Tuple[Dict[str, Any], str, Optional[str]]], versions: Dict[str, str] = None) -> int:
+        """save_vector for many (cv, document_id, folder_id) at once.
 
-    async def search(self, pdf_list, query: str, k=5):
-        """Search through vectors using similarity search"""
+        The chunks of every CV are embedded in EMBEDDING_BATCH_SIZE batches
+        and stored with one add_texts call. Returns the chunk count."""
         try:
-            # Perform vector search with increased k if filtering will be applied
-            k_search = k * 3 if pdf_list else k  # Get more results if we need to filter
-            
-            # Perform vector search
-            results = self.vector_store.similarity_search_with_score(
-                query=query,
-                k=k_search
+            versions = versions or self.versions()
+            texts, metadatas = [], []
+            for cv, document_id, folder_id in items:
+                chunks = self.chunk_cv(cv)
+                texts.extend(chunks)
+                metadatas.extend(self.chunk_metadata(document_id, folder_id, versions, len(chunks)))
+            await self.vector_store.add_texts(texts, metadatas)
+            await self.lexical.add_many([(document_id, cv, folder_id) for cv, document_id, folder_id in items])
+            return len(texts)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error saving vectors: {str(e)}")
+
+
+    RANK_MODES = ("best", "sum", "mean")
+
+    @staticmethod
+    def _rank_score(scores, rank: str) -> float:
+        """Combine the scores of a document's matching chunks"""
+        if rank == "sum":
+            return sum(scores)
+        if rank == "mean":
+            return sum(scores) / len(scores)
+        return max(scores)
+
+    @staticmethod
+    def build_pre_filter(folder_ids=None, document_ids=None):
+        """Vector search pre-filter on the indexed chunk metadata fields"""
+        clauses = []
+        if document_ids:
+            clauses.append({"doc_id": {"$in": list(document_ids)}})
+        if folder_ids:
+            clauses.append({"folder_id": {"$in": list(folder_ids)}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    SEARCH_MODES = ("hybrid", "vector", "lexical")
+
+    async def _vector_ranking(self, query: str, k: int, rank: str, folder_ids=None, document_ids=None):
+        """Documents ranked by their matching chunks: [(doc_id, score, matching_content)]"""
+        # A CV usually matches with several chunks; fetch enough to fill k documents
+        k_search = k * config.SEARCH_CHUNKS_PER_DOCUMENT
+
+        # Perform vector search
+        results = await self.vector_store.similarity_search_with_score(
+            query=query,
+            k=k_search,
+            pre_filter=self.build_pre_filter(folder_ids, document_ids)
+        )
+
+        # Group matching chunks per document
+        grouped = {}
+        for doc, score in results:
+            doc_id = doc.metadata.get("doc_id")
+            if not doc_id or not ObjectId.is_valid(doc_id):
+                continue
+
+            grouped.setdefault(doc_id, []).append({
+                "content": doc.page_content,
+                "score": float(score)
+            })
+
+        ranked = [
+            (doc_id, self._rank_score([c["score"] for c in chunks], rank), chunks)
+            for doc_id, chunks in grouped.items()
+        ]
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+    @metrics.instrument("search")
+    async def search(self, query: str, k=5, fields=None, rank: str = "best", folder_ids=None, document_ids=None,
+                     mode: str = None, vector_weight: float = 1.0, lexical_weight: float = 1.0):
+        """Search CVs by vector similarity, BM25 or both.
+
+        Scoping by folder or document id is applied by the vector engine as a
+        pre-filter, so every returned chunk is in scope. Vector hits are
+        grouped per document and ranked by their best chunk score (or the
+        sum/mean of chunk scores). In hybrid mode the vector and lexical
+        rankings are combined by weighted reciprocal rank fusion. Results are
+        hydrated with a single $in query; fields limits the returned
+        parsed_cv to the given top-level keys."""
+        try:
+            mode = mode or config.SEARCH_MODE
+            if rank not in self.RANK_MODES:
+                raise ValueError(f"Unknown rank mode {rank}, expected one of {', '.join(self.RANK_MODES)}")
+            if mode not in self.SEARCH_MODES:
+                raise ValueError(f"Unknown search mode {mode}, expected one of {', '.join(self.SEARCH_MODES)}")
+
+            # Fusion looks deeper than k so documents ranked low by one side can still surface
+            depth = k if mode != "hybrid" else max(2 * k, 20)
+            vector_hits, lexical_hits = [], []
+            if mode in ("vector", "hybrid"):
+                vector_hits = await self._vector_ranking(query, depth, rank, folder_ids, document_ids)
+            if mode in ("lexical", "hybrid"):
+                lexical_hits = await self.lexical.search(query, depth, folder_ids, document_ids)
+
+            if mode == "vector":
+                fused = {doc_id: score for doc_id, score, _ in vector_hits}
+            elif mode == "lexical":
+                fused = dict(lexical_hits)
+            else:
+                fused = {}
+                for weight, hits in ((vector_weight, vector_hits), (lexical_weight, lexical_hits)):
+                    for position, hit in enumerate(hits):
+                        fused[hit[0]] = fused.get(hit[0], 0.0) + weight / (config.SEARCH_RRF_K + position + 1)
+
+            ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+            if not ranked:
+                return {}
+            vector_by_id = {doc_id: (score, chunks) for doc_id, score, chunks in vector_hits}
+            lexical_by_id = dict(lexical_hits)
+
+            # Get CV data for all hits in one round trip
+            projection = {"parsed_cv": 1} if not fields else {f"parsed_cv.{field}": 1 for field in fields}
+            cursor = self.acollection.find(
+                {"_id": {"$in": [ObjectId(doc_id) for doc_id, _ in ranked if ObjectId.is_valid(doc_id)]}},
+                projection
             )
-            
-            # Process results
+            cvs = {str(cv["_id"]): cv async for cv in cursor}
+
             search_results = {}
-            for doc, score in results:
-                doc_id = doc.metadata.get("doc_id")
-                if not doc_id:
-                    continue
-                
-                # Filter by pdf_list if provided
-                if pdf_list and doc_id not in pdf_list:
+            for doc_id, score in ranked:
+                cv_data = cvs.get(doc_id)
+                if not cv_data:
                     continue
-                
-                try:
-                    # Get full CV data
-                    cv_data = await self.acollection.find_one({"_id": ObjectId(doc_id)})
-                    if cv_data:
-                        if doc_id not in search_results:
-                            search_results[doc_id] = {
-                                "similarity_score": float(score),
-                                "parsed_cv": cv_data.get("parsed_cv", {}),
-                                "matching_content": []
-                            }
-                        
-                        # Add matching content
-                        search_results[doc_id]["matching_content"].append({
-                            "content": doc.page_content,
-                            "score": float(score)
-                        })
-                        
-                        # Break if we have enough results
-                        if len(search_results) >= k:
-                            break
-                except Exception as e:
-                    print(f"Error processing document {doc_id}: {str(e)}")
-                    continue
-            
+                similarity, matching_content = vector_by_id.get(doc_id, (0.0, []))
+                search_results[doc_id] = {
+                    "score": score,
+                    "similarity_score": similarity,
+                    "lexical_score": lexical_by_id.get(doc_id, 0.0),
+                    "parsed_cv": cv_data.get("parsed_cv", {}),
+                    "matching_content": matching_content
+                }
+
             return search_results
         except Exception as e:
             print(f"Search error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error performing search: {str(e)}")
 
+    @staticmethod
+    def parse_type() -> str:
+        if config.PARSE_MODE not in ("full", "split"):
+            raise ValueError(f"Unknown parse mode {config.PARSE_MODE}, expected full or split")
+        return "cv_parser" if config.PARSE_MODE == "full" else "cv_core"
+
+    @metrics.instrument("parse_pdf")
+    async def parse_pdf(self, document_url: str, document_id: str = None, content_hash: str = None, on_partial=None):
+        """Parse PDF and return the structured data.
 
-    #parse the pdf and save the json in the database
-    async def parse_pdf(self, document_url: str, document_id: str = None):
-        """Parse PDF and return the structured data"""
+        In split mode the contact fields are matched locally and the LLM
+        only extracts the rest; scores and rating are left out until
+        score_cv is called. Results are cached by the SHA-256 of the PDF
+        bytes and the parser version, so an identical CV is only sent to
+        the LLM once.
+
+        on_partial is awaited with partial parses while the LLM output
+        streams in; it is not called on a cache hit."""
         try:
-            pdf_text = self.load_pdf(document_url)
-            pdf_text = "<CV>" + pdf_text + "</CV>"
-            result = await LLMGenerator().generate_parsed_cv(llm_type="cv_parser", cv=pdf_text, llm_name='gemini')
-                
-            return result
+            llm = llm_generator
+            llm_type = self.parse_type()
+            if content_hash is None:
+                content_hash = await asyncio.to_thread(file_sha256, document_url)
+            parser_version = llm.get_version(llm_type, "gemini")
+            cache_key = self.parse_cache.make_key(content_hash, parser_version)
+
+            async def generate():
+                async with pipeline.stage("extract"):
+                    pdf_text, text_stats = await self.extract_text(document_url)
+                contacts = extract_contacts(pdf_text) if llm_type == "cv_core" else None
+                pdf_text = "<CV>" + pdf_text + "</CV>"
+                report = on_partial
+                if on_partial is not None and contacts is not None:
+                    report = lambda partial: on_partial({**partial, **contacts})
+                async with pipeline.stage("parse"):
+                    parsed, usage = await llm.generate(llm_type=llm_type, cv=pdf_text, llm_name='gemini', on_partial=report)
+                if contacts is not None:
+                    parsed.update(contacts)
+                await self.parse_usage.record({
+                    "document_id": document_id,
+                    "content_hash": content_hash,
+                    "parser_version": parser_version,
+                    **usage,
+                    **text_stats,
+                })
+                return parsed
+
+            return await self.parse_cache.get_or_compute(cache_key, generate)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error parsing the PDF: {str(e)}")
 
+    @metrics.instrument("score_cv")
+    async def score_cv(self, document_id: str):
+        """Scores and rating of a stored CV, computed by the scoring prompt if missing.
+
+        The prompt gets the parsed CV (without contact fields) rather than
+        the PDF text. Results are validated against CVScores, then cached by
+        the hash of that input and saved on the cv record, with the rating
+        filter; an incomplete answer raises and is neither cached nor saved.
+        Returns None if there is no such CV."""
+        try:
+            record = await self.acollection.find_one({"_id": ObjectId(document_id)}, {"parsed_cv": 1, "folder_id": 1})
+            if not record:
+                return None
+            parsed = record.get("parsed_cv") or {}
+            if all(parsed.get(field) is not None for field in SCORE_FIELDS):
+                return {field: parsed[field] for field in SCORE_FIELDS}
+
+            llm = llm_generator
+            scoring_input = json.dumps(
+                {k: v for k, v in parsed.items() if k not in CONTACT_FIELDS + SCORE_FIELDS},
+                separators=(",", ":"), ensure_ascii=False, default=str,
+            )
+            input_hash = hashlib.sha256(scoring_input.encode("utf-8")).hexdigest()
+            scores_version = llm.get_version("cv_scores", "gemini")
+
+            async def generate():
+                result, usage = await llm.generate(llm_type="cv_scores", cv=scoring_input, llm_name='gemini')
+                await self.parse_usage.record({
+                    "document_id": document_id,
+                    "content_hash": input_hash,
+                    "parser_version": scores_version,
+                    **usage,
+                })
+                # Raising here keeps a missing or out-of-range score out of the cache
+                return CVScores.model_validate({field: result.get(field) for field in SCORE_FIELDS}).model_dump()
+
+            scores = await self.parse_cache.get_or_compute(self.parse_cache.make_key(input_hash, scores_version), generate)
+            parsed.update(scores)
+            result = await self.acollection.update_one(
+                {"_id": ObjectId(document_id)},
+                {"$set": {
+                    "parsed_cv.scores": scores["scores"],
+                    "parsed_cv.rating": scores["rating"],
+                    "filters.rating": cv_filter_fields(parsed)["rating"],
+                }},
+            )
+            # Deleted while scoring
+            if not result.matched_count:
+                return None
+            return scores
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error scoring the CV: {str(e)}")
+
     
+    def cv_record(self, document_id: str, parsed_json: Dict[str, Any], folder_id: Optional[str] = None,
+                  versions: Dict[str, str] = None) -> Dict[str, Any]:
+        """The cv collection record of a parsed CV"""
+        return {
+            "_id": ObjectId(document_id),
+            "parsed_cv": parsed_json,
+            "folder_id": folder_id,
+            "filters": cv_filter_fields(parsed_json),
+            "versions": versions or self.versions(),
+        }
+
     #save the parsed json in the database
-    async def save_parsed_json(self, document_url: str, document_id: str):
-        """Save parsed CV to database"""
+    async def save_parsed_json(self, document_url: str, document_id: str, parsed_json: dict = None, folder_id: str = None,
+                               versions: Dict[str, str] = None):
+        """Save parsed CV to database, with the normalized fields used for filtering and the versions that produced it"""
         try:
             # Get the parsed data if not already parsed
-            parsed_json = await self.parse_pdf(document_url, document_id)
+            if parsed_json is None:
+                parsed_json = await self.parse_pdf(document_url, document_id)
             
-            # Create the document for MongoDB
-            parsed_cv = {
-                "_id": ObjectId(document_id),
-                "parsed_cv": parsed_json
-            }
-
             # Save to MongoDB
-            result = await self.acollection.insert_one(parsed_cv)
+            result = await self.acollection.insert_one(self.cv_record(document_id, parsed_json, folder_id, versions))
             
             return result
         except Exception as e:
@@ -170,33 +443,49 @@ class VectorController:
 
 
     async def delete_vector(self, document_id: str):
+        await self.delete_vectors([document_id])
+
+    async def delete_vectors(self, document_ids: List[str]) -> int:
+        """Delete the chunks of many documents with one $in on the indexed doc_id; returns the chunk count"""
         try:
-            self.collection.delete_many({"doc_id": document_id})
-        except HTTPException as e:
+            deleted = await self.vector_store.delete({"doc_id": {"$in": list(document_ids)}})
+            await self.lexical.remove_many(list(document_ids))
+            return deleted
+        except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error deleting the vector. Details: {e}")
 
 
+    async def move_vectors(self, document_ids: List[str], folder_id: Optional[str]) -> int:
+        """Set folder_id on the chunks and lexical entries of many documents; returns the chunk count"""
+        try:
+            moved = await self.vector_store.update_metadata({"doc_id": {"$in": list(document_ids)}}, {"folder_id": folder_id})
+            await self.lexical.set_folder(list(document_ids), folder_id)
+            return moved
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error moving the vectors. Details: {e}")
+
+
     async def delete_all_vectors(self):
         try:
-            self.collection.delete_many({})
-        except HTTPException as e:
+            await self.vector_store.delete({})
+            await self.lexical.clear()
+        except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error deleting all vectors. Details: {e}")
 
     async def debug_vector_store(self):
         """Debug method to check vector store contents"""
         try:
             # Check vector store collection
-            vector_count = self.collection.count_documents({})
+            vector_count = await self.vector_store.count()
             print(f"Vector store documents: {vector_count}")
             
             # Get a sample document
-            sample = self.collection.find_one({})
+            sample = await self.vector_store.sample()
             if sample:
-                # Convert ObjectId to string and remove large embedding vectors
+                # Convert ObjectId to string; the embedding vector is already excluded
                 sample_data = {
                     k: str(v) if isinstance(v, ObjectId) else v
                     for k, v in sample.items() 
-                    if k not in ['embedding']  # Exclude the embedding vector
                 }
             
             # Check CV collection
@@ -2,21 +2,64 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from config import config
 
 class Database:
+    """The process's Motor client and controllers.
+
+    Nothing is created at import time: the app lifespan (main.py), the job
+    worker and scripts call init_app() and close()."""
+
     def __init__(self):
-        self.client = AsyncIOMotorClient(config.MONGODB_URI)
-        self.db = self.client[config.DATABASE]
+        self.client = None
+        self.db = None
         self.controller = None
 
+    def connect(self):
+        """Create the pooled Motor client unless one was set already; connects lazily"""
+        if self.client is None:
+            self.client = AsyncIOMotorClient(config.MONGODB_URI, maxPoolSize=config.MONGODB_MAX_POOL_SIZE)
+            self.db = self.client[config.DATABASE]
+
     def init_app(self):
+        if self.controller is not None:
+            return
+        self.connect()
+
         from controllers.document_controller import DocumentController
         from controllers.vector_controller import VectorController
+        from controllers.job_controller import JobController
+        from controllers.filter_controller import FilterController
+        from controllers.folder_controller import FolderController
+        from controllers.reindex_controller import ReindexController
 
         class Controller:
             def __init__(self, db):
                 self.document_controller = DocumentController(db)
                 self.vector_controller = VectorController(db)
+                self.job_controller = JobController(db)
+                self.filter_controller = FilterController(db)
+                self.folder_controller = FolderController(db)
+                self.reindex_controller = ReindexController(db)
 
         self.controller = Controller(self.db)
 
+    async def ensure_indexes(self):
+        await self.controller.document_controller.ensure_indexes()
+        await self.controller.vector_controller.ensure_indexes()
+        await self.controller.job_controller.ensure_indexes()
+        await self.controller.filter_controller.ensure_indexes()
+        await self.controller.folder_controller.ensure_indexes()
+
+    async def ping(self) -> bool:
+        try:
+            await self.db.command("ping")
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.db = None
+        self.controller = None
+
 database = Database()
-database.init_app() 
\ No newline at end of file
@@ -1 +1,5 @@
-from .llm_controller import *
\ No newline at end of file
+from .llm_controller import *
+from .embeddings import *
+from .usage import *
+from .scheduler import *
+from .contact import *
@@ -0,0 +1,76 @@
+import re
+from typing import Dict, Optional
+
+from .model import CONTACT_FIELDS
+
+__all__ = ["extract_contacts"]
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}", re.IGNORECASE)
+# Optional +country code, then digit groups separated by spaces, dots, dashes or parentheses
+_PHONE = re.compile(r"(?<![\w/.])(\+?\(?\d{1,4}\)?[\s.-]?(?:\(?\d{1,4}\)?[\s.-]?){2,5}\d{2,4})(?![\w/])")
+_YEAR = re.compile(r"(19|20)\d{2}$")
+# dd.mm.yyyy, dd/mm/yy, yyyy-mm-dd
+_DATE = re.compile(r"^(\d{1,2}\s*[./-]\s*\d{1,2}\s*[./-]\s*(\d{4}|\d{2})|\d{4}\s*[./-]\s*\d{1,2}\s*[./-]\s*\d{1,2})$")
+_PHONE_LABEL = re.compile(r"\b(phone|tel|telephone|mobile|mob|cell|ph|whatsapp)\b\W{0,3}$", re.IGNORECASE)
+_URL = re.compile(r"(?:https?://)?(?:www\.)?[a-z0-9-]+(?:\.[a-z0-9-]+)*\.[a-z]{2,}(?:/[^\s,;)|]*)?", re.IGNORECASE)
+_LINKEDIN = re.compile(r"linkedin\.com/(?:in|pub)/[^\s/,;)|]+", re.IGNORECASE)
+_GIT = re.compile(r"(?:github\.com|gitlab\.com|bitbucket\.org)/[^\s/,;)|]+", re.IGNORECASE)
+# Hosts that are never a candidate's personal website
+_NOT_WEBSITE = ("linkedin.", "github.", "gitlab.", "bitbucket.", "gmail.", "yahoo.", "outlook.", "hotmail.")
+
+
+def _url(match: str) -> str:
+    match = match.rstrip(".").lower()
+    return match if match.startswith("http") else "https://" + match
+
+
+def _phone(text: str) -> Optional[str]:
+    """The number after a "+" or a phone label, else the first long enough bare number"""
+    fallback = None
+    for match in _PHONE.finditer(text):
+        candidate = match.group(1).strip()
+        digits = re.sub(r"\D", "", candidate)
+        groups = re.findall(r"\d+", candidate)
+        # Short numbers are amounts; "2019 - 2021", "2018, 2019 2020" and 12.03.2019 have enough digits but are not numbers
+        if not 7 <= len(digits) <= 15 or _DATE.match(candidate) or all(_YEAR.match(group) for group in groups):
+            continue
+        if candidate.startswith("+") or _PHONE_LABEL.search(text[max(0, match.start() - 20):match.start()]):
+            return candidate
+        # Without either, fewer than 9 digits is more likely an id or a date in another format
+        if fallback is None and len(digits) >= 9:
+            fallback = candidate
+    return fallback
+
+
+def _website(text: str, email: Optional[str]) -> Optional[str]:
+    email_domain = email.split("@")[1].lower() if email else None
+    for match in _URL.finditer(text):
+        url = match.group(0)
+        host = re.sub(r"^(https?://)?(www\.)?", "", url.lower()).split("/")[0]
+        if any(host.startswith(prefix) for prefix in _NOT_WEBSITE):
+            continue
+        if host == email_domain or "@" in text[max(0, match.start() - 1):match.start()]:
+            continue
+        # Bare "name.tld" without a scheme or www is too often a file or library name (node.js)
+        if not re.match(r"https?://|www\.", url, re.IGNORECASE):
+            continue
+        return _url(url)
+    return None
+
+
+def extract_contacts(text: str) -> Dict[str, Optional[str]]:
+    """Contact fields of a CV found by pattern matching, None where absent.
+
+    Used in the split parse mode instead of asking the LLM for them."""
+    email = _EMAIL.search(text)
+    email = email.group(0).lower() if email else None
+    linkedin = _LINKEDIN.search(text)
+    git = _GIT.search(text)
+    contacts = {
+        "email": email,
+        "phone_number": _phone(text),
+        "linkedin_url": _url(linkedin.group(0)) if linkedin else None,
+        "git_url": _url(git.group(0)) if git else None,
+        "website": _website(text, email),
+    }
+    return {field: contacts[field] for field in CONTACT_FIELDS}
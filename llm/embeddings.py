@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import logging
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from bson.binary import Binary
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from config import config
+from .scheduler import scheduler
+from utils.metrics import metrics
+
+__all__ = ["CachedEmbeddings", "gemini_embeddings"]
+
+
+def gemini_embeddings(model: str):
+    """Gemini embedding client; the client library is imported on first call"""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(model=model)
+
+
+class CachedEmbeddings:
+    """Embedding client wrapper with a two-tier cache and batched provider calls.
+
+    Vectors are cached by model name, kind (document or query, which the
+    provider embeds differently) and the SHA-256 of the text: first in an
+    in-process LRU, then in the Mongo "embedding_cache" collection as packed
+    float32. Misses are sent to the provider in batches of at most
+    batch_size texts. Because the model is part of the key, switching
+    EMBEDDING_MODEL never serves stale vectors, and processes running
+    different models (a rolling deploy, an A/B test) share the collection
+    without clearing each other's entries. A TTL index on created_at
+    expires entries after ttl_days, whichever model wrote them.
+    Pass embedding=None and a factory to build the client on first use.
+    """
+
+    def __init__(self, embedding, db: AsyncIOMotorDatabase, model_name: str,
+                 batch_size: Optional[int] = None, max_entries: Optional[int] = None,
+                 factory: Optional[Callable[[], Any]] = None, ttl_days: Optional[float] = None):
+        self._embedding = embedding
+        self._factory = factory
+        self.model_name = model_name
+        self.collection = db.get_collection("embedding_cache")
+        self.batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+        self.max_entries = max_entries or config.EMBEDDING_CACHE_SIZE
+        self.ttl_days = config.EMBEDDING_CACHE_TTL_DAYS if ttl_days is None else ttl_days
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.provider_calls = 0
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def embedding(self):
+        if self._embedding is None:
+            self._embedding = self._factory()
+        return self._embedding
+
+    @embedding.setter
+    def embedding(self, value) -> None:
+        self._embedding = value
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("model")
+        if not self.ttl_days:
+            return
+        ttl = int(self.ttl_days * 86400)
+        try:
+            await self.collection.create_index("created_at", expireAfterSeconds=ttl)
+        except OperationFailure:
+            # The TTL index exists with another expiry; change it in place
+            await self.collection.database.command(
+                "collMod", self.collection.name, index={"keyPattern": {"created_at": 1}, "expireAfterSeconds": ttl})
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    @staticmethod
+    def _pack(vector: List[float]) -> Binary:
+        return Binary(array("f", vector).tobytes())
+
+    @staticmethod
+    def _unpack(data: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(data)
+        return vector.tolist()
+
+    async def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        missing = []
+        for key in keys:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                found[key] = self._lru[key]
+            else:
+                missing.append(key)
+        self.memory_hits += len(found)
+
+        if missing:
+            async for entry in self.collection.find({"_id": {"$in": missing}}, {"vector": 1}):
+                vector = self._unpack(entry["vector"])
+                found[entry["_id"]] = vector
+                self._remember(entry["_id"], vector)
+                self.mongo_hits += 1
+        return found
+
+    async def _store(self, kind: str, entries: Dict[str, List[float]]) -> None:
+        now = datetime.now(timezone.utc)
+        for key, vector in entries.items():
+            self._remember(key, vector)
+        try:
+            await self.collection.insert_many(
+                [
+                    {"_id": key, "model": self.model_name, "kind": kind, "vector": self._pack(vector), "created_at": now}
+                    for key, vector in entries.items()
+                ],
+                ordered=False,
+            )
+        except BulkWriteError:
+            # Another worker cached some of the same texts first
+            pass
+        except Exception as e:
+            self.logger.error(f"Error writing embedding cache entries: {str(e)}")
+
+    @metrics.instrument("embed_provider")
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        self.provider_calls += 1
+        return await scheduler.embedding.run(lambda: self.embedding.aembed_documents(texts))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        found = await self._lookup(list(dict.fromkeys(keys)))
+
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        self.misses += len(pending)
+
+        if pending:
+            pending_keys = list(pending)
+            batches = [pending_keys[i:i + self.batch_size] for i in range(0, len(pending_keys), self.batch_size)]
+            results = await asyncio.gather(*(self._embed_batch([pending[k] for k in batch]) for batch in batches))
+            computed = {key: vector for batch, vectors in zip(batches, results) for key, vector in zip(batch, vectors)}
+            await self._store("document", computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        found = await self._lookup([key])
+        if key in found:
+            return found[key]
+
+        self.misses += 1
+        self.provider_calls += 1
+        async with metrics.timer("embed_provider"):
+            vector = await scheduler.embedding.run(lambda: self.embedding.aembed_query(text))
+        await self._store("query", {key: vector})
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.mongo_hits
+        lookups = hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "provider_calls": self.provider_calls,
+            "memory_entries": len(self._lru),
+        }
@@ -1,26 +1,47 @@
 from langchain_core.output_parsers import JsonOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.runnables import RunnablePassthrough
+from langchain_core.outputs import ChatGeneration
 
 from fastapi import HTTPException
 
-import os, re
+import os, re, hashlib, json, time
+from typing import Any, Callable, Dict, Optional, Tuple
 from config import config
 
-from .prompt import cv_parser_prompt
-from .model import cv_parser
+from .prompt import cv_parser_prompt, cv_core_prompt, cv_scores_prompt
+from .model import cv_parser, cv_core_parser, cv_scores_parser
+from .normalize import NORMALIZER_VERSION, estimate_tokens
+from .scheduler import scheduler
+from utils.metrics import metrics
 
 
 os.environ["GOOGLE_API_KEY"] = config.GOOGLE_API_KEY
 
+LLM_MODELS = {
+    'gemini': "gemini-1.5-flash",
+}
+
 
 class LLMGenerator:
+    """LLM clients and prompt chains, built once and shared (see llm_generator).
+
+    The Gemini client library is only imported when the first client is
+    built, which keeps it out of the import time of the app."""
+
     def __init__(self):
         self._set_environment_variables()
         self.llm_cache: Dict[str, Any] = {}
         self.prompt_cache: Dict[str, Any] = {
-            'cv_parser': cv_parser_prompt
+            'cv_parser': cv_parser_prompt,
+            'cv_core': cv_core_prompt,
+            'cv_scores': cv_scores_prompt,
         }
+        self.parser_cache: Dict[str, Any] = {
+            'cv_parser': cv_parser,
+            'cv_core': cv_core_parser,
+            'cv_scores': cv_scores_parser,
+        }
+        self.chain_cache: Dict[Tuple[str, str], Any] = {}
 
     def _set_environment_variables(self):
         os.environ["GOOGLE_API_KEY"] = config.GOOGLE_API_KEY
@@ -29,7 +50,9 @@ class LLMGenerator:
     def get_llm(self, llm_name: str):
         if llm_name not in self.llm_cache:
             if llm_name == 'gemini':
-                self.llm_cache[llm_name] = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature = 0.1)
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                self.llm_cache[llm_name] = ChatGoogleGenerativeAI(model=LLM_MODELS[llm_name], temperature = 0.1)
             else:
                 raise ValueError(f"LLM {llm_name} not found.")
         return self.llm_cache[llm_name]
@@ -40,20 +63,99 @@ class LLMGenerator:
             raise ValueError(f"Prompt {llm_type} not found.")
         return self.prompt_cache[llm_type]
 
-    async def generate_parsed_cv(self, llm_type: str, cv: str, llm_name: str = 'gemini'):
-        llm = self.get_llm(llm_name)
-        prompt = self.get_prompt(llm_type)
-        if llm_type == 'cv_parser':
-            chain = (
+    def get_chain(self, llm_type: str, llm_name: str = 'gemini'):
+        key = (llm_type, llm_name)
+        if key not in self.chain_cache:
+            self.chain_cache[key] = (
                 {'cv': RunnablePassthrough()}
-                | prompt
-                | llm
-                | cv_parser
+                | self.get_prompt(llm_type)
+                | self.get_llm(llm_name)
             )
+        return self.chain_cache[key]
+
+    def warm_up(self, llm_name: str = 'gemini') -> None:
+        """Build the client and every chain now rather than on the first parse"""
+        for llm_type in self.parser_cache:
+            self.get_chain(llm_type, llm_name)
+
+    def get_version(self, llm_type: str, llm_name: str = 'gemini') -> str:
+        """Fingerprint of the prompt, model and output schema used for a parse.
+
+        Any change to one of them, or to the input normalization, yields a
+        new version, so cached parses made with an older setup are never
+        reused."""
+        if llm_name not in LLM_MODELS:
+            raise ValueError(f"LLM {llm_name} not found.")
+        prompt = self.get_prompt(llm_type)
+        fingerprint = json.dumps({
+            "llm_type": llm_type,
+            "model": LLM_MODELS[llm_name],
+            "template": prompt.template,
+            "partials": prompt.partial_variables,
+            "normalizer": NORMALIZER_VERSION,
+            "max_input_tokens": config.PARSE_MAX_INPUT_TOKENS,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    async def _stream(chain, inputs: Dict[str, Any], parser, on_partial: Callable[[Dict[str, Any]], Any]):
+        """Stream the LLM output, reporting each new partial parse; returns the whole message"""
+        message = None
+        last = None
+        async for chunk in chain.astream(inputs):
+            message = chunk if message is None else message + chunk
+            partial = parser.parse_result([ChatGeneration(message=message)], partial=True)
+            if partial and partial != last:
+                last = partial
+                await on_partial(partial)
+        return message
+
+    @metrics.instrument("llm_generate")
+    async def generate(self, llm_type: str, cv: str, llm_name: str = 'gemini',
+                       on_partial: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Parse cv with the llm_type prompt; returns the result and the token usage of the call.
 
-            result = await chain.ainvoke({"cv": cv})
+        With on_partial, the output is streamed and on_partial is awaited
+        with every new partial object (a retry starts over from an empty
+        one). The result is parsed from the complete output either way, so
+        it does not depend on streaming."""
+        if llm_type not in self.parser_cache:
+            raise ValueError(f"Prompt {llm_type} not found.")
+        chain = self.get_chain(llm_type, llm_name)
+        prompt = self.get_prompt(llm_type)
+        parser = self.parser_cache[llm_type]
+
+        prompt_tokens = estimate_tokens(prompt.format(cv=cv))
+        started = time.perf_counter()
+        if on_partial is None:
+            call = lambda: chain.ainvoke({"cv": cv})
+        else:
+            call = lambda: self._stream(chain, {"cv": cv}, parser, on_partial)
+        message = await scheduler.chat.run(
+            call,
+            estimated_tokens=prompt_tokens + config.PARSE_EXPECTED_OUTPUT_TOKENS,
+            actual_tokens=lambda m: (getattr(m, "usage_metadata", None) or {}).get("total_tokens"),
+        )
+        latency = time.perf_counter() - started
+        result = await parser.ainvoke(message)
         if result is None:
             raise HTTPException(status_code=500, detail="Error parsing the CV")
+
+        usage = getattr(message, "usage_metadata", None) or {}
+        metrics.record_tokens(LLM_MODELS[llm_name], llm_type, usage.get("input_tokens"), usage.get("output_tokens"))
+        return result, {
+            "model": LLM_MODELS[llm_name],
+            "input_tokens": usage.get("input_tokens"),
+            "output_tokens": usage.get("output_tokens"),
+            "total_tokens": usage.get("total_tokens"),
+            "latency_ms": round(latency * 1000, 1),
+        }
+
+    async def generate_parsed_cv(self, llm_type: str, cv: str, llm_name: str = 'gemini',
+                                 on_partial: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        result, _ = await self.generate(llm_type, cv, llm_name, on_partial)
         return result
 
 
+# Shared by every parse of the process
+llm_generator = LLMGenerator()
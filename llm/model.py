@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
 from typing import Optional, List
 from langchain_core.output_parsers import JsonOutputParser
 
@@ -114,4 +114,21 @@ class CV(BaseModel):
     rating: int = Field(ge = 1, le = 1000, description="Rating of the provided CV based on key criteria such as work experience, skills, qualifications, and overall presentation. Rate on a scale of 1 to 1000.")
 
 
-cv_parser = JsonOutputParser(pydantic_object=CV)
\ No newline at end of file
+# Split parse mode: contact fields come from llm.contact, scores and rating from a second, lazy prompt
+CONTACT_FIELDS = ("email", "phone_number", "linkedin_url", "git_url", "website")
+SCORE_FIELDS = ("scores", "rating")
+
+CVCore = create_model(
+    "CVCore",
+    **{name: (field.annotation, field) for name, field in CV.model_fields.items()
+       if name not in CONTACT_FIELDS + SCORE_FIELDS}
+)
+
+class CVScores(BaseModel):
+    scores: Scores = CV.model_fields["scores"]
+    rating: int = CV.model_fields["rating"]
+
+
+cv_parser = JsonOutputParser(pydantic_object=CV)
+cv_core_parser = JsonOutputParser(pydantic_object=CVCore)
+cv_scores_parser = JsonOutputParser(pydantic_object=CVScores)
\ No newline at end of file
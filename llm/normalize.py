@@ -0,0 +1,84 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import List
+
+__all__ = ["normalize_pages", "estimate_tokens", "truncate_to_tokens", "NORMALIZER_VERSION"]
+
+# Bump when the normalization changes, so cached parses of the old input are not reused
+NORMALIZER_VERSION = "1"
+
+# Rough characters per token for Latin-script CV text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Only letter-hyphen-newline-lowercase, so date ranges such as "2019-\n2021" stay intact
+_HYPHENATED = re.compile(r"([^\W\d_])[-\u00ad]\n([a-z])")
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200b\u3000]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+# "3", "Page 3", "3 of 5", "3/5"; four digits would be a year
+_PAGE_NUMBER = re.compile(r"^(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?$", re.IGNORECASE)
+_BULLETS = re.compile(r"^[•●▪■‣⁃◦*]+\s*", re.MULTILINE)
+
+
+def _clean_page(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n".join(_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    text = _HYPHENATED.sub(r"\1\2", text)
+    text = text.replace("\u00ad", "")
+    text = _BULLETS.sub("- ", text)
+    return text.split("\n")
+
+
+def _repeated_edges(pages: List[List[str]], depth: int = 3) -> set:
+    """Lines seen at the top or bottom of most pages: running headers and footers"""
+    if len(pages) < 2:
+        return set()
+    seen = Counter()
+    for lines in pages:
+        content = [line for line in lines if line]
+        seen.update(set(content[:depth] + content[-depth:]))
+    threshold = max(2, (len(pages) + 1) // 2)
+    return {line for line, count in seen.items() if count >= threshold}
+
+
+def normalize_pages(pages: List[str]) -> str:
+    """Clean extracted PDF pages for the LLM.
+
+    Joins words hyphenated across line breaks, unifies bullets, collapses
+    whitespace runs and blank lines, and drops page numbers. Lines that
+    repeat at the top or bottom of most pages (running headers/footers) are
+    kept once, since they often hold the candidate's name and contact."""
+    cleaned = [_clean_page(page) for page in pages]
+    repeated = _repeated_edges(cleaned)
+
+    out = []
+    emitted = set()
+    for lines in cleaned:
+        kept = []
+        for line in lines:
+            if _PAGE_NUMBER.match(line):
+                continue
+            if line in repeated:
+                if line in emitted:
+                    continue
+                emitted.add(line)
+            kept.append(line)
+        out.append("\n".join(kept).strip())
+    text = "\n\n".join(page for page in out if page)
+    return _BLANK_LINES.sub("\n\n", text)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, at a line break where possible"""
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max_tokens * CHARS_PER_TOKEN
+    cut = text.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = limit
+    return text[:cut].rstrip()
@@ -1,6 +1,9 @@
+from typing import Any, Dict, List
+
 from langchain_core.prompts import PromptTemplate
 
-from .model import cv_parser
+from config import config
+from .model import cv_parser, cv_core_parser, cv_scores_parser, CV, CVCore, CVScores
 
 
 PROMPT_CV_PARSER = """
@@ -19,4 +22,69 @@ Instructions:
    5. Only include details that has been speicifically mentioned on the <cv> input.
 """
 
-cv_parser_prompt = PromptTemplate(template = PROMPT_CV_PARSER, input_variables = {"cv"}, partial_variables = {"format_instructions": cv_parser.get_format_instructions()})
+PROMPT_CV_SCORES = """
+<input>
+{cv}
+<input>
+
+<instructions>
+The input is a CV already parsed into JSON. Score it.
+   1. Output ONLY valid JSON, starting with '{{' and ending with '}}', with no backticks or text around it.
+   2. Follow these format instructions:
+   {format_instructions}
+   3. Keep every reason to one or two short sentences.
+   4. Base the scores only on what the input contains.
+"""
+
+
+def _describe(schema: Dict[str, Any], defs: Dict[str, Any], indent: int) -> List[str]:
+    """One line per field: name: type - description, nested objects indented below"""
+    lines = []
+    pad = "  " * indent
+    for name, field in schema.get("properties", {}).items():
+        description = field.get("description", "")
+        options = field.get("anyOf", [field])
+        nullable = any(option.get("type") == "null" for option in options)
+        field_type = next(option for option in options if option.get("type") != "null")
+
+        nested = None
+        if "$ref" in field_type:
+            nested = defs[field_type["$ref"].split("/")[-1]]
+            kind = "object"
+        elif field_type.get("type") == "array":
+            items = field_type.get("items", {})
+            if "$ref" in items:
+                nested = defs[items["$ref"].split("/")[-1]]
+                kind = "list of objects"
+            else:
+                kind = f"list of {items.get('type', 'string')}s"
+        else:
+            kind = field_type.get("type", "string")
+            if "minimum" in field_type and "maximum" in field_type:
+                kind += f" {field_type['minimum']}-{field_type['maximum']}"
+        if nullable:
+            kind += " or null"
+
+        lines.append(f"{pad}{name}: {kind}" + (f" - {description}" if description else ""))
+        if nested is not None:
+            lines.extend(_describe(nested, defs, indent + 1))
+    return lines
+
+
+def compact_format_instructions(model) -> str:
+    """Format instructions listing the fields of model, about half the size of the JSON schema dump"""
+    schema = model.model_json_schema()
+    lines = _describe(schema, schema.get("$defs", {}), 0)
+    return "Return one JSON object with exactly these keys (nested keys are indented):\n" + "\n".join(lines)
+
+
+def _format_instructions(model, parser) -> str:
+    return compact_format_instructions(model) if config.PARSE_COMPACT_INSTRUCTIONS else parser.get_format_instructions()
+
+
+format_instructions = _format_instructions(CV, cv_parser)
+
+cv_parser_prompt = PromptTemplate(template = PROMPT_CV_PARSER, input_variables = {"cv"}, partial_variables = {"format_instructions": format_instructions})
+# Split mode: everything but contacts and scores, then scores from the parsed JSON
+cv_core_prompt = PromptTemplate(template = PROMPT_CV_PARSER, input_variables = {"cv"}, partial_variables = {"format_instructions": _format_instructions(CVCore, cv_core_parser)})
+cv_scores_prompt = PromptTemplate(template = PROMPT_CV_SCORES, input_variables = {"cv"}, partial_variables = {"format_instructions": _format_instructions(CVScores, cv_scores_parser)})
@@ -0,0 +1,260 @@
+import asyncio
+import functools
+import logging
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from config import config
+
+__all__ = ["TokenBucket", "AdaptiveConcurrency", "RateScheduler", "LLMScheduler", "scheduler", "is_rate_limited", "is_retryable"]
+
+T = TypeVar("T")
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "Aborted", "RetryError",
+}
+
+
+_RATE_LIMIT_NAMES = ("ResourceExhausted", "TooManyRequests")
+# Only for errors that carry neither a known type nor a status, e.g. re-raised by a wrapper as a bare Exception
+_RATE_LIMIT_MESSAGE = re.compile(r"\b429\b|resource(?: has been)?[ _]exhausted|rate[ _-]?limit|quota exceeded|exceeded (?:your |the )?(?:current )?quota", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1)
+def _rate_limit_types() -> tuple:
+    """google.api_core's quota errors, imported on first use like the rest of the Gemini stack"""
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return ()
+    return (exceptions.ResourceExhausted, exceptions.TooManyRequests)
+
+
+def _status(error: BaseException) -> Optional[int]:
+    for source in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "code"):
+            value = getattr(source, attribute, None)
+            if callable(value):
+                continue
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Quota errors (HTTP 429 / gRPC RESOURCE_EXHAUSTED), by type or status first.
+
+    The error and the one it was raised from are checked; a known status
+    other than 429 is not a rate limit whatever its message says ("429" in
+    a request id, "quota project" in a 403)."""
+    for candidate in (error, error.__cause__):
+        if candidate is None:
+            continue
+        if isinstance(candidate, _rate_limit_types()) or type(candidate).__name__ in _RATE_LIMIT_NAMES:
+            return True
+        status = _status(candidate)
+        if status is not None:
+            return status == 429
+    return bool(_RATE_LIMIT_MESSAGE.search(str(error)))
+
+
+def is_retryable(error: BaseException) -> bool:
+    if is_rate_limited(error):
+        return True
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in _RETRYABLE_ERRORS:
+        return True
+    return _status(error) in _RETRYABLE_STATUS
+
+
+class TokenBucket:
+    """Token bucket refilled at rate_per_minute, holding at most one minute's worth"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        if not self.enabled:
+            return
+        amount = min(amount, self.capacity)
+        # Waiters are served in order, so a large request is not starved by small ones
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Charge (positive) or refund (negative) the difference between estimated and actual usage"""
+        if not self.enabled:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveConcurrency:
+    """Concurrency limit adjusted by additive increase / multiplicative decrease.
+
+    Every success raises the limit by 1/limit (about +1 per round of calls);
+    a rate-limit error halves it. Only calls started after the last decrease
+    can trigger the next one, so a burst of 429s from calls that were
+    already in flight counts as a single signal.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 64):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self.epoch = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> int:
+        """Wait for a slot; returns the epoch to pass to on_throttle"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            return self.epoch
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self, epoch: int) -> None:
+        if epoch == self.epoch:
+            self.limit = max(self.minimum, self.limit / 2)
+            self.epoch += 1
+
+
+class RateScheduler:
+    """Runs calls against one provider quota.
+
+    Calls wait for a request token and their estimated tokens, then for a
+    slot under the adaptive concurrency limit. Retryable errors are retried
+    with full-jitter exponential backoff; a rate-limit error also halves the
+    concurrency and holds back every caller of this quota until the backoff
+    has passed.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 initial_concurrency: int = 4, max_concurrency: int = 32, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._blocked_until = 0.0
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.logger = logging.getLogger(__name__)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(self, call: Callable[[], Awaitable[T]], estimated_tokens: int = 0,
+                  actual_tokens: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """Run call() under the quota; actual_tokens(result) reconciles the token estimate"""
+        for attempt in range(self.max_retries + 1):
+            wait = self._blocked_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+
+            epoch = await self.concurrency.acquire()
+            try:
+                self.calls += 1
+                result = await call()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt)
+                if is_rate_limited(e):
+                    self.throttled += 1
+                    self.concurrency.on_throttle(epoch)
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                self.retries += 1
+                self.logger.warning(
+                    f"{self.name} call failed ({type(e).__name__}: {e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+                )
+            else:
+                self.concurrency.on_success()
+                if actual_tokens is not None:
+                    used = actual_tokens(result)
+                    if used is not None:
+                        self.tokens.adjust(used - estimated_tokens)
+                return result
+            finally:
+                await self.concurrency.release()
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+        }
+
+
+class LLMScheduler:
+    """Quota schedulers shared by every LLM and embedding call of the process"""
+
+    def __init__(self):
+        self.chat = RateScheduler(
+            "chat",
+            requests_per_minute=config.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=config.LLM_TOKENS_PER_MINUTE,
+            initial_concurrency=config.LLM_INITIAL_CONCURRENCY,
+            max_concurrency=config.LLM_MAX_CONCURRENCY,
+            max_retries=config.LLM_MAX_RETRIES,
+            base_delay=config.LLM_RETRY_BASE_SECONDS,
+            max_delay=config.LLM_RETRY_MAX_SECONDS,
+        )
+        self.embedding = RateScheduler(
+            "embedding",
+            requests_per_minute=config.EMBEDDING_REQUESTS_PER_MINUTE,
+            initial_concurrency=config.LLM_INITIAL_CONCURRENCY,
+            max_concurrency=config.LLM_MAX_CONCURRENCY,
+            max_retries=config.LLM_MAX_RETRIES,
+            base_delay=config.LLM_RETRY_BASE_SECONDS,
+            max_delay=config.LLM_RETRY_MAX_SECONDS,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"chat": self.chat.stats(), "embedding": self.embedding.stats()}
+
+
+scheduler = LLMScheduler()
@@ -0,0 +1,55 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+__all__ = ["UsageLog"]
+
+
+class UsageLog:
+    """Records the token usage of every LLM parse.
+
+    One entry per call goes to the Mongo "parse_usage" collection (document
+    id, content hash, parser version, input/output tokens, latency and the
+    input size before and after normalization); running totals are kept in
+    process for the stats endpoint.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db.get_collection("parse_usage")
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latency_ms = 0.0
+        self.raw_chars = 0
+        self.input_chars = 0
+        self.logger = logging.getLogger(__name__)
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("document_id")
+        await self.collection.create_index("created_at")
+
+    async def record(self, entry: Dict[str, Any]) -> None:
+        self.calls += 1
+        self.input_tokens += entry.get("input_tokens") or 0
+        self.output_tokens += entry.get("output_tokens") or 0
+        self.latency_ms += entry.get("latency_ms") or 0.0
+        self.raw_chars += entry.get("raw_chars") or 0
+        self.input_chars += entry.get("input_chars") or 0
+        try:
+            await self.collection.insert_one({**entry, "created_at": datetime.now(timezone.utc)})
+        except Exception as e:
+            self.logger.error(f"Error recording parse usage: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "avg_input_tokens": self.input_tokens / self.calls if self.calls else 0.0,
+            "avg_output_tokens": self.output_tokens / self.calls if self.calls else 0.0,
+            "avg_latency_ms": self.latency_ms / self.calls if self.calls else 0.0,
+            # Share of the extracted text removed by normalization and truncation
+            "input_reduction": 1 - self.input_chars / self.raw_chars if self.raw_chars else 0.0,
+        }
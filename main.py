@@ -1,4 +1,12 @@
+import time
+
+# Time-to-ready is measured from here, the start of the app import
+_import_started = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
@@ -6,9 +14,69 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from utils.rate_limit import limiter
 
-from routes import document_route
+from config import config
+from database import database
+from routes import document_route, folder_route
+from worker import run_workers
+from utils.pdf_extract import extractor
+from utils.metrics import MetricsMiddleware, metrics
+from utils.uploads import UploadSizeLimitMiddleware
+from llm import scheduler
+
+async def _start(app: FastAPI):
+    """Work needed before the app is ready, run after the server accepts connections.
+
+    Index creation (and the facet/lexical index loads it triggers) runs
+    concurrently with importing the Gemini client library."""
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(
+            database.ensure_indexes(),
+            database.controller.vector_controller.warm_up(),
+        )
+        if config.JOB_WORKERS > 0:
+            app.state.job_workers = asyncio.create_task(run_workers(database, config.JOB_WORKERS))
+        if await database.controller.reindex_controller.resume(database):
+            print("Resumed the unfinished reindex")
+    except Exception as e:
+        app.state.startup_error = str(e)
+        print(f"Startup failed: {str(e)}")
+        raise
+    now = time.perf_counter()
+    app.state.startup.update({
+        "warm_up_s": round(now - started, 3),
+        "time_to_ready_s": round(now - _import_started, 3),
+    })
+    app.state.ready = True
+    print(f"Ready in {app.state.startup['time_to_ready_s']:.2f}s ({app.state.startup})")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    app.state.ready = False
+    app.state.startup_error = None
+    database.init_app()
+    app.state.startup = {
+        "import_s": round(started - _import_started, 3),
+        "init_s": round(time.perf_counter() - started, 3),
+    }
+    app.state.startup_task = asyncio.create_task(_start(app))
+    try:
+        yield
+    finally:
+        tasks = [app.state.startup_task, getattr(app.state, "job_workers", None)]
+        tasks = [task for task in tasks if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Records the checkpoint so the next start resumes from it
+        await database.controller.reindex_controller.stop()
+        extractor.shutdown()
+        database.close()
+
 
-app = FastAPI(title="CV Parser API")
+app = FastAPI(title="CV Parser API", lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -21,6 +89,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Before Starlette spools the multipart body to memory and disk
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=config.MAX_UPLOAD_REQUEST_BYTES, path_prefix="/document/upload")
+
+# Outermost, so the measured latency includes the other middleware
+app.add_middleware(MetricsMiddleware, metrics=metrics, server_timing=config.SERVER_TIMING)
+
 # Create documents directory if it doesn't exist
 os.makedirs("documents", exist_ok=True)
 
@@ -29,7 +103,41 @@ app.mount("/documents", StaticFiles(directory="documents"), name="documents")
 
 # Include routes
 app.include_router(document_route.router, prefix="/document", tags=["Documents"])
+app.include_router(folder_route.router, prefix="/folder", tags=["Folders"])
 
 @app.get("/")
 async def root():
     return {"message": "CV Parser API is running"}
+
+@app.get("/ready")
+async def ready():
+    """503 until startup has finished (indexes, clients, workers) and while Mongo is unreachable"""
+    state = {
+        "ready": app.state.ready,
+        "startup": app.state.startup,
+        "error": app.state.startup_error,
+    }
+    if app.state.ready and not await database.ping():
+        state.update(ready=False, error="database unreachable")
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+def _collect_metrics():
+    """Copy the scheduler and cache counters into the registry at scrape time"""
+    gauges = metrics.scheduler_state
+    for lane, stats in scheduler.stats().items():
+        gauges.set(stats["concurrency_limit"], lane=lane, state="concurrency_limit")
+        gauges.set(stats["in_flight"], lane=lane, state="in_flight")
+        metrics.scheduler_throttled.set(stats["throttled"], lane=lane)
+    if database.controller is not None:
+        vector_controller = database.controller.vector_controller
+        for cache, stats in (("parse", vector_controller.parse_cache.stats()), ("embedding", vector_controller.embedding.stats())):
+            for result in ("memory_hits", "mongo_hits", "misses"):
+                metrics.cache_lookups.set(stats[result], cache=cache, result=result)
+
+metrics.registry.add_collector(_collect_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from bson import ObjectId
 
 
@@ -9,6 +9,7 @@ class Document(BaseModel):
     document_name: str
     document_url: str
     folder_id: Optional[str] = None
+    content_hash: Optional[str] = None
 
     class Config:
         json_encoders = {ObjectId: str}
@@ -27,6 +28,13 @@ class DocumentSearchRequest(BaseModel):
     """Request model for document search"""
     query: str = Field(..., description="Search query string")
     limit: Optional[int] = Field(default=5, ge=1, le=20, description="Number of results to return")
+    fields: Optional[List[str]] = Field(default=None, description="parsed_cv fields to return, e.g. [\"name\", \"position\", \"scores\"]; all fields if omitted")
+    rank: Literal["best", "sum", "mean"] = Field(default="best", description="How chunk scores are combined per document")
+    folder_ids: Optional[List[str]] = Field(default=None, description="Only search CVs in these folders")
+    document_ids: Optional[List[str]] = Field(default=None, description="Only search these CVs")
+    mode: Optional[Literal["hybrid", "vector", "lexical"]] = Field(default=None, description="Search mode; config.SEARCH_MODE if omitted")
+    vector_weight: float = Field(default=1.0, ge=0, description="Weight of the vector ranking in hybrid mode")
+    lexical_weight: float = Field(default=1.0, ge=0, description="Weight of the BM25 ranking in hybrid mode")
 
 
 class DocumentSearchResponse(BaseModel):
@@ -42,11 +50,21 @@ class DocumentList(BaseModel):
 
 
 class Query(BaseModel):
+    """Request model for structured candidate filtering; prompt re-ranks the matches semantically"""
     address: Optional[str] | None = ""
     attribute: Optional[List[str]] | None = [""]
     prompt: Optional[str] | None = ""
     foldersToSearch: List[str] | None = [""]
     sort_order: Optional[str] = None  # Add this field (asc/desc)
+    skills: Optional[List[str]] = Field(default=None, description="Required skills (programming languages count as skills)")
+    programming_languages: Optional[List[str]] = Field(default=None, description="Required programming languages")
+    min_experience: Optional[float] = Field(default=None, ge=0, description="Minimum years of experience")
+    max_experience: Optional[float] = Field(default=None, ge=0, description="Maximum years of experience")
+    min_rating: Optional[int] = Field(default=None, ge=1, le=1000, description="Minimum CV rating")
+    max_rating: Optional[int] = Field(default=None, ge=1, le=1000, description="Maximum CV rating")
+    sort_by: Literal["rating", "years_of_experience"] = Field(default="rating", description="Sort key (ignored when prompt is set)")
+    limit: int = Field(default=20, ge=1, le=100, description="Number of results to return")
+    fields: Optional[List[str]] = Field(default=None, description="parsed_cv fields to return; all fields if omitted")
 
 
 class AvailabilityRequest(BaseModel):
@@ -1,9 +1,12 @@
 from http.client import responses
-from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Request
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, File, UploadFile, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from config import config
 from database import database
 from models.document import DocumentSearchRequest, DocumentList, Query as QueryModel
-from utils.rate_limit import limiter
+from llm import scheduler
+from utils.rate_limit import format_key, limiter
 
 router = APIRouter()
 
@@ -12,26 +15,197 @@ router = APIRouter()
 async def upload_document(
     request: Request,
     files: List[UploadFile] = File(...), 
+    folder_id: Optional[str] = None,
+    wait: bool = False
+):
+    """Upload CV documents and queue them for parsing.
+
+    Returns a job id right away; poll GET /document/jobs/{job_id} for progress.
+    Pass wait=true to parse within the request instead."""
+    try:
+        if wait:
+            return await database.controller.document_controller.upload_document(database, folder_id, files)
+        return await database.controller.document_controller.enqueue_upload(database, folder_id, files)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/upload/stream")
+@limiter.limit("5/minute")
+async def upload_document_stream(
+    request: Request,
+    file: UploadFile = File(...),
     folder_id: Optional[str] = None
 ):
-    """Upload and parse CV documents"""
+    """Upload one CV and stream its parse as server-sent events.
+
+    partial events carry the parsed_cv generated so far; the result event
+    is the same as an upload?wait=true result."""
     try:
-        response = await database.controller.document_controller.upload_document(database, folder_id, files)
-        return response
+        events = await database.controller.document_controller.stream_upload_document(database, folder_id, file)
+        return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/jobs/{job_id}")
+@limiter.limit("60/minute")
+async def get_job(request: Request, job_id: str):
+    """Get the progress of an ingestion job"""
+    job = await database.controller.job_controller.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _all_documents_limit(key: str) -> str:
+    # NDJSON exports read up to EXPORT_MAX_DOCUMENTS records each, so they get a lower limit of their own
+    return "10/minute" if key.startswith("ndjson:") else "60/minute"
+
+
 @router.get("/all")
+@limiter.limit(_all_documents_limit, key_func=format_key)
+async def get_all_documents(
+    request: Request,
+    limit: Optional[int] = Query(default=None, ge=1, le=config.EXPORT_MAX_DOCUMENTS),
+    after: Optional[str] = None,
+    fields: Optional[List[str]] = Query(default=None),
+    format: Literal["json", "ndjson"] = "json"
+):
+    """Get documents a page at a time.
+
+    Pass next_cursor from the previous page as after. fields limits the
+    parsed_cv fields returned. format=ndjson streams up to limit documents
+    (EXPORT_MAX_DOCUMENTS by default) after the cursor, one per line; pass
+    the last id as after to continue."""
+    try:
+        if format == "ndjson":
+            lines = database.controller.document_controller.stream_documents(
+                after=after, fields=fields, limit=limit or config.EXPORT_MAX_DOCUMENTS)
+            return StreamingResponse(lines, media_type="application/x-ndjson")
+        if limit is not None and limit > 500:
+            raise HTTPException(status_code=400, detail="limit must be at most 500, or use format=ndjson")
+        return await database.controller.document_controller.get_all_documents(limit=limit or 50, after=after, fields=fields)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/search")
+@limiter.limit("30/minute")
+async def search_documents(request: Request, search: DocumentSearchRequest):
+    """Semantic search over parsed CVs"""
+    try:
+        return await database.controller.document_controller.search_documents(
+            search.query, limit=search.limit, fields=search.fields, rank=search.rank,
+            folder_ids=search.folder_ids, document_ids=search.document_ids,
+            mode=search.mode, vector_weight=search.vector_weight, lexical_weight=search.lexical_weight
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/search/bulk")
+@limiter.limit("30/minute")
+async def search_documents_bulk(request: Request, documents: DocumentList, query: str, limit: int = Query(default=5, ge=1, le=20)):
+    """Semantic search restricted to the given documents"""
+    try:
+        return await database.controller.document_controller.search_documents(
+            query, limit=limit, document_ids=documents.document_ids
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/delete/bulk")
 @limiter.limit("10/minute")
-async def get_all_documents(request: Request):
-    """Get all documents"""
+async def delete_documents_bulk(request: Request, documents: DocumentList, background_tasks: BackgroundTasks):
+    """Delete many documents and their parsed CVs, vectors and files.
+
+    Returns an outcome per id (deleted, not_found or invalid); files are
+    removed after the response."""
+    try:
+        return await database.controller.document_controller.delete_documents(
+            documents.document_ids, database, background_tasks
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/filter")
+@limiter.limit("60/minute")
+async def filter_documents(request: Request, query: QueryModel):
+    """Filter and sort CVs by skills, languages, location, experience, rating and folder.
+
+    With a prompt, the filtered candidates are re-ranked by semantic similarity."""
     try:
-        documents = await database.controller.document_controller.get_all_documents()
-        return documents
+        return await database.controller.filter_controller.filter_documents(query, database)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post("/facets")
+@limiter.limit("60/minute")
+async def get_facets(request: Request, query: Optional[QueryModel] = None, top: int = Query(default=20, ge=1, le=200)):
+    """Candidate counts per skill, programming language, location, experience band and rating band.
+
+    Pass a filter body (as for /filter) or foldersToSearch to scope the counts."""
+    try:
+        return database.controller.filter_controller.facet_counts(query, top=top)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/reindex")
+@limiter.limit("5/minute")
+async def start_reindex(request: Request, reparse: bool = True):
+    """Reprocess CVs made with other parser, chunker or embedding versions, in the background.
+
+    A new chunker or embedding model only re-chunks and re-embeds the stored
+    parsed CVs. With reparse=false, CVs parsed with another prompt or model
+    are not sent to the LLM again. Resumes the unfinished run if there is one."""
+    try:
+        return await database.controller.reindex_controller.start(database, reparse=reparse)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/reindex")
+@limiter.limit("60/minute")
+async def get_reindex_status(request: Request):
+    """Get the progress of the current or last reindex"""
+    try:
+        return await database.controller.reindex_controller.get_status()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache/stats")
+@limiter.limit("10/minute")
+async def get_parse_cache_stats(request: Request):
+    """Get hit/miss counters of the parse and embedding caches, and LLM token usage"""
+    vector_controller = database.controller.vector_controller
+    return {
+        "parse": vector_controller.parse_cache.stats(),
+        "embedding": vector_controller.embedding.stats(),
+        "llm": vector_controller.parse_usage.stats(),
+        "scheduler": scheduler.stats(),
+    }
+
 @router.get("/{document_id}")
 @limiter.limit("10/minute")
 async def get_document(request: Request, document_id: str):
@@ -44,6 +218,23 @@ async def get_document(request: Request, document_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{document_id}/scores")
+@limiter.limit("10/minute")
+async def get_document_scores(request: Request, document_id: str):
+    """Get a CV's scores and rating.
+
+    In split parse mode they are not part of the upload result; the first
+    request computes them with a separate, smaller prompt and stores them."""
+    try:
+        scores = await database.controller.document_controller.get_scores(document_id, database)
+        if scores is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return scores
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/{document_id}")
 @limiter.limit("10/minute")
 async def delete_document(request: Request, document_id: str):
@@ -0,0 +1,105 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request
+from typing import Optional
+from database import database
+from models.folder import Folder, MoveFiles, Rename, ListFolder
+from utils.rate_limit import limiter
+
+router = APIRouter()
+
+@router.post("/create")
+@limiter.limit("30/minute")
+async def create_folder(request: Request, folder: Folder):
+    """Create a folder; documents listed in document_id are moved into it"""
+    try:
+        return await database.controller.folder_controller.create_folder(folder.name, folder.document_id, database)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/list")
+@limiter.limit("60/minute")
+async def list_folders(request: Request):
+    """Get every folder with its document count"""
+    try:
+        return await database.controller.folder_controller.list_folders()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/list")
+@limiter.limit("60/minute")
+async def list_given_folders(request: Request, folders: ListFolder):
+    """Get the given folders (all of them if folder_ids is empty) with their document counts"""
+    try:
+        return await database.controller.folder_controller.list_folders(folders.folder_ids)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/move")
+@limiter.limit("30/minute")
+async def move_files(request: Request, move: MoveFiles):
+    """Move documents to to_folder (no folder if empty).
+
+    With from_folder, documents that are not in it are left where they are."""
+    try:
+        return await database.controller.folder_controller.move_documents(
+            move.document_id, move.from_folder or None, move.to_folder or None, database
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/rename")
+@limiter.limit("30/minute")
+async def rename_folder(request: Request, rename: Rename):
+    """Rename a folder"""
+    if not rename.folder_id or not rename.new_name:
+        raise HTTPException(status_code=400, detail="folder_id and new_name are required")
+    try:
+        return await database.controller.folder_controller.rename_folder(rename.folder_id, rename.new_name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{folder_id}")
+@limiter.limit("60/minute")
+async def get_folder(
+    request: Request,
+    folder_id: str,
+    limit: int = Query(default=50, ge=1, le=500),
+    after: Optional[str] = None
+):
+    """Get a folder and a page of its documents; pass next_cursor as after for the next page"""
+    try:
+        return await database.controller.folder_controller.get_folder(folder_id, limit=limit, after=after)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/{folder_id}")
+@limiter.limit("10/minute")
+async def delete_folder(request: Request, folder_id: str, background_tasks: BackgroundTasks, delete_documents: bool = False):
+    """Delete a folder.
+
+    Its documents are left without a folder, or deleted with delete_documents=true."""
+    try:
+        return await database.controller.folder_controller.delete_folder(
+            folder_id, database, delete_documents=delete_documents, background_tasks=background_tasks
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
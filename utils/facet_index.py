@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+# (label, lower bound inclusive, upper bound exclusive)
+EXPERIENCE_BANDS = [("0-1", 0, 1), ("1-3", 1, 3), ("3-5", 3, 5), ("5-10", 5, 10), ("10+", 10, None)]
+RATING_BANDS = [("1-199", 0, 200), ("200-399", 200, 400), ("400-599", 400, 600), ("600-799", 600, 800), ("800-1000", 800, None)]
+
+TERM_FIELDS = ("skills", "programming_languages", "location", "folder_id")
+NUMERIC_FIELDS = ("years_of_experience", "rating")
+
+
+def _bitmap(rows: List[int]) -> int:
+    """The int with the given bits set, built in one pass over a byte array"""
+    bits = bytearray(max(rows) // 8 + 1)
+    for row in rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bits, "little")
+
+
+class FacetIndex:
+    """In-memory bitmap index of the filterable CV fields, for facet counts.
+
+    Every CV gets a row number; for each distinct value of a field the index
+    keeps a bitmap (a Python int) of the rows that have it. A facet count is
+    then popcount(value bitmap & scope bitmap), where the scope (a folder or
+    a filter) is itself an AND/OR of bitmaps. A re-added CV keeps its row;
+    rows of deleted CVs are cleared and only reclaimed by the next full
+    load, which numbers the rows afresh.
+
+    The index is built from the normalized "filters" of the cv collection
+    (see controllers.filter_controller.cv_filter_fields) at startup, kept up
+    to date on ingest, delete and folder moves in this process, and reloaded in the
+    background every FACET_REFRESH_SECONDS to pick up other processes.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, refresh_seconds: float = 300.0):
+        self.cv_collection = db.get_collection("cv")
+        self.refresh_seconds = refresh_seconds
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._loaded = 0.0
+        self._reload_task: Optional[asyncio.Task] = None
+        # Changes made while a load is reading the collection, replayed on top of it
+        self._journal: Optional[List[Tuple[str, Any]]] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._rows: Dict[str, int] = {}
+        self._row_values: Dict[int, List[Tuple[str, Any]]] = {}
+        self._bitmaps: Dict[str, Dict[Any, int]] = {field: {} for field in TERM_FIELDS + NUMERIC_FIELDS}
+        self._alive = 0
+        self._next_row = 0
+
+    # Maintenance
+
+    @staticmethod
+    def _entries(filters: Dict[str, Any], folder_id: Optional[str]) -> List[Tuple[str, Any]]:
+        entries = [(field, value) for field in TERM_FIELDS[:3] for value in filters.get(field) or []]
+        if folder_id:
+            entries.append(("folder_id", folder_id))
+        for field in NUMERIC_FIELDS:
+            if filters.get(field) is not None:
+                entries.append((field, filters[field]))
+        return entries
+
+    def _remove_row(self, row: int) -> None:
+        bit = 1 << row
+        for field, value in self._row_values.pop(row, []):
+            bitmaps = self._bitmaps[field]
+            bitmaps[value] &= ~bit
+            if not bitmaps[value]:
+                del bitmaps[value]
+        self._alive &= ~bit
+
+    def _add(self, doc_id: str, filters: Dict[str, Any], folder_id: Optional[str]) -> None:
+        row = self._rows.pop(doc_id, None)
+        if row is not None:
+            self._remove_row(row)
+        else:
+            row = self._next_row
+            self._next_row += 1
+        bit = 1 << row
+        entries = self._entries(filters, folder_id)
+        for field, value in entries:
+            bitmaps = self._bitmaps[field]
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+        self._rows[doc_id] = row
+        self._row_values[row] = entries
+        self._alive |= bit
+
+    def _remove(self, doc_ids: Iterable[str]) -> None:
+        for doc_id in doc_ids:
+            row = self._rows.pop(doc_id, None)
+            if row is not None:
+                self._remove_row(row)
+
+    def _set_folder(self, doc_ids: Iterable[str], folder_id: Optional[str]) -> None:
+        bitmaps = self._bitmaps["folder_id"]
+        for doc_id in doc_ids:
+            row = self._rows.get(doc_id)
+            if row is None:
+                continue
+            bit = 1 << row
+            entries = []
+            for field, value in self._row_values[row]:
+                if field == "folder_id":
+                    bitmaps[value] &= ~bit
+                    if not bitmaps[value]:
+                        del bitmaps[value]
+                else:
+                    entries.append((field, value))
+            if folder_id:
+                entries.append(("folder_id", folder_id))
+                bitmaps[folder_id] = bitmaps.get(folder_id, 0) | bit
+            self._row_values[row] = entries
+
+    def add(self, doc_id: str, filters: Dict[str, Any], folder_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._add(doc_id, filters, folder_id)
+            if self._journal is not None:
+                self._journal.append(("add", (doc_id, filters, folder_id)))
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        doc_ids = list(doc_ids)
+        with self._lock:
+            self._remove(doc_ids)
+            if self._journal is not None:
+                self._journal.append(("remove", doc_ids))
+
+    def set_folder(self, doc_ids: Iterable[str], folder_id: Optional[str]) -> None:
+        doc_ids = list(doc_ids)
+        with self._lock:
+            self._set_folder(doc_ids, folder_id)
+            if self._journal is not None:
+                self._journal.append(("folder", (doc_ids, folder_id)))
+
+    @classmethod
+    def _build(cls, records: List[Tuple[str, Dict[str, Any], Optional[str]]]) -> "FacetIndex":
+        """A fresh index of the records: the rows of each value are collected first, then each bitmap is built once"""
+        fresh = cls.__new__(cls)
+        fresh._reset()
+        value_rows: Dict[str, Dict[Any, List[int]]] = {field: {} for field in fresh._bitmaps}
+        for doc_id, filters, folder_id in records:
+            row = fresh._rows.get(doc_id)
+            if row is None:
+                row = fresh._rows[doc_id] = fresh._next_row
+                fresh._next_row += 1
+            entries = cls._entries(filters, folder_id)
+            for field, value in entries:
+                value_rows[field].setdefault(value, []).append(row)
+            fresh._row_values[row] = entries
+        fresh._alive = (1 << fresh._next_row) - 1
+        fresh._bitmaps = {
+            field: {value: _bitmap(rows) for value, rows in values.items()}
+            for field, values in value_rows.items()
+        }
+        return fresh
+
+    def _install(self, records: List[Tuple[str, Dict[str, Any], Optional[str]]]) -> None:
+        fresh = self._build(records)
+        with self._lock:
+            for op, args in self._journal:
+                if op == "add":
+                    fresh._add(*args)
+                elif op == "folder":
+                    fresh._set_folder(*args)
+                else:
+                    fresh._remove(args)
+            self._rows, self._row_values, self._bitmaps = fresh._rows, fresh._row_values, fresh._bitmaps
+            self._alive, self._next_row = fresh._alive, fresh._next_row
+
+    async def load(self) -> None:
+        """Rebuild the index from the cv collection; the bitmaps are built in a thread"""
+        with self._lock:
+            self._journal = []
+        try:
+            records = [
+                (str(cv["_id"]), cv.get("filters") or {}, cv.get("folder_id"))
+                async for cv in self.cv_collection.find({}, {"filters": 1, "folder_id": 1}).batch_size(1000)
+            ]
+            await asyncio.to_thread(self._install, records)
+        finally:
+            with self._lock:
+                self._journal = None
+        self._loaded = time.monotonic()
+
+    def _schedule_reload(self) -> None:
+        if time.monotonic() - self._loaded < self.refresh_seconds:
+            return
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self.load())
+
+    # Queries
+
+    def _numeric_bitmap(self, field: str, low: Optional[float], high: Optional[float], inclusive_high: bool = True) -> int:
+        bitmap = 0
+        for value, rows in self._bitmaps[field].items():
+            if low is not None and value < low:
+                continue
+            if high is not None and (value > high if inclusive_high else value >= high):
+                continue
+            bitmap |= rows
+        return bitmap
+
+    def _scope(self, skills=(), programming_languages=(), location=(), folder_ids=(),
+               experience=(None, None), rating=(None, None)) -> int:
+        scope = self._alive
+        for field, values in (("skills", skills), ("programming_languages", programming_languages), ("location", location)):
+            for value in values:
+                scope &= self._bitmaps[field].get(value, 0)
+        if folder_ids:
+            folders = 0
+            for folder_id in folder_ids:
+                folders |= self._bitmaps["folder_id"].get(folder_id, 0)
+            scope &= folders
+        for field, (low, high) in (("years_of_experience", experience), ("rating", rating)):
+            if low is not None or high is not None:
+                scope &= self._numeric_bitmap(field, low, high)
+        return scope
+
+    def counts(self, top: int = 20, **scope) -> Dict[str, Any]:
+        """Facet counts within the scope; term facets keep their top values"""
+        self._schedule_reload()
+        with self._lock:
+            bitmap = self._scope(**scope)
+            result: Dict[str, Any] = {"total": bitmap.bit_count()}
+            for field, name in (("skills", "skills"), ("programming_languages", "programming_languages"), ("location", "address")):
+                counts = [(value, (rows & bitmap).bit_count()) for value, rows in self._bitmaps[field].items()]
+                counts = sorted((c for c in counts if c[1]), key=lambda c: (-c[1], c[0]))[:top]
+                result[name] = dict(counts)
+            for field, bands in (("years_of_experience", EXPERIENCE_BANDS), ("rating", RATING_BANDS)):
+                result[field] = {
+                    label: (self._numeric_bitmap(field, low, high, inclusive_high=False) & bitmap).bit_count()
+                    for label, low, high in bands
+                }
+            # CVs not scored yet are in no rating band
+            result["rating"]["unrated"] = (bitmap & ~self._numeric_bitmap("rating", None, None)).bit_count()
+        return result
@@ -0,0 +1,256 @@
+"""Prometheus metrics and per-request timing breakdowns.
+
+A small in-process registry rendering the Prometheus text format, so the
+hot path pays a dict lookup and a bisect per observation and nothing else.
+Everything is updated from the event loop; no locking.
+
+    async with metrics.timer("search"):
+        ...
+
+records the latency histogram, in-flight gauge and error counter of the
+operation, and adds its duration to the Server-Timing header of the
+current request (see MetricsMiddleware).
+"""
+import functools
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+__all__ = ["Counter", "Gauge", "Histogram", "Registry", "Metrics", "MetricsMiddleware", "metrics"]
+
+# Seconds; covers cached lookups (sub-millisecond) up to slow LLM parses
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Operation name -> accumulated seconds, for the request being served
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value: float, **labels) -> None:
+        """Mirror a total kept elsewhere (e.g. cache hit counters)"""
+        self.values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative, last is +Inf), sum]
+        self.values: Dict[Tuple[Any, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered.")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collect: Callable[[], None]) -> None:
+        """collect() runs before every scrape, to copy values kept elsewhere into metrics"""
+        self.collectors.append(collect)
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+class Metrics:
+    """The metrics of the app"""
+
+    def __init__(self, registry: Optional[Registry] = None):
+        self.registry = registry or Registry()
+        register = self.registry.register
+        self.operation_seconds = register(Histogram(
+            "cv_parser_operation_seconds", "Latency of instrumented operations", ("operation",)))
+        self.operation_in_flight = register(Gauge(
+            "cv_parser_operation_in_flight", "Instrumented operations currently running", ("operation",)))
+        self.operation_errors = register(Counter(
+            "cv_parser_operation_errors_total", "Instrumented operations that raised", ("operation", "error")))
+        self.stage_wait_seconds = register(Histogram(
+            "cv_parser_pipeline_wait_seconds", "Time waiting for an ingestion pipeline stage slot", ("stage",)))
+        self.llm_tokens = register(Counter(
+            "cv_parser_llm_tokens_total", "LLM tokens used", ("model", "prompt", "direction")))
+        self.http_seconds = register(Histogram(
+            "cv_parser_http_request_seconds", "HTTP request latency until the response starts", ("method", "route", "status")))
+        self.http_in_flight = register(Gauge(
+            "cv_parser_http_requests_in_flight", "HTTP requests being served"))
+        # Copied from llm.scheduler and the caches when scraped
+        self.scheduler_state = register(Gauge(
+            "cv_parser_llm_scheduler", "Adaptive concurrency limit and calls in flight per quota", ("lane", "state")))
+        self.scheduler_throttled = register(Counter(
+            "cv_parser_llm_throttled_total", "Rate-limit errors from the provider", ("lane",)))
+        self.cache_lookups = register(Counter(
+            "cv_parser_cache_lookups_total", "Parse and embedding cache lookups by result", ("cache", "result")))
+
+    @asynccontextmanager
+    async def timer(self, operation: str):
+        self.operation_in_flight.inc(operation=operation)
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.operation_errors.inc(operation=operation, error=type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.operation_in_flight.dec(operation=operation)
+            self.operation_seconds.observe(elapsed, operation=operation)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings[operation] = timings.get(operation, 0.0) + elapsed
+
+    def instrument(self, operation: str):
+        """Decorator timing every call of an async function as operation"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                async with self.timer(operation):
+                    return await fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_tokens(self, model: str, prompt: str, input_tokens: Optional[int], output_tokens: Optional[int]) -> None:
+        if input_tokens:
+            self.llm_tokens.inc(input_tokens, model=model, prompt=prompt, direction="input")
+        if output_tokens:
+            self.llm_tokens.inc(output_tokens, model=model, prompt=prompt, direction="output")
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request, and adding a Server-Timing header.
+
+    The header lists the time spent per instrumented operation during the
+    request (overlapping operations each count in full), plus the total.
+    Plain ASGI rather than BaseHTTPMiddleware, so streaming responses pass
+    through untouched."""
+
+    def __init__(self, app, metrics: "Metrics", server_timing: bool = True):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+        self.metrics.http_in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - started
+                route = scope.get("route")
+                self.metrics.http_seconds.observe(
+                    elapsed, method=scope["method"], route=getattr(route, "path", "unmatched"), status=status)
+                if self.server_timing:
+                    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+                    entries.append(f"total;dur={elapsed * 1000:.1f}")
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", ", ".join(entries).encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.http_in_flight.dec()
+            _request_timings.reset(token)
+
+
+metrics = Metrics()
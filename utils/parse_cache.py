@@ -0,0 +1,126 @@
+import asyncio
+import copy
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from config import config
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file on disk, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Content-addressed cache of LLM parse results.
+
+    Entries are keyed by the SHA-256 of the uploaded PDF plus the parser
+    version (prompt/model/schema fingerprint). Lookups go through an
+    in-process LRU first and fall back to the Mongo "parse_cache" collection.
+    Concurrent requests for the same key share a single LLM call.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, max_entries: int = config.PARSE_CACHE_SIZE):
+        self.collection = db.get_collection("parse_cache")
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def make_key(content_hash: str, version: str) -> str:
+        return f"{content_hash}:{version}"
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.memory_hits += 1
+            return copy.deepcopy(self._lru[key])
+
+        entry = await self.collection.find_one({"_id": key}, {"parsed_cv": 1})
+        if entry:
+            self.mongo_hits += 1
+            self._remember(key, entry["parsed_cv"])
+            return copy.deepcopy(entry["parsed_cv"])
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._remember(key, copy.deepcopy(value))
+        content_hash, _, version = key.partition(":")
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "content_hash": content_hash,
+                "version": version,
+                "parsed_cv": value,
+                "created_at": datetime.now(timezone.utc),
+            }},
+            upsert=True,
+        )
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        value = await compute()
+        try:
+            await self.set(key, value)
+        except Exception as e:
+            # A failed cache write must not fail the parse itself
+            self.logger.error(f"Error writing parse cache entry {key}: {str(e)}")
+        return value
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when nobody was waiting on it anymore
+        if not task.cancelled():
+            task.exception()
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return the cached parse for key, running compute() at most once per key.
+
+        compute() runs in a task owned by the cache, which every caller
+        awaits through a shield: a caller that is cancelled (a client that
+        went away) stops waiting without cancelling the others' parse, and
+        the result is still cached for the next request."""
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._compute(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            self.memory_hits += 1
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.mongo_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "llm_calls_saved": hits,
+            "memory_entries": len(self._lru),
+        }
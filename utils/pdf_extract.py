@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Set
+
+from config import config
+
+
+class ExtractionBudgetExceeded(Exception):
+    """Raised inside a pool worker when a PDF uses up its CPU budget"""
+
+
+def _budget_exceeded(signum, frame):
+    raise ExtractionBudgetExceeded("PDF text extraction exceeded its CPU budget")
+
+
+def extract_pages(document_url: str, max_pages: int, cpu_budget: float) -> List[str]:
+    """Extract the text of the first max_pages pages of a PDF.
+
+    Runs in a pool worker. On platforms with setitimer the extraction is
+    interrupted once it has used cpu_budget seconds of CPU time, so a
+    malformed PDF cannot pin a worker indefinitely."""
+    from pypdf import PdfReader
+
+    use_timer = cpu_budget > 0 and hasattr(signal, "setitimer")
+    if use_timer:
+        previous = signal.signal(signal.SIGPROF, _budget_exceeded)
+        signal.setitimer(signal.ITIMER_PROF, cpu_budget)
+    try:
+        reader = PdfReader(document_url)
+        return [page.extract_text() or "" for page in reader.pages[:max_pages]]
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, previous)
+
+
+def _serve(conn) -> None:
+    """Loop of a worker process: extract the PDFs sent over conn until it gets None"""
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        try:
+            conn.send((True, extract_pages(*job)))
+        except Exception as e:
+            try:
+                conn.send((False, e))
+            except Exception:
+                # The exception does not pickle
+                conn.send((False, RuntimeError(str(e))))
+
+
+class _Worker:
+    """One extraction process and the pipe to it"""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def call(self, job):
+        self.conn.send(job)
+        return self.conn.recv()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class PdfExtractor:
+    """Runs PDF text extraction in worker processes, off the event loop.
+
+    Each of the workers processes handles one PDF at a time, and a call
+    waits for an idle one before its timeout starts, so time spent queued
+    under load does not count. A worker that overruns the timeout (stuck
+    outside of Python code, where the CPU timer cannot interrupt it) or
+    dies is killed and replaced on its own; other calls are not affected."""
+
+    def __init__(self, workers: Optional[int] = None, max_pages: Optional[int] = None,
+                 cpu_budget: Optional[float] = None, timeout: Optional[float] = None):
+        self.workers = workers or config.EXTRACT_WORKERS
+        self.max_pages = max_pages or config.EXTRACT_MAX_PAGES
+        self.cpu_budget = config.EXTRACT_CPU_SECONDS if cpu_budget is None else cpu_budget
+        self.timeout = timeout or config.EXTRACT_TIMEOUT
+        self._context = multiprocessing.get_context()
+        # Idle workers; None stands for one not started yet (or killed)
+        self._idle: List[Optional[_Worker]] = []
+        self._busy: Set[_Worker] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Threads that wait on the workers' pipes, one per worker
+        self._waiters: Optional[ThreadPoolExecutor] = None
+        self.logger = logging.getLogger(__name__)
+
+    def _start(self) -> None:
+        if self._slots is None:
+            self._idle = [None] * self.workers
+            self._slots = asyncio.Semaphore(self.workers)
+            self._waiters = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pdf-extract")
+
+    async def extract(self, document_url: str) -> List[str]:
+        """Return the text of each page, capped at max_pages"""
+        self._start()
+        async with self._slots:
+            worker = self._idle.pop() or _Worker(self._context)
+            self._busy.add(worker)
+            loop = asyncio.get_running_loop()
+            job = (document_url, self.max_pages, self.cpu_budget)
+            try:
+                ok, value = await asyncio.wait_for(
+                    loop.run_in_executor(self._waiters, worker.call, job), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.logger.error(f"Extraction of {document_url} timed out after {self.timeout}s")
+                worker = self._discard(worker)
+                raise ExtractionBudgetExceeded(f"PDF text extraction timed out after {self.timeout}s")
+            except (EOFError, OSError):
+                self.logger.error(f"Extraction worker died while processing {document_url}")
+                worker = self._discard(worker)
+                raise BrokenProcessPool(f"Extraction worker died while processing {document_url}")
+            except asyncio.CancelledError:
+                # The worker is still busy with this PDF and cannot take another one
+                worker = self._discard(worker)
+                raise
+            finally:
+                if worker is not None:
+                    self._busy.discard(worker)
+                self._idle.append(worker)
+        if not ok:
+            raise value
+        return value
+
+    def _discard(self, worker: _Worker) -> None:
+        self._busy.discard(worker)
+        worker.kill()
+        return None
+
+    def shutdown(self) -> None:
+        for worker in self._idle:
+            if worker is not None:
+                worker.stop()
+        for worker in self._busy:
+            worker.kill()
+        self._idle, self._busy = [], set()
+        if self._waiters is not None:
+            self._waiters.shutdown(wait=True)
+        self._slots = self._waiters = None
+
+
+# Shared by the API process and job workers
+extractor = PdfExtractor()
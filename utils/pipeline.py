@@ -0,0 +1,49 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from config import config
+from utils.metrics import metrics
+
+
+class IngestPipeline:
+    """Per-stage concurrency limits for document ingestion.
+
+    Every file of an upload runs through the stages independently; a stage
+    only admits as many files at once as its limit allows, so cheap stages
+    (disk writes, Mongo) overlap with slow ones (extraction, LLM parse,
+    embeddings) without flooding any of them.
+    """
+
+    STAGES = ("write", "extract", "parse", "embed", "db")
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        limits = limits or {
+            "write": config.INGEST_WRITE_CONCURRENCY,
+            "extract": config.INGEST_EXTRACT_CONCURRENCY,
+            "parse": config.INGEST_PARSE_CONCURRENCY,
+            "embed": config.INGEST_EMBED_CONCURRENCY,
+            "db": config.INGEST_DB_CONCURRENCY,
+        }
+        self.limits = {stage: max(1, int(limits[stage])) for stage in self.STAGES}
+        self.semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in self.limits.items()}
+
+    def set_limit(self, name: str, limit: int) -> None:
+        """Change a stage's limit; only while no file is in that stage"""
+        self.limits[name] = max(1, int(limit))
+        self.semaphores[name] = asyncio.Semaphore(self.limits[name])
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        if name not in self.semaphores:
+            raise ValueError(f"Unknown pipeline stage {name}.")
+        waiting = time.perf_counter()
+        async with self.semaphores[name]:
+            metrics.stage_wait_seconds.observe(time.perf_counter() - waiting, stage=name)
+            async with metrics.timer(f"stage_{name}"):
+                yield
+
+
+# Shared by all requests so the limits hold across concurrent uploads
+pipeline = IngestPipeline()
@@ -3,4 +3,9 @@ from slowapi import Limiter
 from slowapi.util import get_remote_address
 
 # Initialize rate limiter using client IP address
-limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
+limiter = Limiter(key_func=get_remote_address)
+
+
+def format_key(request: Request) -> str:
+    """Client IP address prefixed with the requested response format, for routes limited per format"""
+    return f"{request.query_params.get('format', 'json')}:{get_remote_address(request)}"
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from config import config
+
+
+async def stream_upload(file: UploadFile, destination: str, max_bytes: Optional[int] = None,
+                        chunk_size: Optional[int] = None) -> Tuple[int, str]:
+    """Stream an uploaded file to destination in fixed-size chunks.
+
+    The SHA-256 of the content is computed while writing. Data goes to a
+    temporary file next to destination that is atomically renamed once
+    complete, so a partial upload never shows up under its final name.
+    Raises a 413 HTTPException once the copy exceeds max_bytes. By then
+    Starlette has already spooled the file; the request body as a whole is
+    limited while it is received, by UploadSizeLimitMiddleware.
+
+    Returns (size in bytes, hex digest).
+    """
+    max_bytes = max_bytes or config.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or config.UPLOAD_CHUNK_SIZE
+    directory = os.path.dirname(destination) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"{file.filename} exceeds the maximum upload size of {max_bytes} bytes"
+                    )
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+            await asyncio.to_thread(os.fsync, out.fileno())
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return size, digest.hexdigest()
+
+
+class UploadSizeLimitMiddleware:
+    """Reject upload requests whose body exceeds max_bytes before it is spooled.
+
+    A Content-Length above the limit is answered with 413 without reading
+    the body. Otherwise the body is counted as it is received, and the
+    request fails with 413 as soon as it crosses the limit.
+    """
+
+    def __init__(self, app, max_bytes: int, path_prefix: str):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds the maximum upload size of {self.max_bytes} bytes"
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing, so FastAPI turns it into the response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
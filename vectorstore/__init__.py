@@ -0,0 +1,4 @@
+from .base import *
+from .atlas import *
+from .local import *
+from .lexical import *
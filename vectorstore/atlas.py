@@ -0,0 +1,106 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson.objectid import ObjectId
+from langchain.schema import Document
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from .base import VectorStore
+
+__all__ = ["AtlasVectorStore"]
+
+
+class AtlasVectorStore(VectorStore):
+    """Async Atlas Vector Search store on top of a Motor collection.
+
+    Chunks are stored in the same layout langchain's MongoDBAtlasVectorSearch
+    used: the text and embedding fields plus the metadata keys at the top
+    level of each document. Queries run as $vectorSearch aggregations and
+    embeddings go through the embedding client's async API, so nothing here
+    blocks the event loop.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, embedding, index_name: str = "default",
+                 text_key: str = "text", embedding_key: str = "embedding", num_candidates_factor: int = 10):
+        self.collection = collection
+        self.embedding = embedding
+        self.index_name = index_name
+        self.text_key = text_key
+        self.embedding_key = embedding_key
+        self.num_candidates_factor = num_candidates_factor
+
+    async def ensure_indexes(self, num_dimensions: int, filter_fields: List[str], similarity: str = "cosine") -> None:
+        """Create the Atlas vector search index, with filter_fields usable in pre_filter.
+
+        Atlas only pre-filters on fields declared as "filter" in the index;
+        an existing index with the same name is left untouched. The filter
+        fields also get regular indexes for deletes and updates."""
+        for field in filter_fields:
+            await self.collection.create_index(field)
+
+        existing = [index async for index in self.collection.list_search_indexes(self.index_name)]
+        if existing:
+            return
+        definition = {
+            "fields": [
+                {"type": "vector", "path": self.embedding_key, "numDimensions": num_dimensions, "similarity": similarity},
+                *({"type": "filter", "path": field} for field in filter_fields),
+            ]
+        }
+        await self.collection.database.command({
+            "createSearchIndexes": self.collection.name,
+            "indexes": [{"name": self.index_name, "type": "vectorSearch", "definition": definition}],
+        })
+
+    async def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        if not texts:
+            return []
+        embeddings = await self.embedding.aembed_documents(list(texts))
+        records = [
+            {"_id": ObjectId(), self.text_key: text, self.embedding_key: vector, **metadata}
+            for text, vector, metadata in zip(texts, embeddings, metadatas)
+        ]
+        await self.collection.insert_many(records, ordered=False)
+        return [str(record["_id"]) for record in records]
+
+    async def similarity_search_by_vector(self, query_vector: List[float], k: int = 4,
+                                          pre_filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        vector_search = {
+            "index": self.index_name,
+            "path": self.embedding_key,
+            "queryVector": query_vector,
+            "numCandidates": k * self.num_candidates_factor,
+            "limit": k,
+        }
+        if pre_filter:
+            vector_search["filter"] = pre_filter
+
+        pipeline = [
+            {"$vectorSearch": vector_search},
+            {"$set": {"score": {"$meta": "vectorSearchScore"}}},
+            {"$project": {self.embedding_key: 0}},
+        ]
+
+        results = []
+        async for record in self.collection.aggregate(pipeline):
+            record.pop("_id", None)
+            text = record.pop(self.text_key, "")
+            score = record.pop("score")
+            results.append((Document(page_content=text, metadata=record), score))
+        return results
+
+    async def delete(self, filter: Dict[str, Any]) -> int:
+        result = await self.collection.delete_many(filter)
+        return result.deleted_count
+
+    async def update_metadata(self, filter: Dict[str, Any], values: Dict[str, Any]) -> int:
+        result = await self.collection.update_many(filter, {"$set": values})
+        return result.matched_count
+
+    async def count(self) -> int:
+        return await self.collection.count_documents({})
+
+    async def sample(self) -> Optional[Dict[str, Any]]:
+        record = await self.collection.find_one({}, {self.embedding_key: 0})
+        if record:
+            record["_id"] = str(record["_id"])
+        return record
@@ -0,0 +1,48 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+__all__ = ["VectorStore"]
+
+
+class VectorStore(ABC):
+    """Interface of the vector backends used by VectorController.
+
+    Chunks carry flat metadata (doc_id, folder_id, chunk_id, source).
+    Filters use the Mongo query subset understood by every backend: field
+    equality, $in, $and and the empty filter.
+    """
+
+    async def ensure_indexes(self, num_dimensions: int, filter_fields: List[str]) -> None:
+        """Create whatever index the backend needs so filter_fields can be used in pre_filter"""
+
+    @abstractmethod
+    async def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        """Embed and store texts; returns the chunk ids"""
+
+    async def similarity_search_with_score(self, query: str, k: int = 4,
+                                           pre_filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        query_vector = await self.embedding.aembed_query(query)
+        return await self.similarity_search_by_vector(query_vector, k, pre_filter)
+
+    @abstractmethod
+    async def similarity_search_by_vector(self, query_vector: List[float], k: int = 4,
+                                          pre_filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Top-k chunks by cosine similarity, highest score first"""
+
+    @abstractmethod
+    async def delete(self, filter: Dict[str, Any]) -> int:
+        """Delete the chunks matching filter; returns how many were removed"""
+
+    @abstractmethod
+    async def update_metadata(self, filter: Dict[str, Any], values: Dict[str, Any]) -> int:
+        """Set metadata fields on the chunks matching filter; returns how many were matched"""
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Number of stored chunks"""
+
+    @abstractmethod
+    async def sample(self) -> Optional[Dict[str, Any]]:
+        """One stored chunk without its embedding, for debugging"""
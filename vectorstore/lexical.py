@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+__all__ = ["LexicalIndex", "tokenize", "cv_terms"]
+
+# Keeps tech terms such as c++, c#, .net, node.js and asp.net intact; a
+# trailing sentence dot is not part of a token
+_TOKEN = re.compile(r"\.?[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9+#]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it of on or that the their this to was were will with".split()
+)
+
+# Term frequency multipliers per parsed_cv field (a cheap BM25F)
+FIELD_WEIGHTS = {"skills": 3, "programming_languages": 3, "all_skills": 2, "position": 2, "certification_name": 2}
+
+# Contact details, dates and scores add noise rather than searchable terms
+SKIPPED_FIELDS = frozenset({
+    "scores", "rating", "email", "phone_number", "linkedin_url", "git_url", "website", "project_link",
+    "years_of_experience", "start_date", "end_date", "issue_date", "references",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _walk(value: Any, weight: int, counts: Counter) -> None:
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key not in SKIPPED_FIELDS:
+                _walk(child, max(weight, FIELD_WEIGHTS.get(key, 1)), counts)
+    elif isinstance(value, list):
+        for child in value:
+            _walk(child, weight, counts)
+    elif isinstance(value, str):
+        for token in tokenize(value):
+            counts[token] += weight
+
+
+def cv_terms(parsed_cv: Dict[str, Any]) -> Dict[str, int]:
+    """Weighted term frequencies of the searchable text of a parsed CV"""
+    counts: Counter = Counter()
+    _walk(parsed_cv, 1, counts)
+    return dict(counts)
+
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over parsed CVs, one entry per CV.
+
+    Term frequencies of every CV are persisted in the Mongo "lexical_index"
+    collection so the index can be rebuilt at startup without re-reading
+    the CVs. Deletes leave a tombstone, and refresh() replays entries
+    changed since the last sync, so indexes held by other processes (API
+    workers, job workers) converge within LEXICAL_REFRESH_SECONDS.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # Above this many CVs, scoring runs off the event loop
+    THREAD_THRESHOLD = 20000
+    TOMBSTONE_TTL = timedelta(days=1)
+    # Overlap between refreshes, covering writes in flight and clock skew between hosts
+    SYNC_MARGIN = timedelta(seconds=10)
+
+    def __init__(self, db: AsyncIOMotorDatabase, refresh_seconds: float = 5.0):
+        self.collection = db.get_collection("lexical_index")
+        self.cv_collection = db.get_collection("cv")
+        self.refresh_seconds = refresh_seconds
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+        self._synced_at: Optional[datetime] = None
+        self._refreshed = 0.0
+
+    # In-memory index
+
+    def _apply(self, doc_id: str, terms: Optional[Dict[str, int]], folder_id: Optional[str] = None) -> None:
+        with self._lock:
+            previous = self._docs.pop(doc_id, None)
+            if previous:
+                self._total_length -= previous["length"]
+                for term in previous["terms"]:
+                    posting = self._postings.get(term)
+                    if posting is not None:
+                        posting.pop(doc_id, None)
+                        if not posting:
+                            del self._postings[term]
+            if terms is None:
+                return
+            length = sum(terms.values())
+            self._docs[doc_id] = {"terms": list(terms), "length": length, "folder_id": folder_id}
+            self._total_length += length
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _search(self, query: str, k: int, folder_ids: Optional[Iterable[str]],
+                document_ids: Optional[Iterable[str]]) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        folders = set(folder_ids) if folder_ids else None
+        allowed = set(document_ids) if document_ids else None
+        with self._lock:
+            n = len(self._docs)
+            if not n or not terms:
+                return []
+            avg_length = self._total_length / n
+            scores: Dict[str, float] = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    doc = self._docs[doc_id]
+                    if folders is not None and doc["folder_id"] not in folders:
+                        continue
+                    norm = tf + self.K1 * (1 - self.B + self.B * doc["length"] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    # Persistence
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("updated_at")
+        await self.load()
+
+    async def load(self) -> None:
+        """Rebuild the in-memory index from Mongo and index CVs stored before it existed"""
+        started = datetime.now(timezone.utc)
+        # Every process has replayed these long ago
+        await self.collection.delete_many({"deleted": True, "updated_at": {"$lt": started - self.TOMBSTONE_TTL}})
+        with self._lock:
+            self._postings, self._docs, self._total_length = {}, {}, 0
+        async for entry in self.collection.find({"deleted": {"$ne": True}}):
+            self._apply(entry["_id"], entry["terms"], entry.get("folder_id"))
+        self._synced_at = started - self.SYNC_MARGIN
+        self._refreshed = time.monotonic()
+
+        missing = []
+        async for cv in self.cv_collection.find({}, {"_id": 1}):
+            if str(cv["_id"]) not in self._docs:
+                missing.append(cv["_id"])
+        for i in range(0, len(missing), 500):
+            batch = [cv async for cv in self.cv_collection.find({"_id": {"$in": missing[i:i + 500]}}, {"parsed_cv": 1, "folder_id": 1})]
+            await self.add_many([(str(cv["_id"]), cv.get("parsed_cv") or {}, cv.get("folder_id")) for cv in batch])
+        if missing:
+            self.logger.info(f"Added {len(missing)} CVs to the lexical index")
+
+    async def refresh(self, force: bool = False) -> None:
+        """Replay entries written by other processes since the last sync"""
+        if self._synced_at is None:
+            return
+        if not force and time.monotonic() - self._refreshed < self.refresh_seconds:
+            return
+        self._refreshed = time.monotonic()
+        started = datetime.now(timezone.utc)
+        # Entries inside the margin are replayed again; applying is idempotent
+        async for entry in self.collection.find({"updated_at": {"$gte": self._synced_at}}):
+            terms = None if entry.get("deleted") else entry["terms"]
+            self._apply(entry["_id"], terms, entry.get("folder_id"))
+        self._synced_at = started - self.SYNC_MARGIN
+
+    async def add_many(self, items: List[Tuple[str, Dict[str, Any], Optional[str]]]) -> None:
+        if not items:
+            return
+        now = datetime.now(timezone.utc)
+        operations = []
+        for doc_id, parsed_cv, folder_id in items:
+            terms = cv_terms(parsed_cv)
+            self._apply(doc_id, terms, folder_id)
+            operations.append(UpdateOne(
+                {"_id": doc_id},
+                {"$set": {"terms": terms, "folder_id": folder_id, "deleted": False, "updated_at": now}},
+                upsert=True,
+            ))
+        await self.collection.bulk_write(operations, ordered=False)
+
+    async def add(self, doc_id: str, parsed_cv: Dict[str, Any], folder_id: Optional[str] = None) -> None:
+        await self.add_many([(doc_id, parsed_cv, folder_id)])
+
+    async def remove_many(self, doc_ids: List[str]) -> None:
+        if not doc_ids:
+            return
+        for doc_id in doc_ids:
+            self._apply(doc_id, None)
+        now = datetime.now(timezone.utc)
+        await self.collection.update_many(
+            {"_id": {"$in": list(doc_ids)}},
+            {"$set": {"terms": {}, "deleted": True, "updated_at": now}},
+        )
+
+    async def set_folder(self, doc_ids: List[str], folder_id: Optional[str]) -> None:
+        """Move indexed CVs to another folder; their terms are unchanged"""
+        if not doc_ids:
+            return
+        with self._lock:
+            for doc_id in doc_ids:
+                doc = self._docs.get(doc_id)
+                if doc is not None:
+                    doc["folder_id"] = folder_id
+        now = datetime.now(timezone.utc)
+        await self.collection.update_many(
+            {"_id": {"$in": list(doc_ids)}, "deleted": {"$ne": True}},
+            {"$set": {"folder_id": folder_id, "updated_at": now}},
+        )
+
+    async def remove(self, doc_id: str) -> None:
+        await self.remove_many([doc_id])
+
+    async def clear(self) -> None:
+        await self.remove_many(list(self._docs))
+
+    async def search(self, query: str, k: int = 10, folder_ids: Optional[Iterable[str]] = None,
+                     document_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, BM25 score), highest first"""
+        await self.refresh()
+        if len(self._docs) > self.THREAD_THRESHOLD:
+            return await asyncio.to_thread(self._search, query, k, folder_ids, document_ids)
+        return self._search(query, k, folder_ids, document_ids)
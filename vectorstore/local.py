@@ -0,0 +1,546 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson.objectid import ObjectId
+from langchain.schema import Document
+
+from .base import VectorStore
+
+__all__ = ["LocalVectorStore"]
+
+
+class LocalVectorStore(VectorStore):
+    """Embedded vector index on local disk, for self-hosted Mongo and offline use.
+
+    Normalized float32 embeddings live in a memory-mapped matrix next to an
+    append-only JSON-lines file with each chunk's text and metadata.
+    Inserts append rows, deletes clear an "alive" flag, metadata updates
+    are appended to a log replayed at load, and the files are compacted
+    into a new generation once enough rows are dead.
+
+    mode="exact" scores every in-scope row with one matrix-vector product.
+    mode="ivf" clusters the rows into nlist k-means lists and scans only
+    the nprobe lists closest to the query. mode="auto" is exact until the
+    index holds ivf_threshold live rows, then trains and switches to IVF,
+    probing as few lists (from nprobe up) as find min_recall of the exact
+    top 10 for a sample of stored chunks; data too spread out to reach it
+    within a quarter of the lists stays exact.
+    Selective pre-filters always use
+    the exact path over the matching rows, so scoped searches still get
+    their k hits. Scores follow Atlas' cosine convention, (1 + cos) / 2.
+    """
+
+    FILTER_FIELDS = ("doc_id", "folder_id")
+    COMPACT_RATIO = 0.3
+    MIN_TRAIN_ROWS = 256
+    CALIBRATION_QUERIES = 32
+    CALIBRATION_K = 10
+
+    def __init__(self, directory: str, embedding, mode: str = "auto", nlist: int = 1024, nprobe: int = 16,
+                 ivf_threshold: int = 50000, min_recall: float = 0.9, text_key: str = "text"):
+        if mode not in ("auto", "exact", "ivf"):
+            raise ValueError(f"Unknown local index mode {mode}, expected auto, exact or ivf")
+        self.directory = directory
+        self.embedding = embedding
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_threshold = ivf_threshold
+        self.min_recall = min_recall
+        self.text_key = text_key
+        self._lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    # Storage
+
+    def _gen_path(self, *parts: str) -> str:
+        return os.path.join(self.directory, self._generation, *parts)
+
+    def _reset_state(self) -> None:
+        self.dim: Optional[int] = None
+        self.size = 0
+        self.capacity = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._alive: Optional[np.ndarray] = None
+        self._records: List[Dict[str, Any]] = []
+        self._codes: Dict[str, Dict[Any, int]] = {field: {} for field in self.FILTER_FIELDS}
+        self._code_arrays: Dict[str, np.ndarray] = {field: np.zeros(0, dtype=np.int32) for field in self.FILTER_FIELDS}
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[np.ndarray] = []
+        self._dirty_lists: set = set()
+        self._trained_size = 0
+        self._training: Optional[str] = None
+        self._tuned_nprobe: Optional[int] = None
+        self._tuned_recall: Optional[float] = None
+
+    def _load(self) -> None:
+        self._reset_state()
+        current = os.path.join(self.directory, "CURRENT")
+        if not os.path.exists(current):
+            self._generation = "gen-0"
+            os.makedirs(self._gen_path(), exist_ok=True)
+            self._write_current()
+            return
+
+        with open(current) as f:
+            self._generation = f.read().strip()
+
+        meta_path = self._gen_path("meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path) as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.capacity = meta["capacity"]
+        self._open_arrays()
+
+        # Rows are only counted once their record line is complete
+        records_path = self._gen_path("records.jsonl")
+        valid_bytes = 0
+        if os.path.exists(records_path):
+            with open(records_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n") or len(self._records) >= self.capacity:
+                        break
+                    try:
+                        self._records.append(json.loads(line))
+                    except ValueError:
+                        break
+                    valid_bytes += len(line)
+            with open(records_path, "r+b") as f:
+                f.truncate(valid_bytes)
+        self.size = len(self._records)
+
+        self._grow_code_arrays(self.capacity)
+        for row, record in enumerate(self._records):
+            self._set_codes(row, record)
+
+        # Each update only applies to the rows that existed when it was made
+        updates_path = self._gen_path("updates.jsonl")
+        if os.path.exists(updates_path):
+            with open(updates_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    update = json.loads(line)
+                    n = min(update["rows"], self.size)
+                    self._apply_update(np.flatnonzero(self._match(update["filter"], n)), update["values"])
+
+        centroids_path = self._gen_path("centroids.f32")
+        if self.mode != "exact" and os.path.exists(centroids_path):
+            centroids = np.fromfile(centroids_path, dtype=np.float32).reshape(-1, self.dim)
+            self._install_centroids(centroids)
+            calibration_path = self._gen_path("calibration.json")
+            if os.path.exists(calibration_path):
+                with open(calibration_path) as f:
+                    calibration = json.load(f)
+                self._tuned_nprobe, self._tuned_recall = calibration["nprobe"], calibration["recall"]
+            else:
+                self._tuned_nprobe = self.nprobe
+
+    def _write_current(self) -> None:
+        tmp = os.path.join(self.directory, "CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(self._generation)
+        os.replace(tmp, os.path.join(self.directory, "CURRENT"))
+
+    def _write_meta(self) -> None:
+        tmp = self._gen_path("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity}, f)
+        os.replace(tmp, self._gen_path("meta.json"))
+
+    def _open_arrays(self) -> None:
+        for name, itemsize in (("vectors.f32", 4 * self.dim), ("alive.u8", 1)):
+            path = self._gen_path(name)
+            with open(path, "a+b") as f:
+                f.truncate(self.capacity * itemsize)
+        self._vectors = np.memmap(self._gen_path("vectors.f32"), dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self._alive = np.memmap(self._gen_path("alive.u8"), dtype=np.uint8, mode="r+", shape=(self.capacity,))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self.capacity:
+            return
+        self.capacity = max(rows, self.capacity * 2, 1024)
+        self._open_arrays()
+        self._write_meta()
+        self._grow_code_arrays(self.capacity)
+
+    def _grow_code_arrays(self, capacity: int) -> None:
+        for field in self.FILTER_FIELDS:
+            grown = np.full(capacity, -1, dtype=np.int32)
+            current = self._code_arrays[field]
+            grown[:len(current)] = current
+            self._code_arrays[field] = grown
+        assign = np.full(capacity, -1, dtype=np.int32)
+        assign[:len(self._assign)] = self._assign
+        self._assign = assign
+
+    def _set_codes(self, row: int, record: Dict[str, Any]) -> None:
+        for field in self.FILTER_FIELDS:
+            codes = self._codes[field]
+            value = record.get(field)
+            if value not in codes:
+                codes[value] = len(codes)
+            self._code_arrays[field][row] = codes[value]
+
+    # IVF
+
+    @staticmethod
+    def _assign_rows(vectors: np.ndarray, centroids: np.ndarray, start: int, end: int) -> np.ndarray:
+        assign = np.empty(end - start, dtype=np.int32)
+        for block in range(start, end, 65536):
+            rows = np.asarray(vectors[block:min(end, block + 65536)])
+            assign[block - start:block - start + len(rows)] = np.argmax(rows @ centroids.T, axis=1)
+        return assign
+
+    def _install_centroids(self, centroids: np.ndarray, assign: Optional[np.ndarray] = None) -> None:
+        """Switch to new centroids; assign holds the lists of the first rows if they were computed beforehand"""
+        n = self.size
+        done = 0 if assign is None else len(assign)
+        if done:
+            self._assign[:done] = assign
+        self._assign[done:n] = self._assign_rows(self._vectors, centroids, done, n)
+        order = np.argsort(self._assign[:n], kind="stable")
+        bounds = np.searchsorted(self._assign[:n][order], np.arange(len(centroids) + 1))
+        self._centroids = centroids
+        self._list_arrays = [order[bounds[c]:bounds[c + 1]].astype(np.int64) for c in range(len(centroids))]
+        self._lists = [rows.tolist() for rows in self._list_arrays]
+        self._dirty_lists = set()
+        self._trained_size = n
+
+    def _maybe_train(self) -> Optional[Tuple[str, int, np.ndarray, np.ndarray]]:
+        """Under the lock: decide whether to (re)train and snapshot what training reads.
+
+        The caller runs _train on the snapshot after releasing the lock, so
+        searches and inserts are not held up by k-means.
+        """
+        if self.mode == "exact" or self._training == self._generation:
+            return None
+        alive_rows = np.flatnonzero(self._alive[:self.size])
+        if len(alive_rows) < (self.MIN_TRAIN_ROWS if self.mode == "ivf" else max(self.MIN_TRAIN_ROWS, self.ivf_threshold)):
+            return None
+        if self._centroids is not None and self.size < 2 * self._trained_size:
+            return None
+        self._training = self._generation
+        # Rows below size are never rewritten in place, so the snapshot can be read without the lock
+        return self._generation, self.size, self._vectors, alive_rows
+
+    def _train(self, snapshot: Tuple[str, int, np.ndarray, np.ndarray]) -> None:
+        generation, n, vectors, alive_rows = snapshot
+        try:
+            nlist = min(self.nlist, max(1, len(alive_rows) // 8))
+            rng = np.random.default_rng(0)
+            sample_rows = rng.choice(alive_rows, size=min(len(alive_rows), nlist * 64), replace=False)
+            sample = np.asarray(vectors[np.sort(sample_rows)])
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            for _ in range(10):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                # Sum each list's members in one pass over the sample sorted by list; empty lists keep their centroid
+                order = np.argsort(labels, kind="stable")
+                present, starts = np.unique(labels[order], return_index=True)
+                sums = np.add.reduceat(sample[order], starts, axis=0)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                centroids[present] = sums / np.where(norms == 0, 1, norms)
+            centroids = centroids.astype(np.float32)
+            assign = self._assign_rows(vectors, centroids, 0, n)
+            tuned_nprobe, tuned_recall = self._calibrate(vectors, n, alive_rows, centroids, assign)
+
+            with self._lock:
+                # After a compaction the rows were renumbered; the new generation trains on its own
+                if self._generation == generation:
+                    centroids.tofile(self._gen_path("centroids.f32"))
+                    with open(self._gen_path("calibration.json"), "w") as f:
+                        json.dump({"nprobe": tuned_nprobe, "recall": tuned_recall}, f)
+                    self._install_centroids(centroids, assign)
+                    self._tuned_nprobe, self._tuned_recall = tuned_nprobe, tuned_recall
+        finally:
+            with self._lock:
+                if self._training == generation:
+                    self._training = None
+
+    def _calibrate(self, vectors: np.ndarray, n: int, alive_rows: np.ndarray, centroids: np.ndarray,
+                   assign: np.ndarray) -> Tuple[Optional[int], float]:
+        """Fewest lists to probe, doubling from nprobe, that reach min_recall on a sample of stored chunks.
+
+        Each sampled chunk is a query whose exact top k, itself excluded, is
+        the reference. Returns None for the lists, with the best recall seen,
+        when reaching it would scan over a quarter of the lists.
+        """
+        rng = np.random.default_rng(1)
+        rows = np.sort(rng.choice(alive_rows, size=min(len(alive_rows), self.CALIBRATION_QUERIES), replace=False))
+        queries = np.asarray(vectors[rows])
+        scores = np.empty((len(rows), n), dtype=np.float32)
+        for block in range(0, n, 65536):
+            scores[:, block:min(n, block + 65536)] = queries @ np.asarray(vectors[block:min(n, block + 65536)]).T
+        dead = np.ones(n, dtype=bool)
+        dead[alive_rows] = False
+        scores[:, dead] = -np.inf
+        scores[np.arange(len(rows)), rows] = -np.inf
+        k = min(self.CALIBRATION_K, len(alive_rows) - 1)
+        exact = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        probe_order = np.argsort(-(queries @ centroids.T), axis=1)
+
+        nprobe, recall = min(self.nprobe, len(centroids)), 0.0
+        while nprobe <= max(1, len(centroids) // 4):
+            found = 0
+            for q in range(len(rows)):
+                candidates = np.flatnonzero(np.isin(assign, probe_order[q, :nprobe]))
+                if len(candidates) > k:
+                    candidates = candidates[np.argpartition(-scores[q, candidates], k - 1)[:k]]
+                found += len(np.intersect1d(candidates, exact[q]))
+            recall = found / (len(rows) * k)
+            if recall >= self.min_recall:
+                return nprobe, recall
+            nprobe *= 2
+        return None, recall
+
+    def _nprobe(self) -> int:
+        """Lists a query scans: nprobe in ivf mode, the calibrated count in auto mode, 0 to stay exact"""
+        nprobe = self.nprobe if self.mode == "ivf" else self._tuned_nprobe
+        return min(nprobe or 0, len(self._centroids))
+
+    def _probe_rows(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        for c in self._dirty_lists:
+            self._list_arrays[c] = np.asarray(self._lists[c], dtype=np.int64)
+        self._dirty_lists = set()
+        scores = self._centroids @ query
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._list_arrays[c] for c in probes])
+
+    # Filters
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]], n: int) -> np.ndarray:
+        mask = np.asarray(self._alive[:n]).astype(bool)
+        if filter:
+            mask &= self._match(filter, n)
+        return mask
+
+    def _match(self, filter: Dict[str, Any], n: int) -> np.ndarray:
+        mask = np.ones(n, dtype=bool)
+        for field, condition in filter.items():
+            if field == "$and":
+                for clause in condition:
+                    mask &= self._match(clause, n)
+                continue
+
+            if isinstance(condition, dict):
+                if set(condition) - {"$in", "$eq"}:
+                    raise ValueError(f"Unsupported filter on {field}: {condition}")
+                values = list(condition.get("$in", []))
+                if "$eq" in condition:
+                    values.append(condition["$eq"])
+            else:
+                values = [condition]
+
+            if field in self._codes:
+                codes = [self._codes[field][v] for v in values if v in self._codes[field]]
+                mask &= np.isin(self._code_arrays[field][:n], codes)
+            else:
+                wanted = set(values)
+                mask &= np.fromiter((r.get(field) in wanted for r in self._records[:n]), dtype=bool, count=n)
+        return mask
+
+    # Operations
+
+    def _add(self, vectors: np.ndarray, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index dimension {self.dim}")
+
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+
+            start, end = self.size, self.size + len(records)
+            self._ensure_capacity(end)
+            self._vectors[start:end] = vectors
+            self._vectors.flush()
+            self._alive[start:end] = 1
+            self._alive.flush()
+
+            with open(self._gen_path("records.jsonl"), "a") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            if self._centroids is not None:
+                self._assign[start:end] = np.argmax(vectors @ self._centroids.T, axis=1)
+            for row, record in enumerate(records, start):
+                self._records.append(record)
+                self._set_codes(row, record)
+                if self._centroids is not None:
+                    c = int(self._assign[row])
+                    self._lists[c].append(row)
+                    self._dirty_lists.add(c)
+            self.size = end
+            snapshot = self._maybe_train()
+        if snapshot is not None:
+            self._train(snapshot)
+
+    def _search(self, query: np.ndarray, k: int, pre_filter: Optional[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], float]]:
+        with self._lock:
+            n = self.size
+            if n == 0 or k <= 0:
+                return []
+            norm = np.linalg.norm(query)
+            query = query / norm if norm else query
+            mask = self._filter_mask(pre_filter, n)
+            in_scope = int(mask.sum())
+            if in_scope == 0:
+                return []
+
+            rows = None
+            nprobe = self._nprobe() if self.mode != "exact" and self._centroids is not None else 0
+            if nprobe:
+                # Only worth probing when it scans fewer rows than the filter leaves
+                expected_scan = n * nprobe / len(self._centroids)
+                if expected_scan < in_scope:
+                    candidates = self._probe_rows(query, nprobe)
+                    candidates = candidates[mask[candidates]]
+                    if len(candidates) >= k:
+                        rows = candidates
+            if rows is None and in_scope <= n // 4:
+                rows = np.flatnonzero(mask)
+            vectors = self._vectors
+            records = self._records
+
+        top = min(k, in_scope if rows is None else len(rows))
+        if rows is None:
+            # Scan the whole matrix rather than gathering most of it
+            scores = np.asarray(vectors[:n]) @ query
+            scores[~mask] = -np.inf
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [(records[i], (1.0 + float(scores[i])) / 2.0) for i in best]
+
+        scores = vectors[rows] @ query
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(records[rows[i]], (1.0 + float(scores[i])) / 2.0) for i in best]
+
+    def _delete(self, filter: Dict[str, Any]) -> int:
+        snapshot = None
+        with self._lock:
+            if self.size == 0:
+                return 0
+            mask = self._filter_mask(filter, self.size)
+            deleted = int(mask.sum())
+            if deleted:
+                self._alive[:self.size][mask] = 0
+                self._alive.flush()
+                alive = int(self._alive[:self.size].sum())
+                if self.size > 1024 and alive < self.size * (1 - self.COMPACT_RATIO):
+                    snapshot = self._compact()
+        if snapshot is not None:
+            self._train(snapshot)
+        return deleted
+
+    def _apply_update(self, rows: np.ndarray, values: Dict[str, Any]) -> None:
+        for row in rows:
+            self._records[row] = {**self._records[row], **values}
+            self._set_codes(row, self._records[row])
+
+    def _update(self, filter: Dict[str, Any], values: Dict[str, Any]) -> int:
+        with self._lock:
+            if self.size == 0:
+                return 0
+            rows = np.flatnonzero(self._filter_mask(filter, self.size))
+            if len(rows):
+                with open(self._gen_path("updates.jsonl"), "a") as f:
+                    f.write(json.dumps({"rows": self.size, "filter": filter, "values": values}) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._apply_update(rows, values)
+            return len(rows)
+
+    def _compact(self) -> Optional[Tuple[str, int, np.ndarray, np.ndarray]]:
+        """Rewrite the live rows into a new generation and switch to it atomically.
+
+        Returns the snapshot to retrain on if the index was using IVF.
+        """
+        rows = np.flatnonzero(self._alive[:self.size])
+        old_generation = self._generation
+        number = int(old_generation.split("-")[1]) + 1
+        self._generation = f"gen-{number}"
+        os.makedirs(self._gen_path(), exist_ok=True)
+
+        vectors = np.asarray(self._vectors[rows])
+        records = [self._records[r] for r in rows]
+        had_centroids = self._centroids is not None
+
+        self.capacity = max(1024, len(rows) * 2)
+        self._open_arrays()
+        self._vectors[:len(rows)] = vectors
+        self._vectors.flush()
+        self._alive[:] = 0
+        self._alive[:len(rows)] = 1
+        self._alive.flush()
+        with open(self._gen_path("records.jsonl"), "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._write_meta()
+        self._write_current()
+        shutil.rmtree(os.path.join(self.directory, old_generation), ignore_errors=True)
+
+        self._records = records
+        self.size = len(records)
+        self._codes = {field: {} for field in self.FILTER_FIELDS}
+        self._code_arrays = {field: np.zeros(0, dtype=np.int32) for field in self.FILTER_FIELDS}
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._grow_code_arrays(self.capacity)
+        for row, record in enumerate(records):
+            self._set_codes(row, record)
+        self._centroids = None
+        return self._maybe_train() if had_centroids else None
+
+    def _to_document(self, record: Dict[str, Any]) -> Document:
+        record = dict(record)
+        text = record.pop(self.text_key, "")
+        record.pop("_id", None)
+        return Document(page_content=text, metadata=record)
+
+    # VectorStore interface
+
+    async def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        if not texts:
+            return []
+        embeddings = await self.embedding.aembed_documents(list(texts))
+        records = [
+            {"_id": str(ObjectId()), self.text_key: text, **metadata}
+            for text, metadata in zip(texts, metadatas)
+        ]
+        await asyncio.to_thread(self._add, np.asarray(embeddings, dtype=np.float32), records)
+        return [record["_id"] for record in records]
+
+    async def similarity_search_by_vector(self, query_vector: List[float], k: int = 4,
+                                          pre_filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        hits = await asyncio.to_thread(self._search, np.asarray(query_vector, dtype=np.float32), k, pre_filter)
+        return [(self._to_document(record), score) for record, score in hits]
+
+    async def delete(self, filter: Dict[str, Any]) -> int:
+        return await asyncio.to_thread(self._delete, filter)
+
+    async def update_metadata(self, filter: Dict[str, Any], values: Dict[str, Any]) -> int:
+        return await asyncio.to_thread(self._update, filter, values)
+
+    async def count(self) -> int:
+        with self._lock:
+            return int(self._alive[:self.size].sum()) if self.size else 0
+
+    async def sample(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            alive = np.flatnonzero(self._alive[:self.size]) if self.size else []
+            return dict(self._records[alive[0]]) if len(alive) else None
@@ -0,0 +1,124 @@
+"""Ingestion job worker.
+
+Runs in-process (started from main.py, see config.JOB_WORKERS) or as a
+separate process:
+
+    python -m worker --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from config import config
+from database import database
+from utils.pdf_extract import extractor
+
+
+class IngestWorker:
+    """Claims queued ingestion jobs and runs their files through the pipeline"""
+
+    def __init__(self, database, worker_id: str = None):
+        self.database = database
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.logger = logging.getLogger(__name__)
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        job_controller = self.database.controller.job_controller
+        while not self._stopping.is_set():
+            try:
+                for job_id in await job_controller.fail_abandoned():
+                    await self._remove_failed_files(job_id)
+                job = await job_controller.claim(self.worker_id)
+            except Exception as e:
+                self.logger.error(f"Worker {self.worker_id} failed to claim a job: {str(e)}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=config.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.process_job(job)
+
+    async def _heartbeat(self, job, work: asyncio.Future) -> bool:
+        """Renew the lease while the job runs; if it is lost, cancel the work and return False"""
+        job_controller = self.database.controller.job_controller
+        while True:
+            await asyncio.sleep(config.JOB_LEASE_SECONDS / 3)
+            if not await job_controller.renew_lease(job["_id"], self.worker_id):
+                self.logger.error(f"Worker {self.worker_id} lost the lease on job {job['_id']}")
+                work.cancel()
+                return False
+
+    async def process_job(self, job):
+        job_controller = self.database.controller.job_controller
+        document_controller = self.database.controller.document_controller
+
+        async def process_file(index, stored):
+            if stored["status"] == "done":
+                return
+            try:
+                await document_controller.process_document(self.database, stored, job["folder_id"], keep_file=True)
+                await job_controller.set_file_status(job["_id"], self.worker_id, index, "done")
+            except Exception as e:
+                self.logger.error(f"Job {job['_id']}: error processing {stored['filename']}: {str(e)}")
+                await job_controller.set_file_status(job["_id"], self.worker_id, index, "failed", str(e))
+
+        work = asyncio.gather(*(process_file(i, f) for i, f in enumerate(job["files"])))
+        heartbeat = asyncio.create_task(self._heartbeat(job, work))
+        try:
+            await work
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result() is False:
+                # Another worker owns the job now; stop writing to its files
+                return
+            raise
+        finally:
+            heartbeat.cancel()
+
+        status = await job_controller.finish(job, self.worker_id)
+        if status in ("completed", "failed"):
+            await self._remove_failed_files(job["_id"])
+
+    async def _remove_failed_files(self, job_id):
+        """Files that exhausted their retries are not kept on disk"""
+        job = await self.database.controller.job_controller.collection.find_one({"_id": job_id})
+        for f in job["files"]:
+            if f["status"] == "failed" and os.path.exists(f["document_url"]):
+                os.remove(f["document_url"])
+
+
+async def run_workers(database, count: int):
+    workers = [IngestWorker(database) for _ in range(count)]
+    try:
+        await asyncio.gather(*(w.run() for w in workers))
+    finally:
+        for w in workers:
+            w.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drain the ingestion job queue")
+    parser.add_argument("--workers", type=int, default=max(1, config.JOB_WORKERS), help="Number of concurrent job workers")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    database.init_app()
+    try:
+        asyncio.run(run_workers(database, args.workers))
+    finally:
+        extractor.shutdown()
+        database.close()
+
+
+if __name__ == "__main__":
+    main()